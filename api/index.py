@@ -15,8 +15,11 @@ if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
 try:
-    from src.api import InventoryAPI
+    from src.api import InventoryAPI, records_to_items
+    from src.response_cache import ResponseCache, etag_matches, make_etag
+    response_cache = ResponseCache()
 except Exception as e:
+    response_cache = None
     # Fallback: provide a minimal stub if imports fail
     class InventoryAPI:  # type: ignore
         def __init__(self):
@@ -25,6 +28,10 @@ except Exception as e:
             ]
         def get_inventory(self):
             return self._inv
+        def search_products(self, query, limit=20, offset=0, prefix=False):
+            query = (query or '').lower()
+            matches = [p for p in self._inv if (p['name'].lower().startswith(query) if prefix else query in p['name'].lower())]
+            return matches[offset:offset + limit]
         def add_product(self, name, price, quantity, category):
             new_id = (self._inv[-1]['id'] + 1) if self._inv else 1
             self._inv.append({"id": new_id, "name": name, "price": price, "quantity": quantity, "category": category})
@@ -39,19 +46,61 @@ except Exception as e:
             return {"status": "success", "order_id": 1}
         def process_orders(self, count=1):
             return {"status": "success", "processed_orders": []}
-        def get_transactions(self, limit=10):
+        def get_transactions(self, limit=10, after_id=None, before_id=None, latest=False, product_id=None,
+                             start=None, end=None):
             return []
         def get_system_status(self):
             return {"total_products": len(self._inv), "pending_orders": 0, "backorders": 0, "items_ready_for_delivery": 0, "total_transactions": 0}
+        def update_price(self, product_id, price):
+            for p in self._inv:
+                if p['id'] == product_id:
+                    p['price'] = price
+                    return {"status": "success"}
+            return {"status": "error", "message": "Product not found"}
         def calculate_composite_cost(self, components):
             return {"status": "success", "total_cost": 0}
+        def define_composite(self, name, components):
+            return {"status": "success", "name": name}
+        def calculate_buildable(self, kits=None, components=None):
+            if components is not None:
+                return {"status": "success", "buildable": 0}
+            return {"status": "success", "kits": []}
+        def add_products(self, products):
+            return {"status": "success", "results": [self.add_product(*p) for p in products], "fulfilled_backorders": []}
+        def update_stock_bulk(self, adjustments):
+            return {"status": "success", "results": [self.update_stock(*a) for a in adjustments], "fulfilled_backorders": []}
+        def place_orders(self, orders):
+            return {"status": "success", "results": [self.place_order(*o) for o in orders]}
+        def export_inventory(self, fmt="ndjson", fields=None, category=None, low_stock=None):
+            chunks = (json.dumps(p) + "\n" for p in self._inv)
+            return {"status": "success", "content_type": "application/x-ndjson", "chunks": chunks}
+        def export_transactions(self, fmt="ndjson", fields=None, product_id=None, after_id=None, before_id=None):
+            return {"status": "success", "content_type": "application/x-ndjson", "chunks": iter(())}
+        def get_changes(self, since=0, limit=1000, wait=0):
+            return {"status": "success", "reset": False, "cursor": since, "has_more": False, "products": [], "orders": []}
+        def get_movement(self, product_id=None, category=None, days=30, granularity="day"):
+            return {"status": "success", "product_id": product_id, "category": category, "granularity": granularity,
+                    "buckets": [], "totals": {"counts": {}, "quantities": {}, "units_in": 0, "units_out": 0}}
+        def get_low_stock(self, threshold=5, projected=False, lead_time_days=None, service_factor=None):
+            products = [dict(p) for p in self._inv if p['quantity'] < threshold]
+            return {"status": "success", "mode": "projected" if projected else "threshold", "products": products}
+        def get_replenishment_plan(self, lead_time_days=None, service_factor=None, cover_days=None, limit=100):
+            return {"status": "success", "lead_time_days": lead_time_days, "service_factor": service_factor,
+                    "cover_days": cover_days, "products_planned": 0, "products_due": 0, "products": []}
+    def records_to_items(records, keys, defaults=None):
+        if not isinstance(records, list):
+            return records
+        defaults = defaults or {}
+        return [[r.get(k, defaults.get(k)) for k in keys] if isinstance(r, dict) else r for r in records]
 
 api = InventoryAPI()
 
 class handler(BaseHTTPRequestHandler):
-    def _set_headers(self, status=200):
+    def _set_headers(self, status=200, headers=None):
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         # CORS (harmless if same-origin on Vercel)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
@@ -62,6 +111,37 @@ class handler(BaseHTTPRequestHandler):
         self._set_headers(status)
         self.wfile.write(json.dumps(payload).encode('utf-8'))
 
+    def _cached_json(self, resource, build):
+        """Answer a read endpoint from the response cache, or 304 if the client's ETag is current"""
+        if response_cache is None or not hasattr(api, 'get_version'):
+            return self._json(200, build())
+        # Read the version before building, so the body is never older than its ETag
+        version = api.get_version(resource)
+        etag = make_etag(version)
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            return self._set_headers(304, {'ETag': etag})
+        def render():
+            payload = build()
+            # Some builders return JSON that is already encoded
+            return payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        body = response_cache.get(self.path, version, render)
+        self._set_headers(200, {'ETag': etag, 'Content-Length': str(len(body))})
+        self.wfile.write(body)
+
+    def _stream(self, result, filename):
+        """Write an export's chunks as they are produced; the body ends when the connection closes"""
+        if result.get('status') != 'success':
+            return self._json(400, result)
+        self.send_response(200)
+        self.send_header('Content-Type', result['content_type'])
+        self.send_header('Content-Disposition', f'attachment; filename={filename}')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for chunk in result['chunks']:
+            self.wfile.write(chunk.encode('utf-8'))
+
     def _read_json(self):
         length = int(self.headers.get('content-length', 0) or 0)
         if length > 0:
@@ -72,6 +152,17 @@ class handler(BaseHTTPRequestHandler):
                 return {}
         return {}
 
+    def _read_bulk(self, keys, defaults=None):
+        """Read a bulk body (JSON array or NDJSON lines) as positional items for the API"""
+        length = int(self.headers.get('content-length', 0) or 0)
+        raw = self.rfile.read(length) if length > 0 else b''
+        content_type = (self.headers.get('content-type') or '').split(';')[0].strip().lower()
+        if content_type in ('application/x-ndjson', 'application/ndjson'):
+            records = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        else:
+            records = json.loads(raw.decode('utf-8')) if raw else []
+        return records_to_items(records, keys, defaults)
+
     def do_OPTIONS(self):
         self._set_headers(204)
 
@@ -105,7 +196,17 @@ class handler(BaseHTTPRequestHandler):
 
         # GET /inventory
         if method == 'GET' and path == '/inventory':
-            return self._json(200, api.get_inventory())
+            if not hasattr(api, 'get_inventory_json'):
+                return self._json(200, api.get_inventory())
+            return self._cached_json('inventory', api.get_inventory_json)
+
+        # GET /inventory/search
+        if method == 'GET' and path == '/inventory/search':
+            query = qs.get('q', [''])[0]
+            limit = int(qs.get('limit', ['20'])[0])
+            offset = int(qs.get('offset', ['0'])[0])
+            prefix = qs.get('prefix', ['false'])[0].lower() in ('1', 'true')
+            return self._cached_json('inventory', lambda: api.search_products(query, limit, offset, prefix))
 
         # POST /inventory
         if method == 'POST' and path == '/inventory':
@@ -115,6 +216,16 @@ class handler(BaseHTTPRequestHandler):
             )
             return self._json(200, result)
 
+        # POST /inventory/bulk
+        if method == 'POST' and path == '/inventory/bulk':
+            items = self._read_bulk(('name', 'price', 'quantity', 'category'))
+            return self._json(200, api.add_products(items))
+
+        # PUT /inventory/bulk
+        if method == 'PUT' and path == '/inventory/bulk':
+            items = self._read_bulk(('productId', 'quantityChange'))
+            return self._json(200, api.update_stock_bulk(items))
+
         # PUT /inventory/<id>
         m = re.match(r'^/inventory/(\d+)$', path)
         if method == 'PUT' and m:
@@ -123,6 +234,13 @@ class handler(BaseHTTPRequestHandler):
             result = api.update_stock(product_id, data.get('quantityChange', 0))
             return self._json(200, result)
 
+        # PUT /inventory/<id>/price
+        m = re.match(r'^/inventory/(\d+)/price$', path)
+        if method == 'PUT' and m:
+            data = self._read_json()
+            result = api.update_price(int(m.group(1)), data.get('price'))
+            return self._json(200, result)
+
         # POST /orders
         if method == 'POST' and path == '/orders':
             data = self._read_json()
@@ -131,6 +249,11 @@ class handler(BaseHTTPRequestHandler):
             )
             return self._json(200, result)
 
+        # POST /orders/bulk
+        if method == 'POST' and path == '/orders/bulk':
+            items = self._read_bulk(('productId', 'quantity', 'customerName', 'priority'), {'priority': 1})
+            return self._json(200, api.place_orders(items))
+
         # POST /orders/process
         if method == 'POST' and path == '/orders/process':
             data = self._read_json()
@@ -141,11 +264,72 @@ class handler(BaseHTTPRequestHandler):
         # GET /transactions
         if method == 'GET' and path == '/transactions':
             limit = int(qs.get('limit', ['10'])[0])
-            return self._json(200, api.get_transactions(limit))
+            after_id = int(qs['after'][0]) if 'after' in qs else None
+            before_id = int(qs['before'][0]) if 'before' in qs else None
+            latest = qs.get('order', ['asc'])[0] == 'desc'
+            product_id = int(qs['product_id'][0]) if 'product_id' in qs else None
+            start = qs.get('start', [None])[0]
+            end = qs.get('end', [None])[0]
+            try:
+                return self._cached_json(
+                    'transactions',
+                    lambda: api.get_transactions(limit, after_id, before_id, latest, product_id, start, end)
+                )
+            except ValueError as e:
+                return self._json(400, {"status": "error", "message": f"Invalid time range: {e}"})
+
+        # GET /export/inventory
+        if method == 'GET' and path == '/export/inventory':
+            fmt = qs.get('format', ['ndjson'])[0]
+            low_stock = int(qs['low_stock'][0]) if 'low_stock' in qs else None
+            result = api.export_inventory(fmt, qs.get('fields', [None])[0], qs.get('category', [None])[0], low_stock)
+            return self._stream(result, f'inventory.{fmt}')
+
+        # GET /export/transactions
+        if method == 'GET' and path == '/export/transactions':
+            fmt = qs.get('format', ['ndjson'])[0]
+            product_id = int(qs['product_id'][0]) if 'product_id' in qs else None
+            after_id = int(qs['after'][0]) if 'after' in qs else None
+            before_id = int(qs['before'][0]) if 'before' in qs else None
+            result = api.export_transactions(fmt, qs.get('fields', [None])[0], product_id, after_id, before_id)
+            return self._stream(result, f'transactions.{fmt}')
+
+        # GET /changes (long-poll only: a function invocation cannot hold an event stream open)
+        if method == 'GET' and path == '/changes':
+            since = int(qs.get('since', ['0'])[0])
+            if since < 0:
+                return self._json(400, {"status": "error", "message": "since must be a non-negative ledger id"})
+            limit = int(qs.get('limit', ['1000'])[0])
+            # Stay well inside the platform's function time limit
+            wait = min(float(qs.get('wait', ['0'])[0]), 8.0)
+            return self._json(200, api.get_changes(since, limit, wait))
+
+        # GET /movement
+        if method == 'GET' and path == '/movement':
+            product_id = int(qs['product_id'][0]) if 'product_id' in qs else None
+            days = int(qs.get('days', ['30'])[0])
+            result = api.get_movement(product_id, qs.get('category', [None])[0], days, qs.get('granularity', ['day'])[0])
+            return self._json(200 if result.get('status') == 'success' else 400, result)
+
+        # GET /low-stock
+        if method == 'GET' and path == '/low-stock':
+            lead_time_days = float(qs['lead_time_days'][0]) if 'lead_time_days' in qs else None
+            service_factor = float(qs['service_factor'][0]) if 'service_factor' in qs else None
+            result = api.get_low_stock(int(qs.get('threshold', ['5'])[0]), qs.get('mode', ['threshold'])[0] == 'projected',
+                                       lead_time_days, service_factor)
+            return self._json(200 if result.get('status') == 'success' else 400, result)
+
+        # GET /replenishment
+        if method == 'GET' and path == '/replenishment':
+            lead_time_days = float(qs['lead_time_days'][0]) if 'lead_time_days' in qs else None
+            service_factor = float(qs['service_factor'][0]) if 'service_factor' in qs else None
+            cover_days = float(qs['cover_days'][0]) if 'cover_days' in qs else None
+            result = api.get_replenishment_plan(lead_time_days, service_factor, cover_days, int(qs.get('limit', ['100'])[0]))
+            return self._json(200 if result.get('status') == 'success' else 400, result)
 
         # GET /status
         if method == 'GET' and path == '/status':
-            return self._json(200, api.get_system_status())
+            return self._cached_json('all', api.get_system_status)
 
         # POST /composite-cost
         if method == 'POST' and path == '/composite-cost':
@@ -153,6 +337,18 @@ class handler(BaseHTTPRequestHandler):
             result = api.calculate_composite_cost(data.get('components', []))
             return self._json(200, result)
 
+        # POST /composite-buildable
+        if method == 'POST' and path == '/composite-buildable':
+            data = self._read_json()
+            result = api.calculate_buildable(data.get('kits'), data.get('components'))
+            return self._json(200, result)
+
+        # POST /composites
+        if method == 'POST' and path == '/composites':
+            data = self._read_json()
+            result = api.define_composite(data.get('name'), data.get('components', []))
+            return self._json(200, result)
+
         # GET /debug
         if method == 'GET' and path == '/debug':
             info = {
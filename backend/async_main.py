@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Asyncio entry point for the Inventory Management System API
+Serves the same /api routes and payloads as main.py from a single event loop,
+with keep-alive connections and a bound on requests in flight
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.api import InventoryAPI, records_to_items
+from src.change_feed import HEARTBEAT_SECONDS, MAX_WAIT_SECONDS, next_event, parse_cursor
+from src.concurrency import SnapshotBusy
+from src.response_cache import ResponseCache, etag_matches, make_etag
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 64 * 1024 * 1024  # room for bulk batches of a few hundred thousand items
+KEEPALIVE_TIMEOUT = 15.0  # seconds an idle connection is kept open
+
+CORS_HEADERS = (
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Access-Control-Allow-Headers: Content-Type\r\n"
+    b"Access-Control-Allow-Methods: GET, POST, PUT, OPTIONS\r\n"
+)
+
+
+def create_api():
+    """Build the InventoryAPI from the same environment variables as main.py"""
+    if int(os.environ.get('INVENTORY_SHARDS', '0')):
+        # The event loop shares one in-process API; shards are forked by main.py only
+        raise SystemExit("INVENTORY_SHARDS is only supported by the Flask server (main.py)")
+    persistence = None
+    if os.environ.get('INVENTORY_DATA_DIR'):
+        from src.persistence import PersistenceEngine
+        persistence = PersistenceEngine(
+            os.environ['INVENTORY_DATA_DIR'],
+            fsync_policy=os.environ.get('INVENTORY_FSYNC', 'batch'),
+            batch_size=int(os.environ.get('INVENTORY_FSYNC_BATCH', '64'))
+        )
+    return InventoryAPI(
+        storage=os.environ.get('INVENTORY_STORAGE', 'list'),
+        persistence=persistence,
+        storage_path=os.environ.get('INVENTORY_MMAP_PATH'),
+        readonly=bool(int(os.environ.get('INVENTORY_MMAP_READONLY', '0'))),
+        ledger_archive=os.environ.get('INVENTORY_LEDGER_ARCHIVE')
+    )
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def query_arg(query, name, default=None, type=str):
+    """Read a query parameter the way Flask's request.args.get does: bad values give the default"""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return type(values[0])
+    except ValueError:
+        return default
+
+
+# Route handlers take (api, match, query, body) and return a JSON-serializable payload
+# or already encoded JSON bytes.
+# For bulk routes body is the list of items, from a JSON array or NDJSON lines.
+
+def get_inventory(api, match, query, body):
+    return api.get_inventory_json()
+
+
+def search_products(api, match, query, body):
+    return api.search_products(
+        query_arg(query, 'q', ''),
+        query_arg(query, 'limit', 20, int),
+        query_arg(query, 'offset', 0, int),
+        query_arg(query, 'prefix', 'false').lower() in ('1', 'true')
+    )
+
+
+def add_product(api, match, query, body):
+    return api.add_product(body['name'], body['price'], body['quantity'], body['category'])
+
+
+def add_products(api, match, query, body):
+    return api.add_products(records_to_items(body, ('name', 'price', 'quantity', 'category')))
+
+
+def update_stock_bulk(api, match, query, body):
+    return api.update_stock_bulk(records_to_items(body, ('productId', 'quantityChange')))
+
+
+def update_stock(api, match, query, body):
+    return api.update_stock(int(match.group(1)), body['quantityChange'])
+
+
+def update_price(api, match, query, body):
+    return api.update_price(int(match.group(1)), body['price'])
+
+
+def place_order(api, match, query, body):
+    return api.place_order(body['productId'], body['quantity'], body['customerName'], body.get('priority', 1))
+
+
+def place_orders(api, match, query, body):
+    return api.place_orders(
+        records_to_items(body, ('productId', 'quantity', 'customerName', 'priority'), {'priority': 1})
+    )
+
+
+def process_orders(api, match, query, body):
+    return api.process_orders(body.get('count', 1))
+
+
+def get_transactions(api, match, query, body):
+    try:
+        result = api.get_transactions(
+            query_arg(query, 'limit', 10, int),
+            query_arg(query, 'after', None, int),
+            query_arg(query, 'before', None, int),
+            query_arg(query, 'order', 'asc') == 'desc',
+            query_arg(query, 'product_id', None, int),
+            query_arg(query, 'start'),
+            query_arg(query, 'end')
+        )
+    except ValueError as e:
+        raise HTTPError(400, f"Invalid time range: {e}")
+    if isinstance(result, dict):
+        # An error, e.g. a ledger id cursor the sharded router cannot page by
+        raise HTTPError(400, result['message'])
+    return result
+
+
+def export_inventory(api, match, query, body):
+    return api.export_inventory(
+        query_arg(query, 'format', 'ndjson'),
+        query_arg(query, 'fields'),
+        query_arg(query, 'category'),
+        query_arg(query, 'low_stock', None, int)
+    )
+
+
+def export_transactions(api, match, query, body):
+    return api.export_transactions(
+        query_arg(query, 'format', 'ndjson'),
+        query_arg(query, 'fields'),
+        query_arg(query, 'product_id', None, int),
+        query_arg(query, 'after', None, int),
+        query_arg(query, 'before', None, int)
+    )
+
+
+def get_changes(api, match, query, body):
+    try:
+        since = parse_cursor(query_arg(query, 'since'))
+    except ValueError:
+        raise HTTPError(400, "since must be a non-negative ledger id")
+    # Waiting for new entries is done by the server on the event loop, not here
+    return api.get_changes(since, query_arg(query, 'limit', 1000, int))
+
+
+def get_movement(api, match, query, body):
+    result = api.get_movement(
+        query_arg(query, 'product_id', None, int),
+        query_arg(query, 'category'),
+        query_arg(query, 'days', 30, int),
+        query_arg(query, 'granularity', 'day')
+    )
+    if result['status'] != 'success':
+        raise HTTPError(400, result['message'])
+    return result
+
+
+def get_low_stock(api, match, query, body):
+    result = api.get_low_stock(
+        query_arg(query, 'threshold', 5, int),
+        query_arg(query, 'mode', 'threshold') == 'projected',
+        query_arg(query, 'lead_time_days', None, float),
+        query_arg(query, 'service_factor', None, float)
+    )
+    if result['status'] != 'success':
+        raise HTTPError(400, result['message'])
+    return result
+
+
+def get_replenishment_plan(api, match, query, body):
+    result = api.get_replenishment_plan(
+        query_arg(query, 'lead_time_days', None, float),
+        query_arg(query, 'service_factor', None, float),
+        query_arg(query, 'cover_days', None, float),
+        query_arg(query, 'limit', 100, int)
+    )
+    if result['status'] != 'success':
+        raise HTTPError(400, result['message'])
+    return result
+
+
+def get_status(api, match, query, body):
+    return api.get_system_status()
+
+
+def calculate_composite_cost(api, match, query, body):
+    return api.calculate_composite_cost(body['components'])
+
+
+def calculate_buildable(api, match, query, body):
+    return api.calculate_buildable(body.get('kits'), body.get('components'))
+
+
+def define_composite(api, match, query, body):
+    return api.define_composite(body['name'], body['components'])
+
+
+# (method, path pattern, handler, kind). "read" handlers are cheap and run on the
+# event loop; "report" handlers build large responses or take locks other threads
+# hold, such as the kit cost lock, and always run on the worker pool; "write" handlers also always run on the pool, since they take stock locks, may
+# wait for a reader holding off writes and may archive or fsync; "bulk" handlers parse
+# and apply large batches on the pool; "stream" handlers return chunks that are
+# produced on the pool and sent as they are ready; "poll" handlers may wait for new
+# ledger entries and "events" routes stream them.
+ROUTES = [
+    ('GET', r'/api/inventory', get_inventory, 'report'),
+    ('POST', r'/api/inventory', add_product, 'write'),
+    ('GET', r'/api/inventory/search', search_products, 'read'),
+    ('POST', r'/api/inventory/bulk', add_products, 'bulk'),
+    ('PUT', r'/api/inventory/bulk', update_stock_bulk, 'bulk'),
+    ('PUT', r'/api/inventory/(\d+)', update_stock, 'write'),
+    ('PUT', r'/api/inventory/(\d+)/price', update_price, 'write'),
+    ('POST', r'/api/orders', place_order, 'write'),
+    ('POST', r'/api/orders/bulk', place_orders, 'bulk'),
+    ('POST', r'/api/orders/process', process_orders, 'write'),
+    ('GET', r'/api/transactions', get_transactions, 'report'),
+    ('GET', r'/api/export/inventory', export_inventory, 'stream'),
+    ('GET', r'/api/export/transactions', export_transactions, 'stream'),
+    ('GET', r'/api/changes', get_changes, 'poll'),
+    ('GET', r'/api/changes/stream', None, 'events'),
+    ('GET', r'/api/movement', get_movement, 'report'),
+    ('GET', r'/api/low-stock', get_low_stock, 'report'),
+    ('GET', r'/api/replenishment', get_replenishment_plan, 'report'),
+    ('GET', r'/api/status', get_status, 'read'),
+    ('POST', r'/api/composite-cost', calculate_composite_cost, 'report'),
+    ('POST', r'/api/composite-buildable', calculate_buildable, 'report'),
+    ('POST', r'/api/composites', define_composite, 'write'),
+]
+ROUTES = [(method, re.compile(pattern + '$'), handler, kind) for method, pattern, handler, kind in ROUTES]
+
+# GET handlers whose serialized responses are cached per state version and support If-None-Match
+CACHED_RESOURCES = {
+    get_inventory: 'inventory',
+    search_products: 'inventory',
+    get_transactions: 'transactions',
+    get_status: 'all',
+}
+
+
+class StreamingBody:
+    def __init__(self, content_type, chunks, headers=None):
+        self.content_type = content_type
+        self.chunks = chunks  # iterator, or async iterator, of text chunks
+        self.headers = headers or {}
+
+
+class AsyncInventoryServer:
+    """HTTP/1.1 server for the inventory API on asyncio streams.
+
+    Connections are kept alive between requests. At most max_concurrency requests
+    are handled at once; further requests wait on a semaphore, so a burst queues
+    instead of piling threads onto the shared API. Handlers that may block run on
+    a thread pool and their responses are JSON-encoded there too.
+    """
+
+    def __init__(self, api, max_concurrency=64, workers=8):
+        self.api = api
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inventory')
+        self.response_cache = ResponseCache()
+        self.ledger_waiters = set()  # asyncio.Events of requests waiting for new ledger entries
+
+    async def serve(self, host, port):
+        loop = asyncio.get_running_loop()
+
+        def on_append(first_id, last_id):
+            # Called on whichever thread appended; only cross into the loop if someone waits
+            if self.ledger_waiters:
+                loop.call_soon_threadsafe(self.wake_ledger_waiters)
+
+        self.api.transaction_ledger.appended.add_listener(on_append)
+        # Reads on the loop never wait for writes in progress; run_inline moves them to the pool instead
+        self.api.snapshot_gate.never_wait()
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break  # client went away or stayed idle too long
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 431, {"error": "Request headers too large"}, keep_alive=False)
+                    break
+
+                try:
+                    method, target, keep_alive, length, headers = self.parse_head(head)
+                    body = await reader.readexactly(length) if length else b''
+                except HTTPError as e:
+                    await self.send(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+
+                async with self.slots:
+                    status, payload, extra_headers = await self.dispatch(method, target, body, headers)
+                if isinstance(payload, StreamingBody):
+                    keep_alive = await self.send_stream(writer, payload) and keep_alive
+                else:
+                    await self.send(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def run_inline(self, function):
+        """Run a cheap call on the loop, or on the pool if its snapshot read would have to wait for writes"""
+        try:
+            return function()
+        except SnapshotBusy:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function)
+
+    def wake_ledger_waiters(self):
+        for event in self.ledger_waiters:
+            event.set()
+
+    async def wait_for_ledger(self, after_id, timeout):
+        """Wait on the event loop until the ledger has an entry with id > after_id or timeout passes"""
+        ledger = self.api.transaction_ledger
+        event = asyncio.Event()
+        self.ledger_waiters.add(event)
+        try:
+            # Checked after registering, so an append racing with registration is not missed
+            if ledger.count <= after_id:
+                await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.ledger_waiters.discard(event)
+        return ledger.count > after_id
+
+    async def long_poll(self, handler, match, query):
+        """Run a change-feed handler, waiting for the ledger to move if there was nothing new"""
+        result = await self.run_inline(lambda: handler(self.api, match, query, None))
+        wait = min(query_arg(query, 'wait', 0, float), MAX_WAIT_SECONDS)
+        if wait > 0 and not result['reset'] and result['cursor'] == parse_cursor(query_arg(query, 'since')):
+            # An idle poll gives up its request slot, so waiting clients never hold off real work
+            self.slots.release()
+            try:
+                changed = await self.wait_for_ledger(result['cursor'], wait)
+            finally:
+                await self.slots.acquire()
+            if changed:
+                result = await self.run_inline(lambda: handler(self.api, match, query, None))
+        return json.dumps(result).encode('utf-8')
+
+    async def change_events(self, since):
+        """Server-sent events for every change after since; each wait is a timer on the loop, not a thread"""
+        cursor = since
+        yield "retry: 2000\n\n"
+        while True:
+            changes = await self.run_inline(lambda: self.api.get_changes(cursor))
+            if not changes['reset'] and changes['cursor'] == cursor:
+                await self.wait_for_ledger(cursor, HEARTBEAT_SECONDS)
+                changes = await self.run_inline(lambda: self.api.get_changes(cursor))
+            cursor, event = next_event(cursor, changes)
+            yield event
+
+    @staticmethod
+    def parse_head(head):
+        """Parse the request line and headers; returns (method, target, keep_alive, content_length, headers)"""
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+        return method, target, keep_alive, length, headers
+
+    async def dispatch(self, method, target, body, headers):
+        """Route one request; returns (status, payload, extra headers).
+
+        The payload is JSON bytes, a StreamingBody or None.
+        """
+        if method == 'OPTIONS':
+            return 204, None, None
+        url = urlsplit(target)
+        for route_method, pattern, handler, kind in ROUTES:
+            match = pattern.match(url.path)
+            if match and route_method == method:
+                break
+        else:
+            return 404, json.dumps({"error": "Not found"}).encode('utf-8'), None
+
+        content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+        resource = CACHED_RESOURCES.get(handler) if method == 'GET' else None
+        if resource is not None:
+            # Read the version before building, so the body is never older than its ETag
+            version = self.api.get_version(resource)
+            etag_headers = {'ETag': make_etag(version)}
+            if etag_matches(headers.get('if-none-match'), etag_headers['ETag']):
+                return 304, None, etag_headers
+
+        def run():
+            if content_type in ('application/x-ndjson', 'application/ndjson'):
+                data = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                data = json.loads(body) if body else {}
+            result = handler(self.api, match, parse_qs(url.query), data)
+            if kind == 'stream':
+                if result.get('status') != 'success':
+                    return 400, json.dumps(result).encode('utf-8')
+                return 200, StreamingBody(result['content_type'], result['chunks'])
+            if isinstance(result, bytes):
+                return 200, result
+            return 200, json.dumps(result).encode('utf-8')
+
+        def run_cached():
+            return 200, self.response_cache.get(target, version, lambda: run()[1])
+
+        try:
+            if kind == 'poll':
+                return 200, await self.long_poll(handler, match, parse_qs(url.query)), None
+            if kind == 'events':
+                # A reconnecting EventSource sends the id of the last event it saw
+                try:
+                    since = parse_cursor(headers.get('last-event-id', query_arg(parse_qs(url.query), 'since')))
+                except ValueError:
+                    raise HTTPError(400, "since must be a non-negative ledger id")
+                return 200, StreamingBody('text/event-stream', self.change_events(since),
+                                          {'Cache-Control': 'no-cache'}), None
+            if resource is not None:
+                if kind == 'report':
+                    return (*await asyncio.get_running_loop().run_in_executor(self.executor, run_cached), etag_headers)
+                return (*await self.run_inline(run_cached), etag_headers)
+            if kind in ('report', 'bulk', 'write'):
+                return (*await asyncio.get_running_loop().run_in_executor(self.executor, run), None)
+            return (*await self.run_inline(run), None)
+        except json.JSONDecodeError as e:
+            return 400, json.dumps({"error": f"Invalid JSON body: {e}"}).encode('utf-8'), None
+        except HTTPError as e:
+            return e.status, json.dumps({"status": "error", "message": str(e)}).encode('utf-8'), None
+        except Exception as e:
+            print(f"Error in {handler.__name__}: {e}")
+            return 500, json.dumps({"error": str(e)}).encode('utf-8'), None
+
+    async def send(self, writer, status, payload, keep_alive, extra_headers=None):
+        if isinstance(payload, dict):
+            payload = json.dumps(payload).encode('utf-8')
+        payload = payload or b''
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            + ''.join(f"{name}: {value}\r\n" for name, value in (extra_headers or {}).items())
+        ).encode('latin-1')
+        writer.write(head + CORS_HEADERS + b"\r\n" + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def send_stream(self, writer, body):
+        """Send a streamed body with chunked transfer encoding; returns False if the connection is unusable.
+
+        Each chunk is produced on the worker pool (or awaited, for async iterators) and
+        written only after the previous one drained, so at most one chunk is held in
+        memory per stream.
+        """
+        head = (
+            f"HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {body.content_type}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            + ''.join(f"{name}: {value}\r\n" for name, value in body.headers.items())
+        ).encode('latin-1')
+        writer.write(head + CORS_HEADERS + b"\r\n")
+        loop = asyncio.get_running_loop()
+        asynchronous = hasattr(body.chunks, '__anext__')
+        chunks = body.chunks if asynchronous else iter(body.chunks)
+        try:
+            while True:
+                if asynchronous:
+                    chunk = await anext(chunks, None)
+                else:
+                    chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:  # an empty chunk would end the body
+                    data = chunk.encode('utf-8')
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            return False
+        except Exception as e:
+            # Too late for an error status; cutting the connection tells the client the body is incomplete
+            print(f"Error while streaming: {e}")
+            return False
+        finally:
+            if asynchronous:
+                await chunks.aclose()
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio server for the Inventory Management System API")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5002)
+    parser.add_argument('--max-concurrency', type=int, default=64, help="requests handled at once")
+    parser.add_argument('--workers', type=int, default=8, help="threads for blocking handlers")
+    args = parser.parse_args()
+
+    api = create_api()
+    server = AsyncInventoryServer(api, args.max_concurrency, args.workers)
+    print(f"Starting Inventory Management System async API on {args.host}:{args.port}...")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if api.persistence is not None:
+            api.persistence.close()
+
+
+if __name__ == "__main__":
+    main()
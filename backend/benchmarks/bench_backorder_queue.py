@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backorder priority queue
+Compares the binary heap against the previous sort-on-insert list
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.order_management import BackorderPriorityQueue
+
+SIZES = [1_000, 10_000, 20_000]
+
+
+class SortedListBackorderQueue:
+    """The previous implementation: append, re-sort, pop(0)"""
+
+    def __init__(self):
+        self.orders = []
+
+    def enqueue(self, order, priority=1):
+        self.orders.append((priority, order))
+        self.orders.sort(key=lambda x: x[0], reverse=True)
+
+    def dequeue(self):
+        if not self.orders:
+            return None
+        return self.orders.pop(0)[1]
+
+
+def make_orders(count):
+    return [({"order_id": i, "priority": random.randint(1, 5)}) for i in range(count)]
+
+
+def run(queue, orders):
+    start = time.perf_counter()
+    for order in orders:
+        queue.enqueue(order, order["priority"])
+    enqueued = time.perf_counter()
+    drained = [queue.dequeue()["order_id"] for _ in orders]
+    end = time.perf_counter()
+    return enqueued - start, end - enqueued, drained
+
+
+def main():
+    random.seed(7)
+    print(f"{'Orders':>8} {'Queue':<12} {'Enqueue all':>12} {'Dequeue all':>12}")
+    print("-" * 48)
+    for size in SIZES:
+        orders = make_orders(size)
+        sorted_times = run(SortedListBackorderQueue(), orders)
+        heap_times = run(BackorderPriorityQueue(), orders)
+        # Both must dequeue in the same order: priority descending, FIFO within a priority
+        assert sorted_times[2] == heap_times[2]
+        for label, times in (("sort-insert", sorted_times), ("heap", heap_times)):
+            print(f"{size:>8} {label:<12} {times[0] * 1000:>10.1f}ms {times[1] * 1000:>10.1f}ms")
+
+        queue = BackorderPriorityQueue()
+        start = time.perf_counter()
+        queue.enqueue_many((order, order["priority"]) for order in orders)
+        print(f"{size:>8} {'heapify':<12} {(time.perf_counter() - start) * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
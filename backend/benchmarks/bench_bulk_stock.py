@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk stock adjustments
+Applies a nightly-sync sized batch of stock deltas one call at a time and through
+update_stock_bulk, at the API and over HTTP (Flask test client), and checks that
+both leave the same stock levels
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI
+
+PRODUCTS = 100_000
+
+
+def build_api():
+    api = InventoryAPI()
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, 50, "General")
+    return api
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--deltas", type=int, default=300_000, help="stock deltas applied at the API")
+    parser.add_argument("--http-deltas", type=int, default=5_000, help="stock deltas sent over HTTP")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    product_ids = range(1, PRODUCTS + 1)
+    deltas = [(rng.choice(product_ids), rng.randint(-20, 20)) for _ in range(args.deltas)]
+
+    single = build_api()
+    start = time.perf_counter()
+    for product_id, quantity_change in deltas:
+        single.update_stock(product_id, quantity_change)
+    single_time = time.perf_counter() - start
+
+    bulk = build_api()
+    start = time.perf_counter()
+    result = bulk.update_stock_bulk(deltas)
+    bulk_time = time.perf_counter() - start
+    assert result["status"] == "success"
+    assert single.get_inventory() == bulk.get_inventory()
+
+    print(f"API: {args.deltas:,} deltas over {PRODUCTS:,} products (stock levels identical)")
+    print(f"{'single':<8} {single_time:>8.2f}s {args.deltas / single_time:>12,.0f} deltas/s")
+    print(f"{'bulk':<8} {bulk_time:>8.2f}s {args.deltas / bulk_time:>12,.0f} deltas/s")
+
+    try:
+        import main as flask_main
+    except ImportError:
+        print("Flask is not installed; skipping the HTTP comparison")
+        return
+    client = flask_main.app.test_client()
+    http_deltas = deltas[:args.http_deltas]
+
+    start = time.perf_counter()
+    for product_id, quantity_change in http_deltas:
+        client.put(f"/api/inventory/{product_id % 10 + 1}", json={"quantityChange": quantity_change})
+    single_time = time.perf_counter() - start
+
+    body = "\n".join(
+        json.dumps({"productId": product_id % 10 + 1, "quantityChange": quantity_change})
+        for product_id, quantity_change in http_deltas
+    )
+    start = time.perf_counter()
+    response = client.put("/api/inventory/bulk", data=body, content_type="application/x-ndjson")
+    bulk_time = time.perf_counter() - start
+    assert response.get_json()["status"] == "success"
+
+    print(f"HTTP: {len(http_deltas):,} deltas")
+    print(f"{'single':<8} {single_time:>8.2f}s {len(http_deltas) / single_time:>12,.0f} deltas/s ({len(http_deltas):,} requests)")
+    print(f"{'bulk':<8} {bulk_time:>8.2f}s {len(http_deltas) / bulk_time:>12,.0f} deltas/s (1 NDJSON request)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: change feed vs full refetch
+Keeps a client replica of a large catalog in sync through the Flask app, either by
+refetching GET /api/inventory after every round of writes or by applying
+GET /api/changes from the last cursor, and checks both replicas end up identical
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRODUCTS = 100_000
+ROUNDS = 30
+WRITES_PER_ROUND = 20
+
+
+def main():
+    import main as flask_main
+    api = flask_main.api
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, 50, "General")
+    flask_main.print = lambda *args, **kwargs: None  # get_inventory logs every full build
+    client = flask_main.app.test_client()
+    rng = random.Random(5)
+    product_ids = range(1, PRODUCTS + 1)
+
+    full_replica = {}
+    feed_replica = {p["id"]: p for p in client.get("/api/inventory").get_json()}
+    cursor = api.transaction_ledger.count
+    full_bytes = feed_bytes = 0
+    full_time = feed_time = 0.0
+
+    for _ in range(ROUNDS):
+        for _ in range(WRITES_PER_ROUND):
+            product_id = rng.choice(product_ids)
+            if rng.random() < 0.8:
+                api.update_stock(product_id, rng.randint(-5, 5) or 1)
+            else:
+                api.place_order(product_id, rng.randint(1, 3), "Benchmark")
+
+        start = time.perf_counter()
+        response = client.get("/api/inventory")
+        full_replica = {p["id"]: p for p in response.get_json()}
+        full_time += time.perf_counter() - start
+        full_bytes += len(response.data)
+
+        start = time.perf_counter()
+        has_more = True
+        while has_more:
+            response = client.get(f"/api/changes?since={cursor}")
+            changes = response.get_json()
+            for product in changes["products"]:
+                feed_replica[product["id"]] = product
+            cursor, has_more = changes["cursor"], changes["has_more"]
+            feed_bytes += len(response.data)
+        feed_time += time.perf_counter() - start
+
+    assert feed_replica == full_replica, "change feed replica diverged"
+    print(f"{ROUNDS} syncs of a {PRODUCTS:,}-product replica, {WRITES_PER_ROUND} writes between syncs (replicas identical)")
+    print(f"{'mode':<16} {'ms/sync':>9} {'bytes':>14}")
+    print(f"{'full refetch':<16} {full_time / ROUNDS * 1000:>9.2f} {full_bytes:>14,}")
+    print(f"{'change feed':<16} {feed_time / ROUNDS * 1000:>9.2f} {feed_bytes:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resident memory of row storage vs. columnar storage
+Measures bytes per product with tracemalloc and times the low-stock scan
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.inventory_manager import InventoryManager
+from src.columnar_inventory import ColumnarInventoryManager
+
+SIZES = [100_000, 1_000_000]
+CATEGORIES = ["Electronics", "Accessories", "Audio", "Storage", "Networking"]
+
+
+def measure(manager_class, size):
+    tracemalloc.start()
+    manager = manager_class()
+    for i in range(size):
+        manager.add_product(f"Product {i}", 9.99 + i % 100, i % 50, CATEGORIES[i % len(CATEGORIES)])
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    low_stock = manager.get_low_stock_report(5)
+    scan_time = time.perf_counter() - start
+    return used, scan_time, len(low_stock)
+
+
+def main():
+    print(f"{'Products':>10} {'Storage':<10} {'Bytes/product':>14} {'Low-stock scan':>15}")
+    print("-" * 52)
+    for size in SIZES:
+        results = {}
+        for label, manager_class in (("list", InventoryManager), ("columnar", ColumnarInventoryManager)):
+            used, scan_time, _ = measure(manager_class, size)
+            results[label] = used
+            print(f"{size:>10} {label:<10} {used / size:>14.1f} {scan_time * 1000:>13.2f}ms")
+        print(f"{'':>10} {'ratio':<10} {results['list'] / results['columnar']:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
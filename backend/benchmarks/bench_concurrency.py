@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent InventoryAPI stress test
+Hammers one shared InventoryAPI from many threads with orders, restocks, new products
+and reports, then checks that no update was lost, no stock went negative and every id is unique
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI, STORAGE_MODES
+
+PRODUCTS = 50  # few products, so threads contend on the same stock
+
+
+def worker(api, seed, operations, placed, restocked, added, violations):
+    rng = random.Random(seed)
+    product_ids = range(1, PRODUCTS + 1)
+    for i in range(operations):
+        r = rng.random()
+        if r < 0.45:
+            result = api.place_order(rng.choice(product_ids), rng.randint(1, 5), f"Customer {seed}-{i}",
+                                     rng.randint(1, 3))
+            placed.append(result["order_id"])
+        elif r < 0.7:
+            api.process_orders(rng.randint(1, 20), batched=rng.random() < 0.5)
+        elif r < 0.82:
+            product_id = rng.choice(product_ids)
+            quantity = rng.randint(1, 10)
+            api.update_stock(product_id, quantity)
+            restocked[product_id] += quantity
+        elif r < 0.88:
+            # Columns grow while other threads report on them
+            quantity = rng.randint(0, 20)
+            added[api.add_product(f"New {seed}-{i}", 4.99, quantity, "General")["product_id"]] = quantity
+        else:
+            for product in api.get_inventory():
+                if product["quantity"] < 0:
+                    violations.append(product)
+            api.get_low_stock(5)
+            for _ in api.export_inventory(category="General")["chunks"]:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=5_000, help="operations per thread")
+    parser.add_argument("--storage", choices=STORAGE_MODES[:2], default="list")
+    args = parser.parse_args()
+
+    # Switch threads far more often than the default 5ms, to shake out races
+    sys.setswitchinterval(1e-6)
+
+    api = InventoryAPI(storage=args.storage)
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, random.randint(0, 20), "General")
+    initial = {product["id"]: product["quantity"] for product in api.get_inventory()}
+
+    placed = []
+    restocks = [Counter() for _ in range(args.threads)]
+    additions = [{} for _ in range(args.threads)]
+    violations = []
+    errors = []
+    threading.excepthook = errors.append  # a worker that raises fails the run below
+    threads = [
+        threading.Thread(target=worker, args=(api, seed, args.operations, placed, restocks[seed], additions[seed],
+                                     violations))
+        for seed in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert not errors, f"{len(errors)} worker threads raised, first: {errors[0].exc_value!r}"
+    restocked = sum(restocks, Counter())
+    for added in additions:
+        initial.update(added)
+    ledger = api.transaction_ledger.get_transaction_history()
+    fulfilled = Counter()
+    for transaction in ledger:
+        if transaction["type"] == "ORDER_FULFILLED":
+            fulfilled[transaction["product_id"]] += transaction["quantity"]
+    delivered = Counter()
+    for order in api.delivery_stack.items:
+        delivered[order["product_id"]] += order["quantity"]
+    final = {product["id"]: product["quantity"] for product in api.get_inventory()}
+
+    # Ids: every order and ledger entry got its own id, with no gaps in the ledger
+    assert len(set(placed)) == len(placed), "duplicate order ids"
+    assert sorted(final) == list(range(1, len(initial) + 1)), "product ids lost or duplicated"
+    # Rows: every column of a product belongs to that product
+    assert all(product["price"] == 4.99 for product in api.get_inventory() if product["name"].startswith("New ")), \
+        "product columns out of step"
+    assert [t["id"] for t in ledger] == list(range(1, api.transaction_ledger.count + 1)), "ledger ids not dense"
+    # Stock: never negative, and nothing lost: final = initial + restocked - fulfilled
+    assert not violations and min(final.values()) >= 0, "negative stock"
+    assert fulfilled == delivered, "ledger and delivery stack disagree"
+    for product_id, quantity in final.items():
+        assert quantity == initial[product_id] + restocked[product_id] - fulfilled[product_id], \
+            f"lost update on product {product_id}"
+    # Orders: each placed order is pending, backordered or delivered exactly once
+    status = api.get_system_status()
+    assert status["pending_orders"] + status["backorders"] + status["items_ready_for_delivery"] == len(placed), \
+        "orders lost or duplicated"
+
+    total = args.threads * args.operations
+    print(f"{args.threads} threads x {args.operations} operations on {PRODUCTS} products ({args.storage} storage)")
+    print(f"{total / elapsed:>12,.0f} operations/s")
+    print(f"{len(placed):>12,} orders placed, {api.transaction_ledger.count:,} ledger entries")
+    print("invariants hold: unique ids, aligned rows, no negative stock, no lost updates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard polling with ETags
+Polls GET /api/inventory and GET /api/status on a large catalog through the Flask app,
+comparing full responses with conditional requests answered 304 from the state version
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRODUCTS = 100_000
+POLLS = 50
+
+
+def poll(client, path, conditional):
+    """Poll a path POLLS times; returns (seconds per poll, bytes transferred, status codes seen)"""
+    etag = None
+    transferred = 0
+    statuses = set()
+    start = time.perf_counter()
+    for _ in range(POLLS):
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        response = client.get(path, headers=headers)
+        etag = response.headers.get("ETag")
+        transferred += len(response.data)
+        statuses.add(response.status_code)
+    return (time.perf_counter() - start) / POLLS, transferred, sorted(statuses)
+
+
+def main():
+    import main as flask_main
+    api = flask_main.api
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, i % 40, "General")
+    flask_main.print = lambda *args, **kwargs: None  # get_inventory logs every full build
+    client = flask_main.app.test_client()
+
+    print(f"{POLLS} polls, {PRODUCTS:,} products, no changes between polls")
+    print(f"{'endpoint':<16} {'mode':<12} {'ms/poll':>9} {'bytes':>14} {'statuses':>12}")
+    for path in ("/api/inventory", "/api/status"):
+        for label, conditional in (("full", False), ("conditional", True)):
+            flask_main.response_cache.entries.clear()
+            per_poll, transferred, statuses = poll(client, path, conditional)
+            print(f"{path:<16} {label:<12} {per_poll * 1000:>9.2f} {transferred:>14,} {str(statuses):>12}")
+
+    # The first full poll rebuilds; later ones are served from the version cache
+    flask_main.response_cache.entries.clear()
+    start = time.perf_counter()
+    client.get("/api/inventory")
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    client.get("/api/inventory")
+    warm = time.perf_counter() - start
+    print(f"/api/inventory full response: {cold * 1000:.1f}ms rebuilt, {warm * 1000:.1f}ms from the cache")
+
+
+if __name__ == "__main__":
+    main()
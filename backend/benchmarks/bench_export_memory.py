@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: export peak memory
+Compares the extra memory needed to serialize the whole catalog and ledger as one
+JSON document against streaming them as NDJSON/CSV chunks
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI
+
+SIZES = [10_000, 100_000, 500_000]
+
+
+def measure(produce):
+    """Run produce() and return (peak bytes allocated above the starting point, seconds)"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    produce()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def consume(chunks):
+    """Drain a stream the way a socket would, keeping nothing"""
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+def main():
+    print(f"{'rows':>9} {'export':<24} {'peak MB':>9} {'time s':>8}")
+    for size in SIZES:
+        api = InventoryAPI()
+        for i in range(size):
+            api.inventory_manager.add_product(f"Product {i}", 9.99, i % 40, f"Category {i % 25}")
+        api.transaction_ledger.add_transactions(
+            ("STOCK_INCREASE", i % size + 1, 5, "Stock adjustment") for i in range(size)
+        )
+
+        cases = [
+            ("inventory json (list)", lambda: json.dumps(api.get_inventory())),
+            ("inventory ndjson stream", lambda: consume(api.export_inventory("ndjson")["chunks"])),
+            ("inventory csv stream", lambda: consume(api.export_inventory("csv")["chunks"])),
+            ("ledger json (list)", lambda: json.dumps(api.get_transactions(limit=None))),
+            ("ledger ndjson stream", lambda: consume(api.export_transactions("ndjson")["chunks"])),
+            ("ledger csv stream", lambda: consume(api.export_transactions("csv")["chunks"])),
+        ]
+        for name, produce in cases:
+            peak, elapsed = measure(produce)
+            print(f"{size:>9,} {name:<24} {peak / 1e6:>9.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
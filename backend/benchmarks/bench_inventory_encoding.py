@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/inventory encoding
+Times building the full inventory response at 100k products by converting every row
+to a dict and encoding the list on each request, against joining cached per-product
+fragments, with one product changed between requests
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import serialization
+from src.api import InventoryAPI
+from src.serialization import ProductFragmentCache
+
+PRODUCTS = 100_000
+REQUESTS = 20
+
+
+def timed(api, build):
+    """Run build() REQUESTS times, changing one product before each; returns (ms per request, last body)"""
+    total = 0.0
+    for i in range(REQUESTS):
+        api.inventory_manager.update_stock(i + 1, 1)
+        start = time.perf_counter()
+        body = build()
+        total += time.perf_counter() - start
+    return total / REQUESTS * 1000, body
+
+
+def main():
+    api = InventoryAPI()
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, i % 40, f"Category {i % 25}")
+
+    cases = [("dicts + json.dumps", lambda: json.dumps(api.get_inventory()).encode("utf-8"))]
+    if serialization.orjson is not None:
+        cases.append(("dicts + orjson", lambda: serialization.orjson.dumps(api.get_inventory())))
+    cases.append(("fragments (json)",
+                  ProductFragmentCache(api.inventory_manager, serialization.stdlib_dumps).encode_inventory))
+    if serialization.orjson is not None:
+        cases.append(("fragments (orjson)",
+                      ProductFragmentCache(api.inventory_manager, serialization.orjson.dumps).encode_inventory))
+
+    print(f"{PRODUCTS:,} products, one product changed before each request (default encoder: {serialization.ENCODER})")
+    print(f"{'approach':<22} {'ms/request':>11} {'bytes':>12}")
+    for name, build in cases:
+        per_request, body = timed(api, build)
+        assert json.loads(body) == api.get_inventory()
+        print(f"{name:<22} {per_request:>11.2f} {len(body):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: product lookup and stock update
+Compares the hash-indexed InventoryManager against a linear scan of the 2D list
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.inventory_manager import InventoryManager
+
+SIZES = [1_000, 100_000, 1_000_000]
+LOOKUPS = 200
+
+
+def scan_get_product_by_id(inventory, product_id):
+    """The previous lookup: walk every row until the id matches"""
+    for product in inventory:
+        if product[0] == product_id:
+            return product
+    return None
+
+
+def scan_update_stock(inventory, product_id, quantity_change):
+    """The previous stock update: walk every row until the id matches"""
+    for product in inventory:
+        if product[0] == product_id:
+            product[3] += quantity_change
+            if product[3] < 0:
+                product[3] = 0
+            return True
+    return False
+
+
+def build_inventory(size):
+    manager = InventoryManager()
+    for i in range(size):
+        manager.add_product(f"Product {i}", 9.99, 100, "General")
+    return manager
+
+
+def time_per_call(func, ids):
+    start = time.perf_counter()
+    for product_id in ids:
+        func(product_id)
+    return (time.perf_counter() - start) / len(ids)
+
+
+def main():
+    random.seed(42)
+    print(f"{'Products':>10} {'Operation':<14} {'List scan':>12} {'Hash index':>12} {'Speedup':>10}")
+    print("-" * 62)
+    for size in SIZES:
+        manager = build_inventory(size)
+        ids = [random.randint(1, size) for _ in range(LOOKUPS)]
+
+        rows = [
+            ("lookup",
+             lambda pid: scan_get_product_by_id(manager.inventory, pid),
+             manager.get_product_by_id),
+            ("update_stock",
+             lambda pid: scan_update_stock(manager.inventory, pid, -1),
+             lambda pid: manager.update_stock(pid, -1)),
+        ]
+        for label, scan, indexed in rows:
+            scan_time = time_per_call(scan, ids)
+            index_time = time_per_call(indexed, ids)
+            print(f"{size:>10} {label:<14} {scan_time * 1e6:>10.2f}us {index_time * 1e6:>10.2f}us "
+                  f"{scan_time / index_time:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
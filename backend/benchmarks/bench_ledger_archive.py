@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ledger cold-tier archive
+Compares a ledger that keeps every segment in memory with one that archives all but
+the newest segments to compressed files, for resident memory, a product's latest
+entries, a product's full history and a narrow time range, counting the archive
+files each query had to decode
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ledger_archive import LedgerArchive
+from src.transaction_ledger import TransactionLedger, parse_timestamp
+
+ENTRIES = 1_000_000
+PRODUCTS = 5000
+QUERIES = 50
+
+
+def fill(ledger):
+    """Append ENTRIES order entries, one microsecond apart, across PRODUCTS products"""
+    clock = iter(range(1_700_000_000_000_000, 1_700_000_000_000_000 + ENTRIES))
+    ledger.clock = clock.__next__
+    for order_id in range(1, ENTRIES // 2 + 1):
+        product_id = order_id % PRODUCTS + 1
+        ledger.add_transaction("ORDER_PLACED", product_id, 2, ("Order #{order_id} by {0}", "Customer"), order_id)
+        ledger.add_transaction("ORDER_FULFILLED", product_id, 2, ("Order #{order_id}",), order_id)
+
+
+def timed(archive, query):
+    """Run query() QUERIES times; returns (ms per query, archive files decoded per query)"""
+    loads = archive.loads if archive is not None else 0
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        query(i)
+    elapsed = time.perf_counter() - start
+    decoded = (archive.loads - loads) / QUERIES if archive is not None else 0
+    return elapsed / QUERIES * 1000, decoded
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="ledger-archive-")
+    print(f"{ENTRIES:,} entries across {PRODUCTS:,} products")
+    print(f"{'ledger':<10} {'query':<24} {'ms/query':>10} {'files/query':>12}")
+    for name, archive in (("memory", None), ("archived", LedgerArchive(directory))):
+        tracemalloc.start()
+        ledger = TransactionLedger(archive=archive)
+        fill(ledger)
+        resident = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        first = parse_timestamp(ledger.get_transaction(1)["timestamp"])
+        middle = parse_timestamp(ledger.get_transaction(ENTRIES // 2)["timestamp"])
+        queries = [
+            ("latest 20 of product", lambda i: ledger.get_transactions_by_product(i % PRODUCTS + 1, 20)),
+            ("all of product", lambda i: list(ledger.iter_product_ids(i % PRODUCTS + 1))),
+            ("1,000 entries by time", lambda i: list(ledger.iter_time_range(middle, middle + 1000))),
+            ("product by time", lambda i: list(ledger.iter_time_range(first, middle, i % PRODUCTS + 1))),
+        ]
+        print(f"{name:<10} {'resident MB':<24} {resident / 1e6:>10.1f}")
+        for label, query in queries:
+            per_query, decoded = timed(archive, query)
+            print(f"{name:<10} {label:<24} {per_query:>10.3f} {decoded:>12.1f}")
+
+    files = os.listdir(directory)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+    print(f"archive: {len(files)} files, {size / 1e6:.1f} MB on disk")
+
+
+if __name__ == "__main__":
+    main()
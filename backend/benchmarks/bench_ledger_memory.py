@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ledger entry size and append latency
+Compares the compact column-wise ledger with storing one dict per entry (ISO timestamp
+string and formatted details, as the ledger used to), for memory per entry and for
+appending the entries an order creates
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.transaction_ledger import TransactionLedger
+
+ENTRIES = 500_000
+
+
+class DictLedger:
+    """One dict per entry, with the timestamp and details formatted on append"""
+
+    def __init__(self):
+        self.entries = []
+
+    def add_transaction(self, transaction_type, product_id, quantity, details="", order_id=None):
+        from datetime import datetime
+        if type(details) is tuple:
+            template, *args = details
+            details = template.format(*args, order_id=order_id)
+        self.entries.append({
+            "id": len(self.entries) + 1,
+            "timestamp": datetime.now().isoformat(),
+            "type": transaction_type,
+            "product_id": product_id,
+            "quantity": quantity,
+            "details": details,
+            "order_id": order_id
+        })
+
+
+def order_entries(ledger, count):
+    """Append the entries of count orders: each is placed, then fulfilled"""
+    for order_id in range(1, count // 2 + 1):
+        product_id = order_id % 5000 + 1
+        ledger.add_transaction("ORDER_PLACED", product_id, 2, ("Order #{order_id} by {0}", "Customer"), order_id)
+        ledger.add_transaction("ORDER_FULFILLED", product_id, 2, ("Order #{order_id}",), order_id)
+
+
+def measure(ledger_class):
+    """Returns (bytes per entry, microseconds per append) for ENTRIES order entries"""
+    tracemalloc.start()
+    ledger = ledger_class()
+    order_entries(ledger, ENTRIES)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    ledger = ledger_class()
+    start = time.perf_counter()
+    order_entries(ledger, ENTRIES)
+    elapsed = time.perf_counter() - start
+    return size / ENTRIES, elapsed / ENTRIES * 1e6
+
+
+def main():
+    print(f"{ENTRIES:,} entries from placing and fulfilling orders")
+    print(f"{'ledger':<16} {'bytes/entry':>12} {'us/append':>10}")
+    for name, ledger_class in (("dict per entry", DictLedger), ("compact", TransactionLedger)):
+        per_entry, per_append = measure(ledger_class)
+        print(f"{name:<16} {per_entry:>12.0f} {per_append:>10.2f}")
+
+    ledger = TransactionLedger()
+    order_entries(ledger, 1000)
+    start = time.perf_counter()
+    history = ledger.get_transaction_history()
+    print(f"reading back 1,000 entries as dicts: {(time.perf_counter() - start) * 1000:.2f}ms, e.g. {history[0]}")
+
+
+if __name__ == "__main__":
+    main()
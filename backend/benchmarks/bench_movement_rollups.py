@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: 30-day movement queries
+Times "units in and out for one product over the last 30 days, per day" answered by
+scanning the ledger, by reading the product's posting list, and from the movement
+rollups, and the cost the rollups add to each ledger append
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.movement_rollups import ROLLUP_TYPES, MovementRollups
+from src.transaction_ledger import TransactionLedger, parse_timestamp
+
+ENTRIES = 1_000_000
+PRODUCTS = 2000
+DAYS = 30
+QUERIES = 20
+TYPES = ("STOCK_INCREASE", "STOCK_DECREASE", "ORDER_PLACED", "ORDER_FULFILLED", "BACKORDER_CREATED")
+
+
+def fill(ledger, now):
+    """Append ENTRIES entries spread evenly over the DAYS days before now; returns seconds taken"""
+    step = DAYS * 86400 * 1_000_000 // ENTRIES
+    clock = iter(range(now - DAYS * 86400 * 1_000_000, now, step))
+    ledger.clock = clock.__next__
+    start = time.perf_counter()
+    for i in range(ENTRIES):
+        ledger.add_transaction(TYPES[i % len(TYPES)], i * 7919 % PRODUCTS + 1, i % 5 + 1, "Stock adjustment")
+    return time.perf_counter() - start
+
+
+def daily_totals(entries, now):
+    """Per-day totals of (timestamp, type, quantity) entries over the DAYS days up to now"""
+    last_day = now // 1_000_000 // 86400
+    days = {}
+    for timestamp, transaction_type, quantity in entries:
+        day = timestamp // 1_000_000 // 86400
+        if transaction_type in ROLLUP_TYPES and day > last_day - DAYS:
+            totals = days.setdefault(day, [0] * (2 * len(ROLLUP_TYPES)))
+            slot = ROLLUP_TYPES.index(transaction_type)
+            totals[slot] += 1
+            totals[slot + len(ROLLUP_TYPES)] += quantity
+    return days
+
+
+def scan_ledger(ledger, product_id, now):
+    return daily_totals(((parse_timestamp(entry["timestamp"]), entry["type"], entry["quantity"])
+                         for entry in ledger.iter_range(1, ledger.count) if entry["product_id"] == product_id), now)
+
+
+def scan_postings(ledger, product_id, now):
+    return daily_totals(((parse_timestamp(entry["timestamp"]), entry["type"], entry["quantity"])
+                         for entry in ledger.get_transactions_by_product(product_id)), now)
+
+
+def timed(query, queries):
+    start = time.perf_counter()
+    for i in range(queries):
+        result = query(i % PRODUCTS + 1)
+    return (time.perf_counter() - start) / queries * 1000, result
+
+
+def main():
+    now = (time.time_ns() // 1000) // (86400 * 1_000_000) * (86400 * 1_000_000)  # midnight UTC
+    plain = TransactionLedger()
+    plain_seconds = fill(plain, now)
+    ledger = TransactionLedger()
+    rollups = MovementRollups()
+    rollups.attach(ledger, lambda product_id: f"Category {product_id % 25}")
+    rolled_seconds = fill(ledger, now)
+
+    print(f"{ENTRIES:,} entries over {DAYS} days across {PRODUCTS:,} products")
+    print(f"append: {plain_seconds / ENTRIES * 1e6:.2f}us without rollups, "
+          f"{rolled_seconds / ENTRIES * 1e6:.2f}us with")
+    print(f"{'approach':<16} {'ms/query':>10}")
+
+    def from_rollups(product_id):
+        return {start // 1_000_000 // 86400: totals
+                for start, totals in rollups.movement("day", DAYS, product_id, now=now - 1) if totals}
+
+    cases = (("ledger scan", scan_ledger, 2), ("posting list", scan_postings, QUERIES), ("rollups", None, QUERIES))
+    for name, scan, queries in cases:
+        query = from_rollups if scan is None else (lambda product_id, scan=scan: scan(ledger, product_id, now - 1))
+        per_query, result = timed(query, queries)
+        assert result == scan_postings(ledger, (queries - 1) % PRODUCTS + 1, now - 1)
+        print(f"{name:<16} {per_query:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
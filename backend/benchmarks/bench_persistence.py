@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: write-ahead log throughput and recovery time
+Measures logged writes/sec per fsync policy, then snapshot + WAL-tail recovery
+time for a large ledger (pass --ledger-size 10000000 for the full-size run)
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI
+from src.persistence import PersistenceEngine
+
+POLICIES = [
+    ("always", 1, 2_000),
+    ("batch", 16, 20_000),
+    ("batch", 256, 50_000),
+    ("never", 256, 50_000),
+]
+
+
+def bench_writes(directory):
+    print(f"{'Policy':<8} {'Batch':>6} {'Writes':>8} {'Writes/sec':>12}")
+    print("-" * 38)
+    for policy, batch_size, writes in POLICIES:
+        path = os.path.join(directory, f"writes-{policy}-{batch_size}")
+        engine = PersistenceEngine(path, fsync_policy=policy, batch_size=batch_size, snapshot_every=10 ** 9)
+        api = InventoryAPI(persistence=engine)
+        start = time.perf_counter()
+        for i in range(writes):
+            api.update_stock(i % 10 + 1, 1)
+        engine.close()
+        elapsed = time.perf_counter() - start
+        print(f"{policy:<8} {batch_size:>6} {writes:>8} {writes / elapsed:>12,.0f}")
+
+
+def bench_recovery(directory, ledger_size, tail):
+    path = os.path.join(directory, "recovery")
+    engine = PersistenceEngine(path, fsync_policy="never", batch_size=4096, snapshot_every=10 ** 9)
+    api = InventoryAPI(persistence=engine)
+
+    # Fill the ledger directly, then snapshot it so recovery starts from there
+    api.transaction_ledger.add_transactions(
+        ("STOCK_INCREASE", i % 10 + 1, 1, "Stock adjustment") for i in range(ledger_size)
+    )
+    start = time.perf_counter()
+    engine.snapshot()
+    snapshot_time = time.perf_counter() - start
+    for i in range(tail):
+        api.update_stock(i % 10 + 1, 1)
+    engine.close()
+    snapshot_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+                         if name.startswith("snapshot-"))
+    del api
+
+    start = time.perf_counter()
+    recovered = InventoryAPI(persistence=PersistenceEngine(path, snapshot_every=10 ** 9))
+    recovery_time = time.perf_counter() - start
+    assert recovered.transaction_ledger.count == ledger_size + tail
+
+    print(f"\nLedger of {ledger_size:,} entries + {tail:,}-record WAL tail")
+    print(f"snapshot write  {snapshot_time:>8.2f}s  ({snapshot_bytes / 1e6:,.1f} MB)")
+    print(f"recovery        {recovery_time:>8.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ledger-size", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=10_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="inventory-wal-bench-")
+    try:
+        bench_writes(directory)
+        bench_recovery(directory, args.ledger_size, args.tail)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Benchmark: order fulfillment throughput
+Compares sequential process_orders against the batched fulfillment path
+and checks that both produce identical results
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI
+
+PRODUCTS = 10_000
+ORDERS = 100_000
+
+
+def build_api(seed):
+    random.seed(seed)
+    api = InventoryAPI()
+    for i in range(PRODUCTS):
+        api.inventory_manager.add_product(f"Product {i}", 9.99, random.randint(0, 40), "General")
+    product_ids = range(1, api.inventory_manager.next_id)
+    for i in range(ORDERS):
+        api.place_order(random.choice(product_ids), random.randint(1, 5), f"Customer {i}", random.randint(1, 3))
+    return api
+
+
+def run(batched):
+    api = build_api(seed=3)
+    start = time.perf_counter()
+    result = api.process_orders(ORDERS, batched=batched)
+    elapsed = time.perf_counter() - start
+    return api, result, elapsed
+
+
+def snapshot(api, result):
+    """Everything the two paths must agree on"""
+    return (
+        [(order["order_id"], order["status"]) for order in result["processed_orders"]],
+        [list(product) for product in api.inventory_manager.get_inventory_report()],
+        [(t["id"], t["type"], t["product_id"], t["quantity"], t["details"])
+         for t in api.transaction_ledger.get_transaction_history()],
+        [api.backorder_queue.dequeue()["order_id"] for _ in range(api.backorder_queue.size())],
+        [item["order_id"] for item in api.delivery_stack.items],
+    )
+
+
+def main():
+    sequential_api, sequential_result, sequential_time = run(batched=False)
+    batched_api, batched_result, batched_time = run(batched=True)
+    assert snapshot(sequential_api, sequential_result) == snapshot(batched_api, batched_result)
+
+    print(f"{ORDERS} orders over {PRODUCTS} products (results identical)")
+    print(f"{'sequential':<12} {sequential_time * 1000:>10.1f}ms {ORDERS / sequential_time:>12,.0f} orders/s")
+    print(f"{'batched':<12} {batched_time * 1000:>10.1f}ms {ORDERS / batched_time:>12,.0f} orders/s")
+    print(f"{'speedup':<12} {sequential_time / batched_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark: nightly replenishment run
+Times each stage of forecasting demand and planning orders for a whole catalog, from
+the daily movement rollups to the projected low-stock report, vectorized with NumPy
+and in pure Python
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import replenishment
+from src.columnar_inventory import ColumnarInventoryManager
+from src.movement_rollups import BACKORDERED_SLOT, FULFILLED_SLOT, BucketSeries, MovementRollups
+from src.replenishment import DemandForecast, demand_history, due_positions
+from src.transaction_ledger import TransactionLedger
+
+SIZES = [100_000, 1_000_000]
+SALES_DAYS = 8  # days with sales per product in the 28-day history
+LAST_DAY = 20_000
+
+
+def build(size):
+    """A columnar catalog of size products and daily rollups with a few days of sales each"""
+    rng = random.Random(size)
+    manager = ColumnarInventoryManager()
+    rollups = MovementRollups()
+    rollups.attach(TransactionLedger(), lambda product_id: None)
+    daily = rollups.by_product["day"]
+    for i in range(size):
+        product_id = manager.add_product(f"Product {i}", 9.99, rng.randrange(200), "Catalog")
+        series = daily[product_id] = BucketSeries()
+        for day in sorted(rng.sample(range(LAST_DAY - 27, LAST_DAY + 1), SALES_DAYS)):
+            series.add(day, FULFILLED_SLOT, 3, rng.randrange(1, 20))
+            if day % 5 == 0:
+                series.add(day, BACKORDERED_SLOT, 1, rng.randrange(1, 5))
+    return manager, rollups
+
+
+def run(manager, rollups):
+    """Run every stage once; returns [(stage, seconds)] and the number of products due"""
+    timings = []
+    start = time.perf_counter()
+    product_ids = list(manager.ids)
+    stock = list(manager.quantities)
+    history = demand_history(rollups, product_ids, LAST_DAY)
+    timings.append(("read history", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    forecast = DemandForecast(product_ids, history)
+    timings.append(("forecast", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    plan = forecast.plan(stock)
+    due = due_positions(plan)
+    timings.append(("plan orders", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    reorder_points, _ = forecast.reorder_points()
+    low = manager.get_low_stock_report(5, reorder_points)
+    timings.append(("projected low stock", time.perf_counter() - start))
+    assert len(low) >= len(due)
+    return timings, len(due)
+
+
+def main():
+    numpy = replenishment.np
+    print(f"{'Products':>10} {'Path':<8} {'Stage':<20} {'Seconds':>9}")
+    print("-" * 50)
+    for size in SIZES:
+        manager, rollups = build(size)
+        paths = [("numpy", numpy)] if numpy is not None else []
+        if size <= 100_000 or numpy is None:
+            paths.append(("python", None))
+        for label, module in paths:
+            replenishment.np = module
+            timings, due = run(manager, rollups)
+            for stage, seconds in timings:
+                print(f"{size:>10} {label:<8} {stage:<20} {seconds:>9.3f}")
+            total = sum(seconds for _, seconds in timings)
+            print(f"{size:>10} {label:<8} {'total':<20} {total:>9.3f}  ({due:,} due)")
+        replenishment.np = numpy
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sharded inventory throughput
+Drives one in-process InventoryAPI and ShardedInventoryAPIs of several sizes from many
+client threads, with batched restocks and orders and with single stock updates, and
+reports operations per second. Shards only add throughput with a core for each of them.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api import InventoryAPI
+from src.sharding import ShardedInventoryAPI
+
+PRODUCTS = 20_000
+BATCH = 500
+
+
+def bulk_worker(api, product_ids, seed, batches):
+    rng = random.Random(seed)
+    for _ in range(batches):
+        api.update_stock_bulk([(rng.choice(product_ids), rng.randint(1, 10)) for _ in range(BATCH)])
+        api.place_orders([(rng.choice(product_ids), rng.randint(1, 5), f"Customer {seed}", rng.randint(1, 3))
+                          for _ in range(BATCH)])
+        api.process_orders(BATCH)
+
+
+def single_worker(api, product_ids, seed, operations):
+    rng = random.Random(seed)
+    for _ in range(operations):
+        api.update_stock(rng.choice(product_ids), rng.randint(1, 10))
+
+
+def measure(api, product_ids, target, threads, units, per_unit):
+    """Run target in threads threads; returns operations per second"""
+    workers = [threading.Thread(target=target, args=(api, product_ids, seed, units)) for seed in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * units * per_unit / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batches", type=int, default=10, help="bulk rounds per thread")
+    parser.add_argument("--operations", type=int, default=2_000, help="single updates per thread")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.threads} client threads, {PRODUCTS:,} products")
+    print(f"{'API':<14} {'Bulk ops/s':>12} {'Single ops/s':>13}")
+    print("-" * 41)
+    configurations = [("in-process", None)] + [(f"{shards} shards", shards) for shards in args.shards]
+    for label, shards in configurations:
+        api = InventoryAPI() if shards is None else ShardedInventoryAPI(shards)
+        try:
+            added = api.add_products([(f"Product {i}", 9.99, 50, "Bench") for i in range(PRODUCTS)])
+            product_ids = [result["product_id"] for result in added["results"]]
+            # A round is a restock batch, an order batch and processing that many orders
+            bulk = measure(api, product_ids, bulk_worker, args.threads, args.batches, 3 * BATCH)
+            single = measure(api, product_ids, single_worker, args.threads, args.operations, 1)
+        finally:
+            if shards is not None:
+                api.close()
+        print(f"{label:<14} {bulk:>12,.0f} {single:>13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
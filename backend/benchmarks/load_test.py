@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTTP load test of the Flask and asyncio entry points
+Starts main.py's Flask app and async_main.py on local ports, drives each with the
+same request mix from many concurrent keep-alive clients, and reports requests/sec
+and latency percentiles
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    # Flask's threaded dev server, as main.py runs it but without the debug reloader
+    "flask": lambda port: [sys.executable, "-c", f"import main; main.app.run(port={port}, threaded=True)"],
+    "asyncio": lambda port: [sys.executable, "async_main.py", "--host", "127.0.0.1", "--port", str(port)],
+}
+
+
+def request_mix(rng):
+    """Pick the next request: (method, path, JSON body or None)"""
+    r = rng.random()
+    if r < 0.4:
+        return "GET", "/api/status", None
+    if r < 0.6:
+        return "GET", "/api/inventory", None
+    if r < 0.75:
+        return "GET", f"/api/inventory/search?q={rng.choice('aeiou')}&limit=10", None
+    if r < 0.85:
+        return "GET", "/api/transactions?order=desc&limit=20", None
+    return "POST", "/api/orders", {"productId": rng.randint(1, 15), "quantity": rng.randint(1, 3),
+                                   "customerName": "Load Test", "priority": rng.randint(1, 3)}
+
+
+async def client(port, seed, deadline, latencies, errors):
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        method, path, body = request_mix(rng)
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(
+                f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: keep-alive\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                + payload
+            )
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+            status = int(head.split(" ", 2)[1])
+            length = 0
+            for line in head.split("\r\n"):
+                if line.startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+            # Servers that do not keep connections alive close them after each response
+            if "connection: close" in head or head.startswith("http/1.0"):
+                writer.close()
+                writer = None
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, connections, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, seed, deadline, latencies, errors) for seed in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/status", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per server")
+    parser.add_argument("--port", type=int, default=5101, help="first port to run the servers on")
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    print(f"{args.connections} connections, {args.duration:.0f}s per server")
+    print(f"{'server':<10} {'requests':>10} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for offset, name in enumerate(args.servers):
+        port = args.port + offset
+        process = subprocess.Popen(SERVERS[name](port), cwd=BACKEND_DIR,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(port)
+            latencies, errors, elapsed = asyncio.run(drive(port, args.connections, args.duration))
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        print(f"{name:<10} {len(latencies):>10,} {len(latencies) / elapsed:>10,.0f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
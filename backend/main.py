@@ -3,7 +3,9 @@
 Main entry point for the Inventory Management System with Flask API
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
+import atexit
+import json
 import os
 import sys
 
@@ -15,8 +17,40 @@ app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
 
 # Initialize the API
 try:
-    from src.api import InventoryAPI
-    api = InventoryAPI()
+    from src.api import InventoryAPI, records_to_items
+    from src.response_cache import ResponseCache
+    from src.change_feed import MAX_WAIT_SECONDS, iter_change_events, parse_cursor
+    response_cache = ResponseCache()
+    shards = int(os.environ.get('INVENTORY_SHARDS', '0'))
+    if shards:
+        # Each shard is a worker process with its own manager, ledger and data directory
+        from src.sharding import ShardedInventoryAPI
+        api = ShardedInventoryAPI(
+            shards,
+            storage=os.environ.get('INVENTORY_STORAGE', 'list'),
+            data_dir=os.environ.get('INVENTORY_DATA_DIR'),
+            fsync_policy=os.environ.get('INVENTORY_FSYNC', 'batch'),
+            fsync_batch=int(os.environ.get('INVENTORY_FSYNC_BATCH', '64')),
+            ledger_archive=os.environ.get('INVENTORY_LEDGER_ARCHIVE')
+        )
+        atexit.register(api.close)
+    else:
+        persistence = None
+        if os.environ.get('INVENTORY_DATA_DIR'):
+            from src.persistence import PersistenceEngine
+            persistence = PersistenceEngine(
+                os.environ['INVENTORY_DATA_DIR'],
+                fsync_policy=os.environ.get('INVENTORY_FSYNC', 'batch'),
+                batch_size=int(os.environ.get('INVENTORY_FSYNC_BATCH', '64'))
+            )
+            atexit.register(persistence.close)
+        api = InventoryAPI(
+            storage=os.environ.get('INVENTORY_STORAGE', 'list'),
+            persistence=persistence,
+            storage_path=os.environ.get('INVENTORY_MMAP_PATH'),
+            readonly=bool(int(os.environ.get('INVENTORY_MMAP_READONLY', '0'))),
+            ledger_archive=os.environ.get('INVENTORY_LEDGER_ARCHIVE')
+        )
     print("✓ API initialized successfully")
 except ImportError as e:
     print(f"✗ Error importing API: {e}")
@@ -47,6 +81,37 @@ def handle_preflight():
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, OPTIONS'
         return response
 
+def read_bulk_items():
+    """Read a bulk request body: a JSON array, or NDJSON with one item per line"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        return [json.loads(line) for line in request.get_data().splitlines() if line.strip()]
+    return request.get_json()
+
+class RejectedRequest(Exception):
+    """Raised while building a response to answer 400 with an API error result instead"""
+
+    def __init__(self, result):
+        super().__init__(result["message"])
+        self.result = result
+
+def cached_json(resource, build, encoded=False):
+    """Serve a read endpoint from the response cache, answering If-None-Match with 304.
+
+    build returns the payload, or its JSON bytes when encoded is set.
+    """
+    if not hasattr(api, 'get_version'):
+        return jsonify(build())
+    # Read the version before building, so the body is never older than its ETag
+    version = api.get_version(resource)
+    if request.if_none_match.contains_weak(version):
+        response = Response(status=304)
+    else:
+        render = build if encoded else lambda: app.json.dumps(build())
+        body = response_cache.get(request.full_path, version, render)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(version)
+    return response
+
 # Serve React App
 @app.route('/')
 def serve_react_app():
@@ -60,13 +125,29 @@ def serve_static_files(path):
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
     try:
-        inventory_data = api.get_inventory()
-        print(f"Returning inventory data: {len(inventory_data)} items")
-        return jsonify(inventory_data)
+        if not hasattr(api, 'get_inventory_json'):
+            return jsonify(api.get_inventory())
+        def build():
+            inventory_json = api.get_inventory_json()
+            print(f"Returning inventory data: {len(inventory_json)} bytes")
+            return inventory_json
+        return cached_json('inventory', build, encoded=True)
     except Exception as e:
         print(f"Error in get_inventory: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/inventory/search', methods=['GET'])
+def search_products():
+    try:
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', 20, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        prefix = request.args.get('prefix', 'false').lower() in ('1', 'true')
+        return cached_json('inventory', lambda: api.search_products(query, limit, offset, prefix))
+    except Exception as e:
+        print(f"Error in search_products: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/inventory', methods=['POST'])
 def add_product():
     try:
@@ -83,6 +164,24 @@ def add_product():
         print(f"Error in add_product: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/inventory/bulk', methods=['POST'])
+def add_products():
+    try:
+        items = records_to_items(read_bulk_items(), ('name', 'price', 'quantity', 'category'))
+        return jsonify(api.add_products(items))
+    except Exception as e:
+        print(f"Error in add_products: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/inventory/bulk', methods=['PUT'])
+def update_stock_bulk():
+    try:
+        items = records_to_items(read_bulk_items(), ('productId', 'quantityChange'))
+        return jsonify(api.update_stock_bulk(items))
+    except Exception as e:
+        print(f"Error in update_stock_bulk: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/inventory/<int:product_id>', methods=['PUT'])
 def update_stock(product_id):
     try:
@@ -93,6 +192,16 @@ def update_stock(product_id):
         print(f"Error in update_stock: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/inventory/<int:product_id>/price', methods=['PUT'])
+def update_price(product_id):
+    try:
+        data = request.get_json()
+        result = api.update_price(product_id, data['price'])
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in update_price: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/orders', methods=['POST'])
 def place_order():
     try:
@@ -108,6 +217,17 @@ def place_order():
         print(f"Error in place_order: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/orders/bulk', methods=['POST'])
+def place_orders():
+    try:
+        items = records_to_items(
+            read_bulk_items(), ('productId', 'quantity', 'customerName', 'priority'), {'priority': 1}
+        )
+        return jsonify(api.place_orders(items))
+    except Exception as e:
+        print(f"Error in place_orders: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/orders/process', methods=['POST'])
 def process_orders():
     try:
@@ -123,15 +243,145 @@ def process_orders():
 def get_transactions():
     try:
         limit = request.args.get('limit', 10, type=int)
-        return jsonify(api.get_transactions(limit))
+        after_id = request.args.get('after', type=int)
+        before_id = request.args.get('before', type=int)
+        latest = request.args.get('order', 'asc') == 'desc'
+        product_id = request.args.get('product_id', type=int)
+        start = request.args.get('start')
+        end = request.args.get('end')
+
+        def build():
+            transactions = api.get_transactions(limit, after_id, before_id, latest, product_id, start, end)
+            if isinstance(transactions, dict):
+                # An error, e.g. a ledger id cursor the sharded router cannot page by
+                raise RejectedRequest(transactions)
+            return transactions
+        return cached_json('transactions', build)
+    except RejectedRequest as e:
+        return jsonify(e.result), 400
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid time range: {e}"}), 400
     except Exception as e:
         print(f"Error in get_transactions: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/export/inventory', methods=['GET'])
+def export_inventory():
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        result = api.export_inventory(
+            fmt,
+            request.args.get('fields'),
+            request.args.get('category'),
+            request.args.get('low_stock', type=int)
+        )
+        if result['status'] != 'success':
+            return jsonify(result), 400
+        # A generator body is streamed as it is produced, so memory stays flat
+        return Response(result['chunks'], mimetype=result['content_type'],
+                        headers={'Content-Disposition': f'attachment; filename=inventory.{fmt}'})
+    except Exception as e:
+        print(f"Error in export_inventory: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/export/transactions', methods=['GET'])
+def export_transactions():
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        result = api.export_transactions(
+            fmt,
+            request.args.get('fields'),
+            request.args.get('product_id', type=int),
+            request.args.get('after', type=int),
+            request.args.get('before', type=int)
+        )
+        if result['status'] != 'success':
+            return jsonify(result), 400
+        return Response(result['chunks'], mimetype=result['content_type'],
+                        headers={'Content-Disposition': f'attachment; filename=transactions.{fmt}'})
+    except Exception as e:
+        print(f"Error in export_transactions: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    try:
+        try:
+            since = parse_cursor(request.args.get('since'))
+        except ValueError:
+            return jsonify({"status": "error", "message": "since must be a non-negative ledger id"}), 400
+        wait = min(request.args.get('wait', 0, type=float), MAX_WAIT_SECONDS)
+        return jsonify(api.get_changes(since, request.args.get('limit', 1000, type=int), wait))
+    except Exception as e:
+        print(f"Error in get_changes: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    try:
+        try:
+            # A reconnecting EventSource sends the id of the last event it saw
+            since = parse_cursor(request.headers.get('Last-Event-ID', request.args.get('since')))
+        except ValueError:
+            return jsonify({"status": "error", "message": "since must be a non-negative ledger id"}), 400
+        return Response(iter_change_events(api, since), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception as e:
+        print(f"Error in stream_changes: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/movement', methods=['GET'])
+def get_movement():
+    try:
+        result = api.get_movement(
+            request.args.get('product_id', type=int),
+            request.args.get('category'),
+            request.args.get('days', 30, type=int),
+            request.args.get('granularity', 'day')
+        )
+        if result['status'] != 'success':
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in get_movement: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/low-stock', methods=['GET'])
+def get_low_stock():
+    try:
+        result = api.get_low_stock(
+            request.args.get('threshold', 5, type=int),
+            request.args.get('mode', 'threshold') == 'projected',
+            request.args.get('lead_time_days', type=float),
+            request.args.get('service_factor', type=float)
+        )
+        if result['status'] != 'success':
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in get_low_stock: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/replenishment', methods=['GET'])
+def get_replenishment_plan():
+    try:
+        result = api.get_replenishment_plan(
+            request.args.get('lead_time_days', type=float),
+            request.args.get('service_factor', type=float),
+            request.args.get('cover_days', type=float),
+            request.args.get('limit', 100, type=int)
+        )
+        if result['status'] != 'success':
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in get_replenishment_plan: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     try:
-        return jsonify(api.get_system_status())
+        return cached_json('all', api.get_system_status)
     except Exception as e:
         print(f"Error in get_status: {e}")
         return jsonify({"error": str(e)}), 500
@@ -146,6 +396,26 @@ def calculate_composite_cost():
         print(f"Error in calculate_composite_cost: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/composite-buildable', methods=['POST'])
+def calculate_buildable():
+    try:
+        data = request.get_json() or {}
+        result = api.calculate_buildable(data.get('kits'), data.get('components'))
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in calculate_buildable: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/composites', methods=['POST'])
+def define_composite():
+    try:
+        data = request.get_json()
+        result = api.define_composite(data['name'], data['components'])
+        return jsonify(result)
+    except Exception as e:
+        print(f"Error in define_composite: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/debug', methods=['GET'])
 def debug_info():
     """Debug endpoint to check what's working"""
@@ -169,5 +439,6 @@ if __name__ == "__main__":
     print("Starting Inventory Management System API...")
     print(f"Current directory: {os.getcwd()}")
     
-    app.run(debug=True, port=5001, host='0.0.0.0')
+    # The reloader imports this module in two processes; shard workers must be started by one
+    app.run(debug=True, port=5001, host='0.0.0.0', use_reloader=not int(os.environ.get('INVENTORY_SHARDS', '0')))
     
\ No newline at end of file
@@ -3,62 +3,523 @@ API for React Frontend
 Provides methods to interact with the inventory system from a frontend
 """
 
-class InventoryAPI:
-    def __init__(self):
+import functools
+import inspect
+import os
+import threading
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+
+STORAGE_MODES = ("list", "columnar", "mmap")
+FULFILLED_ORDERS_KEPT = 10_000  # fulfilled orders the registry keeps for the change feed; older ones are dropped
+
+def create_inventory_manager(storage="list", storage_path=None, first_id=1, id_step=1, readonly=False):
+    """Create the inventory manager for a storage mode; ids run first_id, first_id + id_step, ...
+    
+    readonly opens file-backed (mmap) storage without write access.
+    """
+    if readonly and storage != "mmap":
+        raise ValueError(f"{storage} storage cannot be opened read-only")
+    if storage == "list":
         from src.inventory_manager import InventoryManager
+        return InventoryManager(first_id, id_step)
+    if storage == "columnar":
+        from src.columnar_inventory import ColumnarInventoryManager
+        return ColumnarInventoryManager(first_id, id_step)
+    if storage == "mmap":
+        if (first_id, id_step) != (1, 1):
+            raise ValueError("mmap storage places records by id and cannot allocate strided ids")
+        from src.mmap_inventory import MmapInventoryManager
+        return MmapInventoryManager(storage_path or "inventory.dat", readonly)
+    raise ValueError(f"Unknown storage mode: {storage} (expected one of {', '.join(STORAGE_MODES)})")
+
+def product_to_dict(product):
+    """Convert a product row into the dict shape returned to the frontend"""
+    return {
+        "id": product[0],
+        "name": product[1],
+        "price": product[2],
+        "quantity": product[3],
+        "category": product[4]
+    }
+
+def _forecast_fields(rate, reorder_point, quantity):
+    """Forecast figures of one product for a response; days_of_cover is None without demand"""
+    rate = float(rate)
+    return {
+        "demand_per_day": round(rate, 2),
+        "reorder_point": round(float(reorder_point), 2),
+        "days_of_cover": round(quantity / rate, 1) if rate > 0 else None
+    }
+
+def records_to_items(records, keys, defaults=None):
+    """Turn JSON records into positional items for a bulk call, leaving malformed ones for validation to report"""
+    if not isinstance(records, list):
+        return records
+    defaults = defaults or {}
+    return [[record.get(key, defaults.get(key)) for key in keys] if isinstance(record, dict) else record
+            for record in records]
+
+# Fields of each bulk operation's items: (name, accepted types, minimum value or None)
+BULK_FIELDS = {
+    "add_products": (("name", str, None), ("price", (int, float), 0), ("quantity", int, 0), ("category", str, None)),
+    "update_stock_bulk": (("product_id", int, None), ("quantity_change", int, None)),
+    "place_orders": (("product_id", int, None), ("quantity", int, 1), ("customer_name", str, None),
+                     ("priority", int, None)),
+}
+TYPE_NAMES = {str: "a string", int: "an integer", (int, float): "a number"}
+
+def validate_batch(items, fields):
+    """Check the shape, types and ranges of every item in a batch; returns a list of errors"""
+    if not isinstance(items, (list, tuple)):
+        return [{"index": None, "message": "Batch must be a list of items"}]
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, (list, tuple)) or len(item) != len(fields):
+            errors.append({"index": index, "message": f"Expected {len(fields)} values"})
+            continue
+        for value, (name, types, minimum) in zip(item, fields):
+            if isinstance(value, bool) or not isinstance(value, types):
+                errors.append({"index": index, "message": f"{name} must be {TYPE_NAMES[types]}"})
+                break
+            if minimum is not None and value < minimum:
+                errors.append({"index": index, "message": f"{name} must be at least {minimum}"})
+                break
+    return errors
+
+def build_composite(composites, name, components, whole_units=True):
+    """Build a CompositeProduct from [product_id, quantity] pairs and {"kit": name} references to composites.
+    
+    Quantities must be positive; kits and buildability also need whole units, while
+    a one-off cost calculation may use fractional quantities.
+    """
+    from src.composite_product import CompositeProduct
+    parts = []
+    for component in components:
+        if isinstance(component, dict):
+            kit = composites.get(component.get("kit"))
+            if kit is None:
+                raise KeyError(f"Unknown kit: {component.get('kit')}")
+            parts.append(kit)
+        else:
+            product_id, quantity = component
+            types = int if whole_units else (int, float)
+            if isinstance(quantity, bool) or not isinstance(quantity, types) or quantity <= 0:
+                kind = "a positive integer" if whole_units else "a positive number"
+                raise ValueError(f"Component quantity must be {kind}: {quantity!r}")
+            parts.append([product_id, quantity])
+    return CompositeProduct(name, parts)
+
+def logged(method):
+    """Record calls to a mutating InventoryAPI method in the write-ahead log once they have been applied.
+    
+    A call that raises is not logged, so recovery never replays an operation that
+    failed the first time. The call returns only after its record is in the log.
+    Its ledger entries take the time logged for it, so replaying the call
+    recreates them exactly.
+    """
+    from src.transaction_ledger import now_micros
+    signature = inspect.signature(method)
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Every mutating call is a write of the snapshot gate, so reports see it whole or not at all
+        with self.snapshot_gate.writing():
+            if self.persistence is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            # Replay applies operations in log order, so applying and logging happen under one lock
+            with self.write_lock:
+                if self.persistence.replaying:
+                    # The ledger clock already holds the logged time of the call being replayed
+                    return method(self, *args, **kwargs)
+                timestamp = now_micros()
+                # Logged calls run one at a time, so the ledger clock is this call's alone
+                self.transaction_ledger.clock = lambda: timestamp
+                try:
+                    result = method(self, *args, **kwargs)
+                finally:
+                    self.transaction_ledger.clock = None
+                self.persistence.log(method.__name__, *list(bound.arguments.values())[1:], timestamp=timestamp)
+                return result
+    return wrapper
+
+class InventoryAPI:
+    """Facade over the inventory components, safe to share between request threads.
+    
+    Stock changes for a product happen under that product's stripe of stock_locks,
+    so a check-and-decrement can never interleave with another change to the same
+    product, while orders for unrelated products proceed in parallel. Order ids
+    come from an atomic counter, ledger appends are serialized inside the ledger,
+    and process_orders calls run one at a time, so orders take stock in queue order.
+    Reports read through snapshot_gate: each sees every mutating call entirely or
+    not at all, and only holds writers off after repeatedly overlapping them.
+    Exports stream rows as they are read instead. With persistence enabled,
+    mutating calls are serialized so the write-ahead log records them in the
+    order they were applied.
+    """
+    
+    def __init__(self, storage="list", persistence=None, storage_path=None, ledger_archive=None, shard=None,
+                 readonly=False):
         from src.transaction_ledger import TransactionLedger
         from src.order_management import OrderQueue, BackorderPriorityQueue, DeliveryStack
+        from src.concurrency import AtomicCounter, SnapshotGate, StripedLock
         
-        self.inventory_manager = InventoryManager()
-        self.transaction_ledger = TransactionLedger()
+        if storage == "mmap" and persistence is not None:
+            # The mapped file is already durable; replaying the log on top of it would apply changes twice
+            raise ValueError("mmap storage cannot be combined with write-ahead log persistence")
+        # shard is (index, count) when this API is one partition of a ShardedInventoryAPI:
+        # its product and order ids are index + 1 modulo count, and it starts empty
+        self.shard = shard
+        first_id, id_step = (1, 1) if shard is None else (shard[0] + 1, shard[1])
+        self.inventory_manager = create_inventory_manager(storage, storage_path, first_id, id_step, readonly)
+        # Old ledger segments move to compressed files in this directory, if one is given
+        self.ledger_archive = None
+        if ledger_archive is not None:
+            from src.ledger_archive import LedgerArchive
+            self.ledger_archive = LedgerArchive(ledger_archive)
+        self.transaction_ledger = TransactionLedger(archive=self.ledger_archive)
         self.order_queue = OrderQueue()
         self.backorder_queue = BackorderPriorityQueue()
         self.delivery_stack = DeliveryStack()
+        self.order_ids = AtomicCounter(first_id - id_step, id_step)
+        self.orders = {}  # order_id -> order dict, shared with the queue that currently holds it
+        self.fulfilled_orders = deque()  # (order_id, id of its ORDER_FULFILLED entry), oldest first
+        self.orders_horizon = 0  # last ledger id of an order dropped from the registry
+        self.orders_lock = threading.Lock()  # fulfilled_orders and dropping orders from the registry
+        # Hourly and daily movement totals, kept up to date from the ledger
+        from src.movement_rollups import MovementRollups
+        self.movement_rollups = MovementRollups()
+        self.movement_rollups.attach(self.transaction_ledger, self.product_category)
+        
+        self.stock_locks = StripedLock()       # product_id -> lock for its stock and backorders
+        self.catalog_lock = threading.Lock()   # adding products
+        self.cost_lock = threading.Lock()      # kits, the cost engine and the kit plan
+        self.write_lock = threading.Lock()     # every logged call, when persistence is enabled
+        self.process_lock = threading.Lock()   # process_orders, so orders leave the queue and take stock in order
+        self.snapshot_gate = SnapshotGate()    # entered by every logged call; reports read through it
+        # Distinguishes this process's versions from those served before a restart
+        self.epoch = os.urandom(4).hex()
+        
+        from src.composite_product import CompositeCostEngine
+        self.composites = {}  # registered kits: name -> CompositeProduct
+        self.cost_engine = CompositeCostEngine(self.inventory_manager)
+        self.kit_plan = None  # (kit names, BuildabilityPlan) for every registered kit
+        self.product_fragments = None  # ProductFragmentCache, built on the first encoded inventory read
+        self.demand_forecast = None  # (last day, DemandForecast) over the complete days before today
+        
+        # Restore saved state if there is any, otherwise start from the sample data
+        self.persistence = persistence
+        if persistence is None or not persistence.recover(self):
+            # A file-backed catalog may already hold its products; shards are filled by their router
+            if len(self.inventory_manager.inventory) == 0 and shard is None and not readonly:
+                from data.sample_data import load_sample_data
+                load_sample_data(self.inventory_manager)
+            if persistence is not None:
+                persistence.snapshot()
+    
+    def capture_state(self):
+        """Get every stateful component, for snapshots"""
+        return {
+            "inventory_manager": self.inventory_manager,
+            "transaction_ledger": self.transaction_ledger,
+            "order_queue": self.order_queue,
+            "backorder_queue": self.backorder_queue,
+            "delivery_stack": self.delivery_stack,
+            "composites": self.composites,
+            "order_ids": self.order_ids,
+            "orders": self.orders,
+            "fulfilled_orders": self.fulfilled_orders,
+            "orders_horizon": self.orders_horizon,
+            "movement_rollups": self.movement_rollups
+        }
+    
+    def restore_state(self, state):
+        """Replace every stateful component with those from a snapshot"""
+        for name, component in state.items():
+            setattr(self, name, component)
+        if "fulfilled_orders" not in state:
+            # Snapshots from before the registry was bounded kept every order
+            self.fulfilled_orders = deque((order_id, self.transaction_ledger.count)
+                                          for order_id, order in self.orders.items() if order["status"] == "fulfilled")
+            self.orders_horizon = 0
+        if "order_ids" not in state:
+            # Snapshots from before the order id counter numbered orders after the ledger
+            from src.concurrency import AtomicCounter
+            self.order_ids = AtomicCounter(self.transaction_ledger.count)
+        if self.transaction_ledger.archive is None:
+            # Snapshots from before archiving was enabled start archiving from here on
+            self.transaction_ledger.archive = self.ledger_archive
+        if "movement_rollups" not in state:
+            # Snapshots from before rollups existed: new rollups catch up on the whole ledger
+            from src.movement_rollups import MovementRollups
+            self.movement_rollups = MovementRollups()
+        self.movement_rollups.attach(self.transaction_ledger, self.product_category)
+        self.cost_engine.inventory_manager = self.inventory_manager
+        self.cost_engine.clear()
+        self.kit_plan = None
+        self.demand_forecast = None
+    
+    def get_version(self, resource="all"):
+        """Get a version string that changes whenever a resource changes.
         
-        # Load sample data
-        from data.sample_data import load_sample_data
-        load_sample_data(self.inventory_manager)
+        "inventory" covers the catalog and stock levels, "transactions" the ledger (and
+        with it the order queues, since every order change is recorded there), and
+        "all" both. Versions only move forward while the process runs.
+        """
+        if resource == "inventory":
+            return f"{self.epoch}-i{self.inventory_manager.version}"
+        if resource == "transactions":
+            return f"{self.epoch}-t{self.transaction_ledger.version}"
+        return f"{self.epoch}-{self.inventory_manager.version}.{self.transaction_ledger.version}"
+    
+    def product_category(self, product_id):
+        """Get a product's category, or None if there is no such product"""
+        product = self.inventory_manager.get_product_by_id(product_id)
+        return product[4] if product is not None else None
     
     def get_inventory(self):
         """Get all inventory items"""
-        inventory_data = []
-        for product in self.inventory_manager.get_inventory_report():
-            inventory_data.append({
-                "id": product[0],
-                "name": product[1],
-                "price": product[2],
-                "quantity": product[3],
-                "category": product[4]
-            })
-        return inventory_data
+        return self.snapshot_gate.read(
+            lambda: [product_to_dict(product) for product in self.inventory_manager.get_inventory_report()]
+        )
+    
+    def get_inventory_json(self):
+        """Get all inventory items as encoded JSON bytes, re-encoding only products that changed"""
+        fragments = self.product_fragments
+        if fragments is None or fragments.inventory_manager is not self.inventory_manager:
+            from src.serialization import ProductFragmentCache
+            with self.catalog_lock:
+                fragments = self.product_fragments
+                # A restored snapshot brings a new inventory manager, which needs its own cache
+                if fragments is None or fragments.inventory_manager is not self.inventory_manager:
+                    fragments = self.product_fragments = ProductFragmentCache(self.inventory_manager)
+        return self.snapshot_gate.read(fragments.encode_inventory)
+    
+    def search_products(self, query, limit=20, offset=0, prefix=False):
+        """Search products by name, as a substring or (for autocomplete) a prefix"""
+        if prefix:
+            search = self.inventory_manager.get_products_by_name_prefix
+        else:
+            search = self.inventory_manager.get_product_by_name
+        return self.snapshot_gate.read(
+            lambda: [product_to_dict(product) for product in search(query, limit, offset)]
+        )
+    
+    def get_products(self, product_ids):
+        """Get the products with the given ids, in the order asked; ids that do not exist are left out"""
+        def copy():
+            products = []
+            for product_id in product_ids:
+                product = self.inventory_manager.get_product_by_id(product_id)
+                if product is not None:
+                    products.append(product_to_dict(product))
+            return products
+        return self.snapshot_gate.read(copy)
     
+    def get_inventory_page(self, after_id=0, limit=1000):
+        """Get up to limit inventory items with ids above after_id, in id order"""
+        def copy():
+            report = self.inventory_manager.get_inventory_report()
+            # The report lists products in id order
+            start = bisect_right(report, after_id, key=itemgetter(0))
+            return [product_to_dict(report[position]) for position in range(start, min(start + limit, len(report)))]
+        return self.snapshot_gate.read(copy)
+    
+    @logged
     def add_product(self, name, price, quantity, category):
         """Add a new product to inventory"""
-        product_id = self.inventory_manager.add_product(name, price, quantity, category)
-        self.transaction_ledger.add_transaction(
-            "PRODUCT_ADDED", product_id, quantity, f"Added product: {name}"
-        )
-        return {"status": "success", "product_id": product_id}
+        errors = self._product_errors([(name, price, quantity, category)])
+        if errors:
+            return {"status": "error", "message": errors[0]["message"]}
+        with self.catalog_lock:
+            product_id = self.inventory_manager.add_product(name, price, quantity, category)
+        with self.stock_locks.lock_for(product_id):
+            self.transaction_ledger.add_transaction(
+                "PRODUCT_ADDED", product_id, quantity, ("Added product: {0}", name)
+            )
+            fulfilled = self._refill_backorders(product_id) if quantity > 0 else []
+        # Kits may have referenced this id before it existed
+        with self.cost_lock:
+            self.cost_engine.invalidate_product(product_id)
+        return {"status": "success", "product_id": product_id, "fulfilled_backorders": fulfilled}
+    
+    @logged
+    def add_products(self, products):
+        """Add many (name, price, quantity, category) products; per-item results are in input order.
+        
+        The whole batch is validated first and nothing is added if any item is invalid.
+        """
+        errors = self._product_errors(products)
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        
+        with self.catalog_lock:
+            product_ids = [self.inventory_manager.add_product(*product) for product in products]
+        self.transaction_ledger.add_transactions([
+            ("PRODUCT_ADDED", product_id, quantity, ("Added product: {0}", name))
+            for product_id, (name, price, quantity, category) in zip(product_ids, products)
+        ])
+        with self.cost_lock:
+            for product_id in product_ids:
+                self.cost_engine.invalidate_product(product_id)
+        
+        fulfilled = []
+        restocked = [product_id for product_id, product in zip(product_ids, products) if product[2] > 0]
+        with self.stock_locks.hold(restocked):
+            for product_id in restocked:
+                fulfilled.extend(self._refill_backorders(product_id))
+        return {
+            "status": "success",
+            "results": [{"status": "success", "product_id": product_id} for product_id in product_ids],
+            "fulfilled_backorders": fulfilled
+        }
+    
+    def _product_errors(self, products):
+        """Validate new products, including the limits of the storage mode (e.g. mmap field widths)"""
+        errors = validate_batch(products, BULK_FIELDS["add_products"])
+        check = getattr(self.inventory_manager, "check_product", None)
+        if errors or check is None:
+            return errors
+        for index, (name, price, quantity, category) in enumerate(products):
+            message = check(name, category)
+            if message is not None:
+                errors.append({"index": index, "message": message})
+        return errors
     
+    @logged
     def update_stock(self, product_id, quantity_change):
         """Update product stock levels"""
-        success = self.inventory_manager.update_stock(product_id, quantity_change)
-        if success:
-            transaction_type = "STOCK_INCREASE" if quantity_change > 0 else "STOCK_DECREASE"
-            self.transaction_ledger.add_transaction(
-                transaction_type, product_id, abs(quantity_change), "Stock adjustment"
-            )
-            return {"status": "success"}
+        with self.stock_locks.lock_for(product_id):
+            success = self.inventory_manager.update_stock(product_id, quantity_change)
+            if success:
+                transaction_type = "STOCK_INCREASE" if quantity_change > 0 else "STOCK_DECREASE"
+                self.transaction_ledger.add_transaction(
+                    transaction_type, product_id, abs(quantity_change), "Stock adjustment"
+                )
+                fulfilled = self._refill_backorders(product_id) if quantity_change > 0 else []
+                return {"status": "success", "fulfilled_backorders": fulfilled}
         return {"status": "error", "message": "Product not found"}
     
+    @logged
+    def update_stock_bulk(self, adjustments):
+        """Apply many (product_id, quantity_change) adjustments; per-item results are in input order.
+        
+        Stock adjustments and their ledger entries match calling update_stock for each item,
+        but every touched product is updated once and the entries are appended together.
+        Waiting backorders are retried once per restocked product after all adjustments, so
+        which backorders get filled, and the final stock, can differ from sequential calls.
+        The whole batch is validated first and nothing is applied if any item is invalid.
+        """
+        errors = validate_batch(adjustments, BULK_FIELDS["update_stock_bulk"])
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        
+        product_ids = {product_id for product_id, quantity_change in adjustments}
+        with self.stock_locks.hold(product_ids):
+            initial = {}
+            for product_id in product_ids:
+                product = self.inventory_manager.get_product_by_id(product_id)
+                if product is not None:
+                    initial[product_id] = product[3]
+            
+            stock = dict(initial)
+            results = []
+            transactions = []
+            restocked = {}  # insertion-ordered set of products that received stock
+            for product_id, quantity_change in adjustments:
+                if product_id not in stock:
+                    results.append({"status": "error", "message": "Product not found"})
+                    continue
+                # Clamp at zero after each item, exactly as update_stock does
+                stock[product_id] = max(stock[product_id] + quantity_change, 0)
+                transaction_type = "STOCK_INCREASE" if quantity_change > 0 else "STOCK_DECREASE"
+                transactions.append((transaction_type, product_id, abs(quantity_change), "Stock adjustment"))
+                if quantity_change > 0:
+                    restocked[product_id] = True
+                results.append({"status": "success"})
+            
+            self.inventory_manager.update_stock_many({
+                product_id: quantity - initial[product_id]
+                for product_id, quantity in stock.items() if quantity != initial[product_id]
+            })
+            self.transaction_ledger.add_transactions(transactions)
+            fulfilled = []
+            for product_id in restocked:
+                fulfilled.extend(self._refill_backorders(product_id))
+        return {"status": "success", "results": results, "fulfilled_backorders": fulfilled}
+    
+    @logged
+    def update_price(self, product_id, price):
+        """Update a product's unit price"""
+        with self.stock_locks.lock_for(product_id):
+            if not self.inventory_manager.update_price(product_id, price):
+                return {"status": "error", "message": "Product not found"}
+            self.transaction_ledger.add_transaction("PRICE_CHANGE", product_id, 0, ("Price set to {0}", price))
+        with self.cost_lock:
+            self.cost_engine.invalidate_product(product_id)
+        return {"status": "success"}
+    
+    def _refill_backorders(self, product_id):
+        """Fulfill waiting backorders for a product after its stock went up.
+        
+        Orders are retried in priority order and retrying stops at the first one that
+        still cannot be met, so a large high-priority order is never overtaken. The
+        caller holds the product's stock lock.
+        """
+        product = self.inventory_manager.get_product_by_id(product_id)
+        if product is None:
+            return []
+        
+        stock = product[3]
+        fulfilled = []
+        while True:
+            order = self.backorder_queue.peek_for_product(product_id)
+            if order is None or order["quantity"] > stock:
+                break
+            self.backorder_queue.dequeue_for_product(product_id)
+            stock -= order["quantity"]
+            order["status"] = "fulfilled"
+            fulfilled.append(order)
+        
+        if fulfilled:
+            self.inventory_manager.update_stock(product_id, stock - product[3])
+            self.delivery_stack.push_many(fulfilled)
+            entry_ids = self.transaction_ledger.add_transactions([
+                ("ORDER_FULFILLED", product_id, order["quantity"], ("Order #{order_id} (backorder)",),
+                 order["order_id"])
+                for order in fulfilled
+            ])
+            self._forget_fulfilled(fulfilled, entry_ids)
+        return fulfilled
+    
+    def _forget_fulfilled(self, orders, entry_ids):
+        """Note orders fulfilled by the ledger entries entry_ids; the oldest past FULFILLED_ORDERS_KEPT are dropped.
+        
+        Pending and backordered orders always stay in the registry.
+        """
+        with self.orders_lock:
+            self.fulfilled_orders.extend((order["order_id"], entry_id) for order, entry_id in zip(orders, entry_ids))
+            while len(self.fulfilled_orders) > FULFILLED_ORDERS_KEPT:
+                order_id, last_entry = self.fulfilled_orders.popleft()
+                self.orders.pop(order_id, None)
+                self.orders_horizon = max(self.orders_horizon, last_entry)
+    
+    @logged
     def place_order(self, product_id, quantity, customer_name, priority=1):
         """Place a new order"""
+        errors = validate_batch([(product_id, quantity, customer_name, priority)], BULK_FIELDS["place_orders"])
+        if errors:
+            return {"status": "error", "message": errors[0]["message"]}
         # Check if product exists
         product = self.inventory_manager.get_product_by_id(product_id)
         if not product:
             return {"status": "error", "message": "Product not found"}
         
-        order_id = self.transaction_ledger.count + 1
+        order_id = self.order_ids.next()
         order_details = {
             "order_id": order_id,
             "product_id": product_id,
@@ -69,66 +530,485 @@ class InventoryAPI:
             "status": "pending"
         }
         
+        self.orders[order_id] = order_details
         self.order_queue.enqueue(order_details)
         self.transaction_ledger.add_transaction(
-            "ORDER_PLACED", product_id, quantity, f"Order #{order_id} by {customer_name}"
+            "ORDER_PLACED", product_id, quantity, ("Order #{order_id} by {0}", customer_name), order_id
         )
         
         return {"status": "success", "order_id": order_id}
     
-    def process_orders(self, count=1):
-        """Process orders from the queue"""
+    @logged
+    def place_orders(self, orders):
+        """Place many (product_id, quantity, customer_name, priority) orders; per-item results are in input order.
+        
+        The whole batch is validated first and nothing is placed if any item is invalid.
+        """
+        errors = validate_batch(orders, BULK_FIELDS["place_orders"])
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        
         results = []
-        for _ in range(count):
-            if self.order_queue.is_empty():
-                break
-                
-            order = self.order_queue.peek()  # Look at next order without removing
+        queued = []
+        transactions = []
+        for product_id, quantity, customer_name, priority in orders:
+            product = self.inventory_manager.get_product_by_id(product_id)
+            if not product:
+                results.append({"status": "error", "message": "Product not found"})
+                continue
+            order_id = self.order_ids.next()
+            queued.append({
+                "order_id": order_id,
+                "product_id": product_id,
+                "product_name": product[1],
+                "quantity": quantity,
+                "customer_name": customer_name,
+                "priority": priority,
+                "status": "pending"
+            })
+            transactions.append(("ORDER_PLACED", product_id, quantity, ("Order #{order_id} by {0}", customer_name), order_id))
+            results.append({"status": "success", "order_id": order_id})
+        
+        for order in queued:
+            self.orders[order["order_id"]] = order
+        self.order_queue.enqueue_many(queued)
+        self.transaction_ledger.add_transactions(transactions)
+        return {"status": "success", "results": results}
+    
+    @logged
+    def process_orders(self, count=1, batched=True):
+        """Process orders from the queue.
+        
+        Queued orders are checked before any is allocated; if one is invalid (as an
+        older version could have queued it), the batch stays queued and nothing changes.
+        """
+        # One call at a time: a later call must not allocate stock before an earlier one
+        with self.process_lock:
+            orders = self.order_queue.dequeue_batch(count)
+            errors = validate_batch([(order["product_id"], order["quantity"], order["customer_name"], order["priority"])
+                                     for order in orders], BULK_FIELDS["place_orders"])
+            if errors:
+                self.order_queue.requeue(orders)
+                return {"status": "error", "message": "Invalid queued order", "errors": errors}
+            try:
+                if batched:
+                    results = self._fulfill_orders_batched(orders)
+                else:
+                    results = self._fulfill_orders_sequential(orders)
+            except BaseException:
+                # Orders whose status was never set had no effects applied; keep them queued
+                self.order_queue.requeue([order for order in orders if order["status"] == "pending"])
+                raise
+        return {"status": "success", "processed_orders": results}
+    
+    def _fulfill_orders_sequential(self, orders):
+        """Fulfill or backorder each order in turn"""
+        results = []
+        for order in orders:
             product_id = order["product_id"]
             quantity = order["quantity"]
             
-            product = self.inventory_manager.get_product_by_id(product_id)
-            if product and product[3] >= quantity:
-                # Sufficient stock - fulfill order
-                order = self.order_queue.dequeue()
-                self.inventory_manager.update_stock(product_id, -quantity)
-                self.delivery_stack.push(order)
-                order["status"] = "fulfilled"
-                results.append(order)
-                
-                self.transaction_ledger.add_transaction(
-                    "ORDER_FULFILLED", product_id, quantity, f"Order #{order['order_id']}"
-                )
+            # The stock check and the decrement (or backorder) must not interleave with a restock
+            with self.stock_locks.lock_for(product_id):
+                product = self.inventory_manager.get_product_by_id(product_id)
+                if product and product[3] >= quantity:
+                    # Sufficient stock - fulfill order
+                    self.inventory_manager.update_stock(product_id, -quantity)
+                    self.delivery_stack.push(order)
+                    entry_id = self.transaction_ledger.add_transaction(
+                        "ORDER_FULFILLED", product_id, quantity, ("Order #{order_id}",), order["order_id"]
+                    )
+                    order["status"] = "fulfilled"
+                    results.append(order)
+                    self._forget_fulfilled([order], [entry_id])
+                else:
+                    # Insufficient stock - move to backorders
+                    self.backorder_queue.enqueue(order, order["priority"])
+                    self.transaction_ledger.add_transaction(
+                        "BACKORDER_CREATED", product_id, quantity, ("Order #{order_id}",), order["order_id"]
+                    )
+                    order["status"] = "backordered"
+                    results.append(order)
+        
+        return results
+    
+    def _fulfill_orders_batched(self, orders):
+        """Allocate stock to a block of orders in one pass, then apply all effects at once.
+        
+        Gives the same statuses, stock levels and ledger entries as the sequential path.
+        """
+        with self.stock_locks.hold({order["product_id"] for order in orders}):
+            return self._allocate_orders(orders)
+    
+    def _allocate_orders(self, orders):
+        """Body of the batched path; the caller holds the stock locks of every ordered product"""
+        available = {}       # product_id -> stock left to allocate (None if no such product)
+        stock_changes = {}   # product_id -> net quantity change
+        fulfilled = []
+        backordered = []
+        transactions = []
+        allocated = []       # per order: True if fulfilled, False if backordered
+        
+        for order in orders:
+            product_id = order["product_id"]
+            quantity = order["quantity"]
+            
+            if product_id in available:
+                stock = available[product_id]
             else:
-                # Insufficient stock - move to backorders
-                order = self.order_queue.dequeue()
-                self.backorder_queue.enqueue(order, order["priority"])
-                order["status"] = "backordered"
-                results.append(order)
-                
-                self.transaction_ledger.add_transaction(
-                    "BACKORDER_CREATED", product_id, quantity, f"Order #{order['order_id']}"
-                )
+                product = self.inventory_manager.get_product_by_id(product_id)
+                stock = available[product_id] = product[3] if product else None
+            
+            # Orders for one product are allocated FIFO against its remaining stock
+            if stock is not None and stock >= quantity:
+                available[product_id] = stock - quantity
+                stock_changes[product_id] = stock_changes.get(product_id, 0) - quantity
+                allocated.append(True)
+                fulfilled.append(order)
+                transactions.append(("ORDER_FULFILLED", product_id, quantity, ("Order #{order_id}",),
+                                     order["order_id"]))
+            else:
+                allocated.append(False)
+                backordered.append((order, order["priority"]))
+                transactions.append(("BACKORDER_CREATED", product_id, quantity, ("Order #{order_id}",),
+                                     order["order_id"]))
         
-        return {"status": "success", "processed_orders": results}
+        self.inventory_manager.update_stock_many(stock_changes)
+        self.delivery_stack.push_many(fulfilled)
+        self.backorder_queue.enqueue_many(backordered)
+        entry_ids = self.transaction_ledger.add_transactions(transactions)
+        # Statuses change only once every effect of the batch is in place
+        for order, is_fulfilled in zip(orders, allocated):
+            order["status"] = "fulfilled" if is_fulfilled else "backordered"
+        # Transactions are one per order, in order
+        self._forget_fulfilled(fulfilled, [entry_id for entry_id, is_fulfilled in zip(entry_ids, allocated)
+                                           if is_fulfilled])
+        return list(orders)
+    
+    def get_transactions(self, limit=10, after_id=None, before_id=None, latest=False, product_id=None,
+                         start=None, end=None):
+        """Get transaction history.
+        
+        Oldest first by default. after_id pages forward from a cursor; before_id and
+        latest page backward, newest first. product_id restricts to one product.
+        start and end (ISO 8601 local times) select start <= timestamp < end instead
+        of the id cursors; with latest the newest matches come first.
+        """
+        ledger = self.transaction_ledger
+        if start is not None or end is not None:
+            from src.transaction_ledger import parse_timestamp
+            entries = ledger.iter_time_range(
+                None if start is None else parse_timestamp(start),
+                None if end is None else parse_timestamp(end),
+                product_id
+            )
+            if latest:
+                return list(reversed(deque(entries, maxlen=limit)))
+            return list(islice(entries, limit))
+        if product_id is not None:
+            if latest and before_id is None:
+                before_id = ledger.count + 1
+            return ledger.get_transactions_by_product(product_id, limit, after_id, before_id)
+        if after_id is not None:
+            return ledger.get_transactions_after(after_id, limit)
+        if before_id is not None:
+            return ledger.get_transactions_before(before_id, limit)
+        if latest:
+            return ledger.get_latest_transactions(limit)
+        return ledger.get_transaction_history(limit)
+    
+    def get_changes(self, since=0, limit=1000, wait=0):
+        """Get the products and orders changed after ledger entry since, each listed once.
+        
+        Products are returned as they are now and orders with their current status, so
+        a client applies them over its copy and resumes from the returned cursor. At most
+        limit ledger entries are scanned per call (has_more says whether more remain).
+        With wait > 0 and nothing new, blocks up to wait seconds for a change. A cursor
+        ahead of the ledger (e.g. from before a restart), or behind entries of fulfilled
+        orders the registry has dropped since, gets reset=True: refetch everything.
+        """
+        ledger = self.transaction_ledger
+        # A cursor ahead of the ledger, or a sharded one (see parse_cursor), starts over
+        if not isinstance(since, int) or since > ledger.count or since < self.orders_horizon:
+            return {"status": "success", "reset": True, "cursor": ledger.count, "has_more": False,
+                    "products": [], "orders": []}
+        if wait > 0 and since == ledger.count:
+            ledger.wait_for_append(since, wait)
+        
+        return self.snapshot_gate.read(lambda: self._collect_changes(since, limit))
+    
+    def _collect_changes(self, since, limit):
+        """Body of get_changes, run as one snapshot read"""
+        ledger = self.transaction_ledger
+        cursor = min(ledger.count, since + limit)
+        product_ids = {}  # insertion-ordered sets, in order of first change
+        order_ids = {}
+        for product_id, order_id in ledger.iter_touched(since + 1, cursor):
+            product_ids[product_id] = True
+            if order_id is not None:
+                order_ids[order_id] = True
+        
+        products = []
+        for product_id in product_ids:
+            product = self.inventory_manager.get_product_by_id(product_id)
+            if product is not None:
+                products.append(product_to_dict(product))
+        return {
+            "status": "success",
+            "reset": False,
+            "cursor": cursor,
+            "has_more": cursor < ledger.count,
+            "products": products,
+            "orders": [dict(self.orders[order_id]) for order_id in order_ids if order_id in self.orders]
+        }
+    
+    def get_movement(self, product_id=None, category=None, days=30, granularity="day"):
+        """Get stock movement over the last days days, in hourly or daily buckets.
+        
+        Covers one product, one category, or with neither the whole inventory. Each
+        bucket has the count and total quantity of every rolled-up transaction type;
+        totals sums them, with units_in and units_out. Read from the rollups, so the
+        cost depends on the number of buckets, not of transactions.
+        """
+        from src.movement_rollups import GRANULARITIES, RETENTION, ROLLUP_TYPES, UNITS_IN, UNITS_OUT
+        from src.transaction_ledger import format_timestamp
+        if granularity not in GRANULARITIES:
+            return {"status": "error", "message": f"Unknown granularity: {granularity} (expected hour or day)"}
+        periods = days * 86400 // GRANULARITIES[granularity]
+        longest = RETENTION[granularity] * GRANULARITIES[granularity] // 86400
+        if days < 1 or periods > RETENTION[granularity]:
+            return {"status": "error", "message": f"days must be between 1 and {longest} for {granularity} buckets"}
+        if product_id is not None and self.inventory_manager.get_product_by_id(product_id) is None:
+            return {"status": "error", "message": "Product not found"}
+        
+        width = len(ROLLUP_TYPES)
+        totals = [0] * (2 * width)
+        buckets = []
+        for start, bucket in self.movement_rollups.movement(granularity, periods, product_id, category):
+            bucket = bucket or [0] * (2 * width)
+            totals = [total + value for total, value in zip(totals, bucket)]
+            buckets.append({
+                "start": format_timestamp(start),
+                "counts": dict(zip(ROLLUP_TYPES, bucket[:width])),
+                "quantities": dict(zip(ROLLUP_TYPES, bucket[width:]))
+            })
+        quantities = dict(zip(ROLLUP_TYPES, totals[width:]))
+        return {
+            "status": "success",
+            "product_id": product_id,
+            "category": category,
+            "granularity": granularity,
+            "buckets": buckets,
+            "totals": {
+                "counts": dict(zip(ROLLUP_TYPES, totals[:width])),
+                "quantities": quantities,
+                "units_in": sum(quantities[name] for name in UNITS_IN),
+                "units_out": sum(quantities[name] for name in UNITS_OUT)
+            }
+        }
+    
+    def _demand_forecast(self):
+        """Get the catalog's demand forecast, computed once a day from the complete days before today (UTC).
+        
+        Products added since it was computed are not in it; forecast positions match
+        the inventory report order, which only ever grows at the end.
+        """
+        from src.replenishment import DemandForecast, demand_history
+        from src.transaction_ledger import now_micros
+        last_day = now_micros() // 1_000_000 // 86400 - 1
+        cached = self.demand_forecast
+        if cached is None or cached[0] != last_day:
+            product_ids = [product[0] for product in self.inventory_manager.get_inventory_report()]
+            history = demand_history(self.movement_rollups, product_ids, last_day)
+            cached = self.demand_forecast = (last_day, DemandForecast(product_ids, history))
+        return cached[1]
     
-    def get_transactions(self, limit=10):
-        """Get transaction history"""
-        return self.transaction_ledger.get_transaction_history(limit)
+    def get_low_stock(self, threshold=5, projected=False, lead_time_days=None, service_factor=None):
+        """Get the products with low stock.
+        
+        By default a product is low below threshold. Projected mode compares each
+        product with its own reorder point instead, from its forecast demand over the
+        lead time plus safety stock, so fast movers are flagged before slow ones run
+        out; products too new to have a forecast use threshold.
+        """
+        from src.replenishment import LEAD_TIME_DAYS, SERVICE_FACTOR
+        if not projected:
+            products = self.snapshot_gate.read(
+                lambda: [product_to_dict(p) for p in self.inventory_manager.get_low_stock_report(threshold)]
+            )
+            return {"status": "success", "mode": "threshold", "products": products}
+        lead_time_days = LEAD_TIME_DAYS if lead_time_days is None else lead_time_days
+        service_factor = SERVICE_FACTOR if service_factor is None else service_factor
+        if lead_time_days <= 0 or service_factor < 0:
+            return {"status": "error", "message": "lead_time_days must be positive and service_factor not negative"}
+        
+        forecast = self._demand_forecast()
+        reorder_points, _ = forecast.reorder_points(lead_time_days, service_factor)
+        low = self.snapshot_gate.read(
+            lambda: [tuple(p) for p in self.inventory_manager.get_low_stock_report(threshold, reorder_points)]
+        )
+        products = []
+        for product in low:
+            item = product_to_dict(product)
+            position = forecast.position_of(product[0])
+            if position is not None:
+                item.update(_forecast_fields(forecast.rate[position], reorder_points[position], product[3]))
+            products.append(item)
+        return {"status": "success", "mode": "projected", "lead_time_days": lead_time_days, "products": products}
+    
+    def get_replenishment_plan(self, lead_time_days=None, service_factor=None, cover_days=None, limit=100):
+        """Get the products due for reordering, soonest projected stock-out first.
+        
+        Every product's reorder point and suggested order quantity is computed in one
+        batch from its forecast daily demand; a product is due when its stock is at or
+        below its reorder point. products_due counts them all, products lists limit of them.
+        """
+        from src.replenishment import COVER_DAYS, LEAD_TIME_DAYS, SERVICE_FACTOR, due_positions
+        lead_time_days = LEAD_TIME_DAYS if lead_time_days is None else lead_time_days
+        service_factor = SERVICE_FACTOR if service_factor is None else service_factor
+        cover_days = COVER_DAYS if cover_days is None else cover_days
+        if lead_time_days <= 0 or service_factor < 0 or cover_days < 0:
+            return {"status": "error",
+                    "message": "lead_time_days must be positive, service_factor and cover_days not negative"}
+        if limit < 1:
+            return {"status": "error", "message": "limit must be at least 1"}
+        
+        forecast = self._demand_forecast()
+        products = self.snapshot_gate.read(
+            lambda: [tuple(p) for p in self.inventory_manager.get_inventory_report()[:len(forecast)]]
+        )
+        plan = forecast.plan([product[3] for product in products], lead_time_days, service_factor, cover_days)
+        due = due_positions(plan)
+        items = []
+        for position in due[:limit]:
+            item = product_to_dict(products[position])
+            item.update(_forecast_fields(forecast.rate[position], plan["reorder_point"][position],
+                                         products[position][3]))
+            item["safety_stock"] = round(float(plan["safety_stock"][position]), 2)
+            item["suggested_order_quantity"] = int(plan["order_quantity"][position])
+            items.append(item)
+        return {
+            "status": "success",
+            "lead_time_days": lead_time_days,
+            "service_factor": service_factor,
+            "cover_days": cover_days,
+            "products_planned": len(forecast),
+            "products_due": len(due),
+            "products": items
+        }
+    
+    def export_inventory(self, fmt="ndjson", fields=None, category=None, low_stock=None):
+        """Stream the catalog as NDJSON or CSV text chunks.
+        
+        fields projects the columns; category and low_stock (a quantity threshold)
+        filter the rows. Rows are read and serialized as the chunks are consumed.
+        """
+        from src.export import EXPORT_FORMATS, PRODUCT_FIELDS, iter_chunks, iter_products, parse_fields, project
+        if fmt not in EXPORT_FORMATS:
+            return {"status": "error", "message": f"Unknown export format: {fmt}"}
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        # Product rows are positional: project by column index
+        rows = project(iter_products(self.inventory_manager, category, low_stock),
+                       [PRODUCT_FIELDS.index(field) for field in fields])
+        return {
+            "status": "success",
+            "content_type": EXPORT_FORMATS[fmt],
+            "chunks": iter_chunks(rows, fields, fmt)
+        }
+    
+    def export_transactions(self, fmt="ndjson", fields=None, product_id=None, after_id=None, before_id=None):
+        """Stream the ledger, oldest first, as NDJSON or CSV text chunks.
+        
+        fields projects the columns; product_id and the after_id/before_id cursors
+        filter the entries.
+        """
+        from src.export import EXPORT_FORMATS, TRANSACTION_FIELDS, iter_chunks, iter_transactions, parse_fields, project
+        if fmt not in EXPORT_FORMATS:
+            return {"status": "error", "message": f"Unknown export format: {fmt}"}
+        try:
+            fields = parse_fields(fields, TRANSACTION_FIELDS)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        rows = project(iter_transactions(self.transaction_ledger, product_id, after_id, before_id), fields)
+        return {
+            "status": "success",
+            "content_type": EXPORT_FORMATS[fmt],
+            "chunks": iter_chunks(rows, fields, fmt)
+        }
     
     def get_system_status(self):
         """Get current system status"""
-        return {
+        return self.snapshot_gate.read(lambda: {
             "total_products": len(self.inventory_manager.inventory),
             "pending_orders": self.order_queue.size(),
             "backorders": self.backorder_queue.size(),
             "items_ready_for_delivery": self.delivery_stack.size(),
             "total_transactions": self.transaction_ledger.count
-        }
+        })
+    
+    def get_composites(self):
+        """Get the registered kits: name -> CompositeProduct"""
+        with self.cost_lock:
+            return dict(self.composites)
+    
+    @logged
+    def define_composite(self, name, components):
+        """Register a named kit that other composites can include as {"kit": name}"""
+        with self.cost_lock:
+            if name in self.composites:
+                return {"status": "error", "message": f"Kit already exists: {name}"}
+            try:
+                self.composites[name] = build_composite(self.composites, name, components)
+            except (KeyError, ValueError) as e:
+                return {"status": "error", "message": e.args[0]}
+        return {"status": "success", "name": name}
     
     def calculate_composite_cost(self, components):
         """Calculate cost of a composite product"""
-        from src.composite_product import CompositeProduct
-        composite = CompositeProduct("Custom Composite", components)
-        total_cost = composite.calculate_cost(self.inventory_manager)
-        return {"status": "success", "total_cost": total_cost}
\ No newline at end of file
+        try:
+            composite = build_composite(self.composites, "Custom Composite", components, whole_units=False)
+        except (KeyError, ValueError) as e:
+            return {"status": "error", "message": e.args[0]}
+        # Registered kits keep their memoized cost across calls
+        with self.cost_lock:
+            total_cost = self.cost_engine.calculate_cost(composite)
+        return {"status": "success", "total_cost": total_cost}
+    
+    def calculate_buildable(self, kits=None, components=None):
+        """Calculate how many units of composites can be assembled from current stock.
+        
+        With components, evaluates one ad-hoc composite. Otherwise evaluates the named
+        kits, or every registered kit when kits is None.
+        """
+        from src.composite_product import BuildabilityPlan
+        try:
+            with self.cost_lock:
+                if components is not None:
+                    composite = build_composite(self.composites, "Custom Composite", components)
+                    plan = BuildabilityPlan(self.cost_engine, [composite])
+                elif kits is None:
+                    # Kits cannot be redefined, so the plan only changes when one is added
+                    names = list(self.composites)
+                    if self.kit_plan is None or len(self.kit_plan[0]) != len(names):
+                        plan = BuildabilityPlan(self.cost_engine, self.composites.values())
+                        self.kit_plan = (names, plan)
+                    names, plan = self.kit_plan
+                else:
+                    names = list(kits)
+                    missing = [name for name in names if name not in self.composites]
+                    if missing:
+                        raise KeyError(f"Unknown kit: {missing[0]}")
+                    plan = BuildabilityPlan(self.cost_engine, [self.composites[name] for name in names])
+        except (KeyError, ValueError) as e:
+            return {"status": "error", "message": e.args[0]}
+        
+        buildable = self.snapshot_gate.read(lambda: plan.evaluate(self.inventory_manager))
+        if components is not None:
+            return {"status": "success", "buildable": buildable[0]}
+        return {
+            "status": "success",
+            "kits": [{"kit": name, "buildable": count} for name, count in zip(names, buildable)]
+        }
\ No newline at end of file
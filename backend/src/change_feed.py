@@ -0,0 +1,51 @@
+"""
+Change Feed
+Formats get_changes results as server-sent events, for clients that follow the ledger
+"""
+
+import json
+
+HEARTBEAT_SECONDS = 15  # idle time before a keep-alive comment, so proxies keep the stream open
+MAX_WAIT_SECONDS = 30   # longest a long-poll request may block
+
+
+def parse_cursor(value, default=0):
+    """Parse a since cursor or Last-Event-ID header; raises ValueError if it is not a non-negative integer.
+
+    A sharded server's cursor holds one ledger id per shard, joined by dots; it is
+    returned as that string, normalized.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, str) and "." in value:
+        cursors = [int(part) for part in value.split(".")]
+        if min(cursors) < 0:
+            raise ValueError("since must not be negative")
+        return ".".join(map(str, cursors))
+    cursor = int(value)
+    if cursor < 0:
+        raise ValueError("since must not be negative")
+    return cursor
+
+
+def next_event(cursor, changes):
+    """Turn one get_changes result into (next cursor, event text)"""
+    if changes["reset"]:
+        return changes["cursor"], f"id: {changes['cursor']}\nevent: reset\ndata: {{}}\n\n"
+    if changes["cursor"] == cursor:
+        return cursor, ": keep-alive\n\n"
+    data = json.dumps({"products": changes["products"], "orders": changes["orders"]})
+    return changes["cursor"], f"id: {changes['cursor']}\nevent: changes\ndata: {data}\n\n"
+
+
+def iter_change_events(api, since=0, heartbeat=HEARTBEAT_SECONDS):
+    """Yield server-sent events for every change after since, blocking between them.
+
+    Each batch of changes is one event whose id is the ledger cursor, so a reconnecting
+    client resumes with Last-Event-ID. Runs until the consumer stops iterating.
+    """
+    cursor = since
+    yield "retry: 2000\n\n"
+    while True:
+        cursor, event = next_event(cursor, api.get_changes(cursor, wait=heartbeat))
+        yield event
@@ -0,0 +1,263 @@
+"""
+Columnar Inventory Manager
+Stores products column-wise in typed arrays for a compact memory footprint
+"""
+
+from array import array
+
+from src.concurrency import AtomicCounter, ChangeNotifier, PicklableLock
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to pure Python scans
+    np = None
+
+
+def below_limits(quantities, threshold, reorder_points=None):
+    """Boolean mask of a NumPy quantity column: below threshold, or at or below the aligned reorder points"""
+    low = quantities < threshold
+    if reorder_points is not None:
+        count = min(len(reorder_points), len(quantities))
+        low[:count] = quantities[:count] <= np.asarray(reorder_points[:count], dtype=np.float64)
+    return low
+
+
+def is_below_limit(quantity, position, threshold, reorder_points=None):
+    """Pure-Python counterpart of below_limits for the row at position"""
+    if reorder_points is not None and position < len(reorder_points):
+        return quantity <= reorder_points[position]
+    return quantity < threshold
+
+
+class ProductRowView:
+    """Read-only sequence of row tuples over a manager exposing __len__ and row_at"""
+
+    def __init__(self, manager, positions=None):
+        self.manager = manager
+        self.positions = positions  # None means every row, in insertion order
+
+    def __len__(self):
+        if self.positions is None:
+            return len(self.manager)
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self.positions is None:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("product row index out of range")
+            return self.manager.row_at(index)
+        return self.manager.row_at(self.positions[index])
+
+    def __iter__(self):
+        positions = range(len(self.manager)) if self.positions is None else self.positions
+        for position in positions:
+            yield self.manager.row_at(position)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class ColumnarInventoryManager:
+    """Drop-in InventoryManager that keeps each field in its own column.
+
+    ids and quantities live in array('q'), prices in array('d'), names in a
+    single UTF-8 buffer addressed by offsets, and categories are dictionary
+    encoded to small integer codes. Rows are exposed as
+    (product_id, name, price, quantity, category) tuples built on demand.
+    """
+
+    first_id = 1  # managers pickled before ids could be strided allocate 1, 2, 3, ...
+    id_step = 1
+
+    def __init__(self, first_id=1, id_step=1):
+        self.ids = array('q')
+        self.prices = array('d')
+        self.quantities = array('q')
+        self.category_codes = array('I')
+        self.category_names = []    # code -> category string
+        self.category_lookup = {}   # category string -> code
+        self.name_data = bytearray()
+        self.name_offsets = array('q', [0])
+        self.inventory = ProductRowView(self)
+        # Held while columns grow and while NumPy views them: a view exports the array's
+        # buffer, and an array with an export cannot be resized
+        self.column_lock = PicklableLock()
+        self.versions = AtomicCounter()  # bumped after every change
+        self.changed = ChangeNotifier()  # called with each changed product id, before the version moves
+        # Ids run first_id, first_id + id_step, ...; shards use disjoint residue classes
+        self.first_id = first_id
+        self.id_step = id_step
+        self.next_id = first_id
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "column_lock" not in state:  # pickled before reports and writers shared a lock
+            self.column_lock = PicklableLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def version(self):
+        return self.versions.value
+
+    def add_product(self, name, price, quantity, category):
+        """Add a new product to inventory"""
+        if not isinstance(name, str) or not isinstance(category, str):
+            raise TypeError("Product name and category must be strings")
+        # Everything that can fail runs before any column changes: one-item arrays
+        # reject exactly the values an append would
+        encoded_name = name.encode('utf-8')
+        price_cell = array('d', [price])
+        quantity_cell = array('q', [quantity])
+        with self.column_lock:
+            product_id = self.next_id
+            code = self.category_lookup.get(category)
+            if code is None:
+                code = len(self.category_names)
+                self.category_names.append(category)
+                self.category_lookup[category] = code
+            self.prices.extend(price_cell)
+            self.quantities.extend(quantity_cell)
+            self.category_codes.append(code)
+            self.name_data += encoded_name
+            self.name_offsets.append(len(self.name_data))
+            # len() follows ids, so the row becomes visible only once every column has it
+            self.ids.append(product_id)
+            self.next_id += self.id_step
+        self.changed.notify(product_id)
+        self.versions.next()
+        return product_id
+
+    def position_of(self, product_id):
+        """Get the column position of a product, or None if it does not exist"""
+        # Ids are allocated in steps and never removed, so the position follows from the id
+        position = (product_id - self.first_id) // self.id_step
+        if 0 <= position < len(self.ids) and self.ids[position] == product_id:
+            return position
+        return None
+
+    def name_at(self, position):
+        """Decode the product name stored at a column position"""
+        start = self.name_offsets[position]
+        end = self.name_offsets[position + 1]
+        return self.name_data[start:end].decode('utf-8')
+
+    def row_at(self, position):
+        """Build the row tuple for a column position"""
+        return (
+            self.ids[position],
+            self.name_at(position),
+            self.prices[position],
+            self.quantities[position],
+            self.category_names[self.category_codes[position]]
+        )
+
+    def update_stock(self, product_id, quantity_change):
+        """Update stock level for a product"""
+        position = self.position_of(product_id)
+        if position is None:
+            return False
+        quantity = self.quantities[position] + quantity_change
+        self.quantities[position] = quantity if quantity > 0 else 0
+        self.changed.notify(product_id)
+        self.versions.next()
+        return True
+
+    def update_price(self, product_id, price):
+        """Set the unit price of a product"""
+        position = self.position_of(product_id)
+        if position is None:
+            return False
+        self.prices[position] = price
+        self.changed.notify(product_id)
+        self.versions.next()
+        return True
+
+    def update_stock_many(self, quantity_changes):
+        """Apply a product_id -> quantity change mapping; returns the ids that were not found"""
+        missing = []
+        quantities = self.quantities
+        for product_id, quantity_change in quantity_changes.items():
+            position = self.position_of(product_id)
+            if position is None:
+                missing.append(product_id)
+                continue
+            quantity = quantities[position] + quantity_change
+            quantities[position] = quantity if quantity > 0 else 0
+            self.changed.notify(product_id)
+        self.versions.next()
+        return missing
+
+    def get_inventory_report(self):
+        """Generate inventory report as a view of row tuples"""
+        return self.inventory
+
+    def get_low_stock_report(self, threshold=5, reorder_points=None):
+        """Generate report of products with low stock.
+
+        With reorder_points (aligned with the row order), a product is low at or below
+        its own reorder point; rows past the end of reorder_points use threshold.
+        """
+        if np is not None:
+            with self.column_lock:
+                quantities = np.frombuffer(self.quantities, dtype=np.int64)
+                positions = np.flatnonzero(below_limits(quantities, threshold, reorder_points)).tolist()
+                del quantities  # release the buffer so the array can keep growing
+        else:
+            positions = [i for i, quantity in enumerate(self.quantities)
+                         if is_below_limit(quantity, i, threshold, reorder_points)]
+        return ProductRowView(self, positions)
+
+    def get_product_by_id(self, product_id):
+        """Find a product by ID"""
+        position = self.position_of(product_id)
+        if position is None:
+            return None
+        return self.row_at(position)
+
+    def get_product_by_name(self, name, limit=None, offset=0):
+        """Find products by name (partial match)"""
+        # No name index here: it would cost more memory than the columns save
+        needle = name.casefold()
+        end = None if limit is None else offset + limit
+        positions = []
+        for i in range(len(self.ids)):
+            if needle in self.name_at(i).casefold():
+                positions.append(i)
+                if end is not None and len(positions) >= end:
+                    break
+        return ProductRowView(self, positions[offset:end])
+
+    def get_products_by_name_prefix(self, prefix, limit=10, offset=0):
+        """Find products whose name starts with a prefix, for autocomplete"""
+        prefix = prefix.casefold()
+        positions = sorted(
+            (i for i in range(len(self.ids)) if self.name_at(i).casefold().startswith(prefix)),
+            key=lambda i: self.name_at(i).casefold()
+        )
+        end = None if limit is None else offset + limit
+        return ProductRowView(self, positions[offset:end])
+
+    def get_products_by_category(self, category):
+        """Find products by category"""
+        category = category.casefold()
+        codes = [code for code, name in enumerate(self.category_names) if name.casefold() == category]
+        if not codes:
+            return ProductRowView(self, [])
+        if np is not None:
+            with self.column_lock:
+                column = np.frombuffer(self.category_codes, dtype=np.dtype(self.category_codes.typecode))
+                positions = np.flatnonzero(np.isin(column, codes)).tolist()
+                del column
+        else:
+            wanted = set(codes)
+            positions = [i for i, code in enumerate(self.category_codes) if code in wanted]
+        return ProductRowView(self, positions)
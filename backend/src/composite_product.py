@@ -1,29 +1,186 @@
 """
 Composite Product
-Calculates cost of composite products using recursive approach
+Calculates cost of composite products over a bill-of-materials DAG with memoized sub-assemblies
 """
 
+import weakref
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; buildability falls back to pure Python
+    np = None
+
 class CompositeProduct:
     def __init__(self, name, components):
         self.name = name
         self.components = components  # List of [product_id, quantity] or nested CompositeProducts
     
     def calculate_cost(self, inventory_manager):
-        """Recursively calculate the cost of a composite product"""
-        total_cost = 0.0
-        
-        for component in self.components:
+        """Calculate the cost of a composite product, evaluating each shared sub-assembly once"""
+        return CompositeCostEngine(inventory_manager).calculate_cost(self)
+
+class CompositeCostEngine:
+    """Bill-of-materials cost engine.
+    
+    Composites form a DAG: the same sub-assembly object may appear under many
+    parents. Costs are memoized per composite, and the engine remembers which
+    composites use each product and each sub-assembly, so a price change only
+    invalidates the composites above that product. Evaluation is iterative, so
+    deep BOMs do not hit the recursion limit, and cycles raise ValueError.
+    Composites are treated as immutable once they have been evaluated.
+    """
+    
+    def __init__(self, inventory_manager):
+        self.inventory_manager = inventory_manager
+        self.costs = weakref.WeakKeyDictionary()          # composite -> memoized cost
+        self.requirements = weakref.WeakKeyDictionary()   # composite -> {product_id: total quantity}
+        self.parents = weakref.WeakKeyDictionary()        # composite -> composites that contain it
+        self.product_users = {}                           # product_id -> composites that use it directly
+        self.linked = weakref.WeakSet()                   # composites whose edges are recorded
+    
+    def clear(self):
+        """Forget every memoized cost and recorded edge"""
+        self.costs.clear()
+        self.requirements.clear()
+        self.parents.clear()
+        self.product_users.clear()
+        self.linked.clear()
+    
+    def _link(self, composite):
+        """Record the reverse edges from a composite's components back to it"""
+        if composite in self.linked:
+            return
+        for component in composite.components:
             if isinstance(component, CompositeProduct):
-                # Recursive case: component is another composite product
-                total_cost += component.calculate_cost(inventory_manager)
+                self.parents.setdefault(component, weakref.WeakSet()).add(composite)
             else:
-                # Base case: component is a simple product [product_id, quantity]
-                product_id, quantity = component
-                product = inventory_manager.get_product_by_id(product_id)
-                if product:
-                    total_cost += product[2] * quantity
+                self.product_users.setdefault(component[0], weakref.WeakSet()).add(composite)
+        self.linked.add(composite)
+    
+    def post_order(self, composite, memo):
+        """Yield composites under (and including) composite, children before parents.
+        
+        Composites already in memo are skipped along with everything below them.
+        """
+        on_path = set()
+        stack = [(composite, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                on_path.discard(id(node))
+                if node not in memo:
+                    yield node
+                continue
+            if node in memo:
+                continue
+            if id(node) in on_path:
+                raise ValueError(f"Composite product '{node.name}' contains itself")
+            on_path.add(id(node))
+            stack.append((node, True))
+            for component in node.components:
+                if isinstance(component, CompositeProduct) and component not in memo:
+                    stack.append((component, False))
+    
+    def calculate_cost(self, composite):
+        """Get the cost of a composite, computing only sub-assemblies not already memoized"""
+        costs = self.costs
+        for node in self.post_order(composite, costs):
+            self._link(node)
+            total_cost = 0.0
+            for component in node.components:
+                if isinstance(component, CompositeProduct):
+                    total_cost += costs[component]
+                else:
+                    product_id, quantity = component
+                    product = self.inventory_manager.get_product_by_id(product_id)
+                    if product:
+                        total_cost += product[2] * quantity
+            costs[node] = total_cost
+        return costs[composite]
+    
+    def flatten(self, composite):
+        """Get the total quantity of each product needed for one unit of a composite"""
+        requirements = self.requirements
+        for node in self.post_order(composite, requirements):
+            totals = {}
+            for component in node.components:
+                if isinstance(component, CompositeProduct):
+                    for product_id, quantity in requirements[component].items():
+                        totals[product_id] = totals.get(product_id, 0) + quantity
+                else:
+                    product_id, quantity = component
+                    totals[product_id] = totals.get(product_id, 0) + quantity
+            # Requirements depend only on structure, so they never need invalidating
+            requirements[node] = totals
+        return requirements[composite]
+    
+    def invalidate_product(self, product_id):
+        """Drop the memoized cost of every composite that depends on a product"""
+        users = self.product_users.get(product_id)
+        if not users:
+            return
+        stack = list(users)
+        while stack:
+            composite = stack.pop()
+            if self.costs.pop(composite, None) is None:
+                continue  # already invalidated, so its ancestors are too
+            stack.extend(self.parents.get(composite, ()))
+
+class BuildabilityPlan:
+    """Precomputed requirement vectors for evaluating how many units of many composites can be built.
+    
+    The flattened requirements of every composite are packed into flat arrays
+    (product index, quantity per unit, segment offsets), so one evaluation is a
+    gather of current stock followed by a segmented min-reduction of
+    stock // required, vectorized with NumPy when it is installed.
+    """
+    
+    def __init__(self, engine, composites):
+        self.product_ids = []     # distinct product ids, in first-seen order
+        self.indexes = []         # per requirement: index into product_ids
+        self.quantities = []      # per requirement: quantity needed per unit
+        self.offsets = []         # per composite: start of its requirements, or None if it needs nothing
+        positions = {}
+        for composite in composites:
+            requirements = [(product_id, quantity) for product_id, quantity in engine.flatten(composite).items()
+                            if quantity > 0]
+            if not requirements:
+                self.offsets.append(None)
+                continue
+            self.offsets.append(len(self.indexes))
+            for product_id, quantity in requirements:
+                # A fractional quantity would truncate to zero units per kit in the int64 arrays
+                if quantity != int(quantity):
+                    raise ValueError(f"Component quantity must be a whole number: {quantity!r}")
+                if product_id not in positions:
+                    positions[product_id] = len(self.product_ids)
+                    self.product_ids.append(product_id)
+                self.indexes.append(positions[product_id])
+                self.quantities.append(quantity)
+        self.segment_starts = [offset for offset in self.offsets if offset is not None]
+        if np is not None:
+            self.indexes = np.array(self.indexes, dtype=np.int64)
+            self.quantities = np.array(self.quantities, dtype=np.int64)
+            self.segment_starts = np.array(self.segment_starts, dtype=np.int64)
+    
+    def evaluate(self, inventory_manager):
+        """Get the maximum buildable quantity of each composite from current stock"""
+        stock = []
+        for product_id in self.product_ids:
+            product = inventory_manager.get_product_by_id(product_id)
+            stock.append(product[3] if product else 0)
+        
+        if np is not None and len(self.segment_starts):
+            units = np.array(stock, dtype=np.int64)[self.indexes] // self.quantities
+            minima = np.minimum.reduceat(units, self.segment_starts).tolist()
+        else:
+            units = [stock[index] // quantity for index, quantity in zip(self.indexes, self.quantities)]
+            ends = list(self.segment_starts[1:]) + [len(units)]
+            minima = [min(units[start:end]) for start, end in zip(self.segment_starts, ends)]
         
-        return total_cost
+        # Composites that need no products report 0
+        minima = iter(minima)
+        return [0 if offset is None else max(next(minima), 0) for offset in self.offsets]
 
 def create_sample_composite():
     """Create a sample composite product for testing"""
@@ -33,4 +190,4 @@ def create_sample_composite():
         [2, 1],  # 1 Mouse
         [3, 1]   # 1 Keyboard
     ]
-    return CompositeProduct("Computer Bundle", components)
\ No newline at end of file
+    return CompositeProduct("Computer Bundle", components)
@@ -0,0 +1,201 @@
+"""
+Concurrency
+Locking primitives shared by the inventory components when served from many threads
+"""
+
+import threading
+
+OPTIMISTIC_READS = 3  # copies a SnapshotGate reader attempts before holding writes off
+
+
+class PicklableLock:
+    """A threading lock that pickles as a fresh, unlocked lock, so locked components can be snapshotted"""
+
+    def __init__(self, reentrant=False):
+        self.reentrant = reentrant
+        self.lock = threading.RLock() if reentrant else threading.Lock()
+
+    def __enter__(self):
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.lock.__exit__(*exc_info)
+
+    def acquire(self, blocking=True):
+        return self.lock.acquire(blocking)
+
+    def release(self):
+        self.lock.release()
+
+    def __reduce__(self):
+        return (self.__class__, (self.reentrant,))
+
+
+class ChangeNotifier:
+    """Lets threads block until something changes, and event loops register wake-up callbacks.
+
+    Pickles as a fresh notifier with no listeners.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.waiting = 0  # threads inside wait_for
+        self.listeners = []
+
+    def notify(self, *args):
+        """Wake every waiting thread and call every listener with args"""
+        # Skip the condition's lock when nobody waits: a waiter registers before it
+        # checks its predicate, so a change it misses here is one it will see
+        if self.waiting:
+            with self.condition:
+                self.condition.notify_all()
+        for listener in self.listeners:
+            listener(*args)
+
+    def wait_for(self, predicate, timeout):
+        """Block until predicate() is true or timeout seconds pass; returns the last result of predicate"""
+        with self.condition:
+            self.waiting += 1
+            try:
+                return self.condition.wait_for(predicate, timeout)
+            finally:
+                self.waiting -= 1
+
+    def add_listener(self, callback):
+        """Call callback (from the notifying thread) after every change"""
+        self.listeners.append(callback)
+
+    def __reduce__(self):
+        return (self.__class__, ())
+
+
+class StripedLock:
+    """A fixed pool of locks; each key maps to one stripe, so unrelated keys rarely contend"""
+
+    def __init__(self, stripes=64):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def lock_for(self, key):
+        """Get the lock guarding a key"""
+        return self.locks[hash(key) % len(self.locks)]
+
+    def hold(self, keys):
+        """Context manager that holds the stripes of several keys at once"""
+        return _HeldStripes(self, keys)
+
+
+class _HeldStripes:
+    def __init__(self, striped, keys):
+        # Always acquire in stripe order, so two threads holding overlapping sets cannot deadlock
+        stripes = sorted({hash(key) % len(striped.locks) for key in keys})
+        self.locks = [striped.locks[stripe] for stripe in stripes]
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        for lock in reversed(self.locks):
+            lock.release()
+
+
+class AtomicCounter:
+    """Thread-safe monotonically increasing id allocator; step > 1 allocates every step-th id"""
+
+    step = 1  # counters pickled before steps existed count in ones
+
+    def __init__(self, value=0, step=1):
+        self.value = value
+        self.step = step
+        self.lock = PicklableLock()
+
+    def next(self):
+        """Allocate the next id"""
+        with self.lock:
+            self.value += self.step
+            return self.value
+
+
+class SnapshotBusy(Exception):
+    """A read on a thread that must not wait could not get a copy that no write overlapped"""
+
+
+class SnapshotGate:
+    """Consistent reads of state that many writers change at once.
+
+    Writers run inside writing() and do not wait for each other here, only for
+    their own finer locks. A reader hands read() a function that copies what it
+    needs. The copy runs without blocking anyone and is kept if no write was in
+    progress when it started and none started before it finished, so it saw every
+    write entirely or not at all. After OPTIMISTIC_READS copies that overlapped a
+    write, new writes wait while those in progress finish and one last copy is made;
+    on a thread that called never_wait(), SnapshotBusy is raised instead.
+    """
+
+    def __init__(self, optimistic_reads=OPTIMISTIC_READS):
+        self.optimistic_reads = optimistic_reads
+        self.condition = threading.Condition()
+        self.active = 0    # writes in progress
+        self.started = 0   # writes started so far
+        self.holding = 0   # readers holding new writes off
+        self.local = threading.local()  # depth of the current thread's nested writes
+
+    def writing(self):
+        """Context manager around one write; writes nested in it on the same thread are part of it"""
+        return _GateWrite(self)
+
+    def never_wait(self):
+        """Make reads on the calling thread (an event loop) raise SnapshotBusy rather than wait for writes"""
+        self.local.never_wait = True
+
+    def read(self, copy):
+        """Call copy() until it returns a view no write overlapped; returns that result"""
+        if getattr(self.local, "depth", 0):
+            return copy()  # a writer reading its own state
+        for _ in range(self.optimistic_reads):
+            with self.condition:
+                if self.active or self.holding:
+                    continue
+                started = self.started
+            result = copy()
+            if self.started == started:
+                return result
+        if getattr(self.local, "never_wait", False):
+            raise SnapshotBusy()
+        with self.condition:
+            self.holding += 1
+            while self.active:
+                self.condition.wait()
+        try:
+            return copy()
+        finally:
+            with self.condition:
+                self.holding -= 1
+                self.condition.notify_all()
+
+
+class _GateWrite:
+    def __init__(self, gate):
+        self.gate = gate
+
+    def __enter__(self):
+        gate = self.gate
+        depth = getattr(gate.local, "depth", 0)
+        gate.local.depth = depth + 1
+        if not depth:
+            with gate.condition:
+                while gate.holding:
+                    gate.condition.wait()
+                gate.active += 1
+                gate.started += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        gate = self.gate
+        gate.local.depth -= 1
+        if not gate.local.depth:
+            with gate.condition:
+                gate.active -= 1
+                if gate.holding and not gate.active:
+                    gate.condition.notify_all()
@@ -0,0 +1,89 @@
+"""
+Export
+Streams inventory and transaction history as NDJSON or CSV chunks from generators
+"""
+
+import csv
+import io
+import json
+from operator import itemgetter
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+PRODUCT_FIELDS = ("id", "name", "price", "quantity", "category")
+TRANSACTION_FIELDS = ("id", "timestamp", "type", "product_id", "quantity", "details", "order_id")
+CHUNK_ROWS = 1000  # rows serialized into each yielded chunk
+
+
+def parse_fields(fields, allowed):
+    """Validate a field projection (comma-separated string, list, or None for every field)"""
+    if fields is None or fields == "":
+        return allowed
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field: {unknown[0]} (expected some of {', '.join(allowed)})")
+    return tuple(fields)
+
+
+def iter_products(inventory_manager, category=None, low_stock=None):
+    """Yield product rows, optionally only one category and/or quantity below low_stock"""
+    if category is not None:
+        rows = inventory_manager.get_products_by_category(category)
+        if low_stock is not None:
+            rows = (row for row in rows if row[3] < low_stock)
+    elif low_stock is not None:
+        rows = inventory_manager.get_low_stock_report(low_stock)
+    else:
+        rows = inventory_manager.get_inventory_report()
+    yield from rows
+
+
+def iter_transactions(ledger, product_id=None, after_id=None, before_id=None):
+    """Yield ledger entries oldest first, optionally one product's and/or within an id range"""
+    first_id = 1 if after_id is None else after_id + 1
+    last_id = ledger.count if before_id is None else min(before_id - 1, ledger.count)
+    if product_id is None:
+        yield from ledger.iter_range(first_id, last_id)
+        return
+    for transaction_id in ledger.iter_product_ids(product_id, first_id, last_id):
+        yield ledger.get_transaction(transaction_id)
+
+
+def project(records, keys):
+    """Yield a tuple of the values at keys (indexes or dict keys) from each record"""
+    getter = itemgetter(*keys)
+    if len(keys) == 1:
+        return ((getter(record),) for record in records)
+    return map(getter, records)
+
+
+def iter_chunks(rows, fields, fmt):
+    """Serialize tuples of field values as NDJSON or CSV text, CHUNK_ROWS rows per chunk"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(fields)
+        buffered = 1
+        for row in rows:
+            writer.writerow(row)
+            buffered += 1
+            if buffered >= CHUNK_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                buffered = 0
+        if buffered:
+            yield buffer.getvalue()
+        return
+
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(fields, row))))
+        if len(lines) >= CHUNK_ROWS:
+            lines.append("")
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
@@ -3,48 +3,161 @@ Inventory Manager
 Manages products and generates reports from 2D lists
 """
 
-class InventoryManager:
+from bisect import bisect_left, insort
+
+from src.concurrency import AtomicCounter, ChangeNotifier, PicklableLock
+from src.product_search import ProductSearchIndex
+
+class StockLevelIndex:
+    """Bucketed index of product ids by quantity, with the distinct quantities kept sorted"""
+    
     def __init__(self):
+        self.buckets = {}     # quantity -> set of product ids
+        self.levels = []      # sorted distinct quantities present in buckets
+    
+    def add(self, product_id, quantity):
+        """Index a product at a quantity"""
+        bucket = self.buckets.get(quantity)
+        if bucket is None:
+            bucket = self.buckets[quantity] = set()
+            insort(self.levels, quantity)
+        bucket.add(product_id)
+    
+    def remove(self, product_id, quantity):
+        """Drop a product from the bucket for a quantity"""
+        bucket = self.buckets[quantity]
+        bucket.discard(product_id)
+        if not bucket:
+            del self.buckets[quantity]
+            del self.levels[bisect_left(self.levels, quantity)]
+    
+    def move(self, product_id, old_quantity, new_quantity):
+        """Re-index a product after its quantity changed"""
+        if old_quantity != new_quantity:
+            self.remove(product_id, old_quantity)
+            self.add(product_id, new_quantity)
+    
+    def below(self, threshold):
+        """Get the ids of all products with quantity below the threshold"""
+        product_ids = []
+        for quantity in self.levels[:bisect_left(self.levels, threshold)]:
+            product_ids.extend(self.buckets[quantity])
+        return product_ids
+
+class InventoryManager:
+    id_step = 1  # managers pickled before ids could be strided allocate consecutively
+    
+    def __init__(self, first_id=1, id_step=1):
         # 2D list representing inventory: [product_id, name, price, quantity, category]
         self.inventory = []
-        self.next_id = 1
+        # Hash index over the same row lists: product_id -> row
+        self.products = {}
+        # Secondary indexes: case-folded category -> product ids, and ids bucketed by quantity
+        self.category_index = {}
+        self.stock_index = StockLevelIndex()
+        self.name_index = ProductSearchIndex()
+        # The stock index is shared by every product, so its updates are serialized
+        self.index_lock = PicklableLock()
+        # Bumped after every change, so readers can tell whether cached output is stale
+        self.versions = AtomicCounter()
+        # Called with the product id after each product changes, before the version moves
+        self.changed = ChangeNotifier()
+        # Ids run first_id, first_id + id_step, ...; shards use disjoint residue classes
+        self.next_id = first_id
+        self.id_step = id_step
+    
+    @property
+    def version(self):
+        return self.versions.value
     
     def add_product(self, name, price, quantity, category):
         """Add a new product to inventory"""
+        if not isinstance(name, str) or not isinstance(category, str):
+            raise TypeError("Product name and category must be strings")
+        # Everything that can fail runs before the row and its indexes change
+        folded_category = category.casefold()
         product_id = self.next_id
-        self.inventory.append([product_id, name, price, quantity, category])
-        self.next_id += 1
+        product = [product_id, name, price, quantity, category]
+        self.inventory.append(product)
+        self.products[product_id] = product
+        self.category_index.setdefault(folded_category, []).append(product_id)
+        with self.index_lock:
+            self.stock_index.add(product_id, quantity)
+        self.name_index.add(product_id, name)
+        self.next_id += self.id_step
+        self.changed.notify(product_id)
+        self.versions.next()
         return product_id
     
     def update_stock(self, product_id, quantity_change):
         """Update stock level for a product"""
-        for product in self.inventory:
-            if product[0] == product_id:
-                product[3] += quantity_change
-                if product[3] < 0:
-                    product[3] = 0
-                return True
-        return False
+        product = self.products.get(product_id)
+        if product is None:
+            return False
+        old_quantity = product[3]
+        product[3] += quantity_change
+        if product[3] < 0:
+            product[3] = 0
+        with self.index_lock:
+            self.stock_index.move(product_id, old_quantity, product[3])
+        self.changed.notify(product_id)
+        self.versions.next()
+        return True
+    
+    def update_price(self, product_id, price):
+        """Set the unit price of a product"""
+        product = self.products.get(product_id)
+        if product is None:
+            return False
+        product[2] = price
+        self.changed.notify(product_id)
+        self.versions.next()
+        return True
+    
+    def update_stock_many(self, quantity_changes):
+        """Apply a product_id -> quantity change mapping; returns the ids that were not found"""
+        missing = []
+        for product_id, quantity_change in quantity_changes.items():
+            if not self.update_stock(product_id, quantity_change):
+                missing.append(product_id)
+        return missing
     
     def get_inventory_report(self):
         """Generate inventory report from the 2D list"""
         return self.inventory
     
-    def get_low_stock_report(self, threshold=5):
-        """Generate report of products with low stock"""
-        return [product for product in self.inventory if product[3] < threshold]
+    def get_low_stock_report(self, threshold=5, reorder_points=None):
+        """Generate report of products with low stock.
+        
+        reorder_points (projected mode) gives each product its own limit, aligned
+        with the inventory report order: a product is low at or below its reorder
+        point. Products past the end of reorder_points fall back to threshold.
+        """
+        if reorder_points is not None:
+            # Every product has its own limit, so the stock index cannot narrow the scan
+            low = [product for product, point in zip(self.inventory, reorder_points) if product[3] <= point]
+            low.extend(product for product in self.inventory[len(reorder_points):] if product[3] < threshold)
+            return low
+        # Ids are allocated in insertion order, so sorting keeps the report order
+        with self.index_lock:
+            product_ids = self.stock_index.below(threshold)
+        return [self.products[product_id] for product_id in sorted(product_ids)]
     
     def get_product_by_id(self, product_id):
         """Find a product by ID"""
-        for product in self.inventory:
-            if product[0] == product_id:
-                return product
-        return None
+        return self.products.get(product_id)
     
-    def get_product_by_name(self, name):
+    def get_product_by_name(self, name, limit=None, offset=0):
         """Find products by name (partial match)"""
-        return [product for product in self.inventory if name.lower() in product[1].lower()]
+        product_ids = self.name_index.search(name, limit, offset)
+        return [self.products[product_id] for product_id in product_ids]
+    
+    def get_products_by_name_prefix(self, prefix, limit=10, offset=0):
+        """Find products whose name starts with a prefix, for autocomplete"""
+        product_ids = self.name_index.autocomplete(prefix, limit, offset)
+        return [self.products[product_id] for product_id in product_ids]
     
     def get_products_by_category(self, category):
         """Find products by category"""
-        return [product for product in self.inventory if product[4].lower() == category.lower()]
\ No newline at end of file
+        product_ids = self.category_index.get(category.casefold(), [])
+        return [self.products[product_id] for product_id in product_ids]
\ No newline at end of file
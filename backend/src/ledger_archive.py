@@ -0,0 +1,183 @@
+"""
+Ledger Archive
+Moves old ledger segments out of memory into immutable, compressed, column-wise files
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+
+from src.concurrency import PicklableLock
+
+MAGIC = b"LEDGSEG1"
+HEADER_LENGTH = struct.Struct("<I")
+BLOOM_BITS_PER_PRODUCT = 10  # about 1% false positives with 7 hashes
+BLOOM_HASHES = 7
+CACHED_SEGMENTS = 8  # decoded segments kept in memory for repeated reads
+
+
+class ProductBloomFilter:
+    """Tells whether a product may have entries in a segment; never wrong about "no" """
+
+    def __init__(self, bits, data=None):
+        self.bits = bits
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+
+    def _positions(self, product_id):
+        digest = hashlib.blake2b(product_id.to_bytes(8, "little", signed=True), digest_size=8).digest()
+        first, second = struct.unpack("<II", digest)
+        # Double hashing: k positions from two independent hashes
+        return ((first + i * second) % self.bits for i in range(BLOOM_HASHES))
+
+    def add(self, product_id):
+        for position in self._positions(product_id):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, product_id):
+        return all(self.data[position >> 3] & (1 << (position & 7)) for position in self._positions(product_id))
+
+
+class ArchivedSegment:
+    """Stands in for a LedgerSegment whose entries live in an archive file.
+
+    Holds only the file's metadata; load() decodes the columns (through the
+    archive's cache) when entries are actually read.
+    """
+
+    def __init__(self, archive, path, first_id, last_id, min_timestamp, max_timestamp, bloom):
+        self.archive = archive
+        self.path = path
+        self.first_id = first_id
+        self.last_id = last_id
+        self.min_timestamp = min_timestamp
+        self.max_timestamp = max_timestamp
+        self.bloom = bloom
+
+    def __len__(self):
+        return self.last_id - self.first_id + 1
+
+    def load(self):
+        return self.archive.load(self)
+
+    def time_bounds(self):
+        return self.min_timestamp, self.max_timestamp
+
+    def might_contain(self, product_id):
+        return self.bloom.might_contain(product_id)
+
+
+class LedgerArchive:
+    """A directory of archived ledger segments, one file per segment.
+
+    A file holds a JSON header (id and timestamp ranges, the product bloom filter,
+    type names, and where each column is) followed by the zlib-compressed columns.
+    Files are written once, under a temporary name, and never modified.
+    """
+
+    def __init__(self, directory, cached_segments=CACHED_SEGMENTS):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.cached_segments = cached_segments
+        self.cache = OrderedDict()  # path -> decoded LedgerSegment
+        self.lock = PicklableLock()
+        self.loads = 0
+
+    def __getstate__(self):
+        # Decoded segments are a cache; snapshots only record where the files are
+        return {"directory": self.directory, "cached_segments": self.cached_segments}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["cached_segments"])
+
+    def write(self, segment, first_id, type_names):
+        """Write a full segment to its file; returns the ArchivedSegment that replaces it"""
+        product_ids = set(segment.product_ids)
+        bloom = ProductBloomFilter(max(len(product_ids) * BLOOM_BITS_PER_PRODUCT, 64))
+        for product_id in product_ids:
+            bloom.add(product_id)
+
+        try:
+            quantities = ("q", array('q', segment.quantities).tobytes())
+        except (TypeError, OverflowError):
+            quantities = ("pickle", pickle.dumps(segment.quantities, protocol=pickle.HIGHEST_PROTOCOL))
+        columns = {
+            "timestamps": ("q", segment.timestamps.tobytes()),
+            "type_codes": ("B", segment.type_codes.tobytes()),
+            "product_ids": ("q", segment.product_ids.tobytes()),
+            "quantities": quantities,
+            "details": ("pickle", pickle.dumps(segment.details, protocol=pickle.HIGHEST_PROTOCOL)),
+            "order_ids": ("q", segment.order_ids.tobytes()),
+        }
+        blobs = []
+        layout = {}
+        offset = 0
+        for name, (kind, raw) in columns.items():
+            blob = zlib.compress(raw, 6)
+            layout[name] = [kind, offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+
+        last_id = first_id + len(segment) - 1
+        header = {
+            "first_id": first_id,
+            "last_id": last_id,
+            "min_timestamp": min(segment.timestamps),
+            "max_timestamp": max(segment.timestamps),
+            "bloom_bits": bloom.bits,
+            "bloom": bloom.data.hex(),
+            "type_names": list(type_names),
+            "columns": layout,
+        }
+        encoded = json.dumps(header).encode("utf-8")
+        path = os.path.join(self.directory, f"segment-{first_id:020d}.bin")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded)
+            for blob in blobs:
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return ArchivedSegment(self, path, first_id, last_id, header["min_timestamp"],
+                               header["max_timestamp"], bloom)
+
+    def load(self, archived):
+        """Decode an archived segment's columns, from the cache when possible"""
+        with self.lock:
+            segment = self.cache.get(archived.path)
+            if segment is not None:
+                self.cache.move_to_end(archived.path)
+                return segment
+
+        from src.transaction_ledger import LedgerSegment
+        with open(archived.path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a ledger archive file: {archived.path}")
+        (header_length,) = HEADER_LENGTH.unpack_from(data, len(MAGIC))
+        body = len(MAGIC) + HEADER_LENGTH.size + header_length
+        header = json.loads(data[len(MAGIC) + HEADER_LENGTH.size:body])
+
+        segment = LedgerSegment()
+        for name, (kind, offset, length) in header["columns"].items():
+            raw = zlib.decompress(data[body + offset:body + offset + length])
+            if kind == "pickle":
+                column = pickle.loads(raw)
+            else:
+                column = array(kind)
+                column.frombytes(raw)
+                if name == "quantities":
+                    column = column.tolist()
+            setattr(segment, name, column)
+
+        with self.lock:
+            self.loads += 1
+            self.cache[archived.path] = segment
+            while len(self.cache) > self.cached_segments:
+                self.cache.popitem(last=False)
+        return segment
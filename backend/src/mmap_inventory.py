@@ -0,0 +1,332 @@
+"""
+Memory-Mapped Inventory Manager
+Keeps the product catalog in a file of fixed-width binary records mapped into memory
+"""
+
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; writers in other processes are then not excluded
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to struct scans
+    np = None
+
+from src.columnar_inventory import ProductRowView, below_limits, is_below_limit
+from src.concurrency import ChangeNotifier
+
+MAGIC = b"INVMMAP1"
+# magic, record size, record count, record capacity, next product id, version
+HEADER = struct.Struct("<8sIqqqq")
+VERSION = struct.Struct("<q")
+VERSION_OFFSET = HEADER.size - VERSION.size
+HEADER_SIZE = 64
+NAME_BYTES = 64
+CATEGORY_BYTES = 32
+# product_id, price, quantity, name, category
+RECORD = struct.Struct(f"<qdq{NAME_BYTES}s{CATEGORY_BYTES}s")
+PRICE_OFFSET = 8
+QUANTITY_OFFSET = 16
+INITIAL_CAPACITY = 1024
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("id", "<i8"), ("price", "<f8"), ("quantity", "<i8"),
+        ("name", f"S{NAME_BYTES}"), ("category", f"S{CATEGORY_BYTES}")
+    ])
+
+
+def _decode(raw):
+    return raw.rstrip(b"\0").decode("utf-8")
+
+
+class MmapInventoryManager:
+    """InventoryManager backed by a memory-mapped file of fixed-width records.
+
+    The record for product_id lives at HEADER_SIZE + (product_id - 1) * RECORD.size,
+    so lookups are an offset calculation and update_stock writes the mapped page in
+    place. Opening the file is a single mmap call; nothing is rebuilt on startup.
+    Several processes can open the same file, read-only or not, and share its pages.
+
+    Writers hold an exclusive lock on the file, so processes never allocate the same
+    record, and bump a version kept in the header, so every process sees every
+    change in version. Changes made by other processes are reported to changed
+    listeners, all at once, the next time the version is read. Within a process,
+    map_lock is held while reading through the map and while growing and remapping it.
+
+    Names are stored in 64 bytes and categories in 32 bytes of UTF-8; longer values
+    are rejected.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        if not readonly and (not os.path.exists(path) or os.path.getsize(path) == 0):
+            self._create(path)
+        self.file = open(path, "rb" if readonly else "r+b")
+        self.map = None
+        self.map_lock = threading.RLock()  # reading through the map, and replacing it
+        self._map_file()
+        magic, record_size = HEADER.unpack_from(self.map, 0)[:2]
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"Not an inventory record file: {path}")
+        self.inventory = ProductRowView(self)
+        self.changed = ChangeNotifier()  # called with each changed product id, before the version moves
+        self.seen_version = self._read_version()  # the file's version as of the last change reported
+
+    @staticmethod
+    def _create(path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, RECORD.size, 0, INITIAL_CAPACITY, 1, 0).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + INITIAL_CAPACITY * RECORD.size)
+
+    def _map_file(self):
+        """Map the whole file again; the caller holds map_lock"""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        self.map = mmap.mmap(self.file.fileno(), 0, access=access)
+
+    def _header(self):
+        """Read (count, capacity, next_id) from the mapped header"""
+        with self.map_lock:
+            return HEADER.unpack_from(self.map, 0)[2:5]
+
+    def _read_version(self):
+        with self.map_lock:
+            return VERSION.unpack_from(self.map, VERSION_OFFSET)[0]
+
+    def __len__(self):
+        with self.map_lock:
+            count = self._header()[0]
+            if HEADER_SIZE + count * RECORD.size > len(self.map):
+                self._map_file()  # another process grew the file
+            return count
+
+    @contextmanager
+    def _writing(self):
+        """Hold the map, and the file against writers in other processes, for one change"""
+        self._check_writable()
+        with self.map_lock:
+            if fcntl is not None:
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.file, fcntl.LOCK_UN)
+
+    def _changed(self, product_id):
+        """Report a change made under _writing and move the file's version past it"""
+        self._sync_version()  # report other processes' changes first, so they are not counted as seen
+        self.changed.notify(product_id)
+        self.seen_version += 1
+        VERSION.pack_into(self.map, VERSION_OFFSET, self.seen_version)
+
+    def __getstate__(self):
+        # The data lives in the file; pickling only records where it is
+        self.flush()
+        return {"path": self.path, "readonly": self.readonly}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["readonly"])
+
+    @property
+    def version(self):
+        with self.map_lock:
+            return self._sync_version()
+
+    def _sync_version(self):
+        """Report every product as changed if another process wrote the file since the last check"""
+        version = self._read_version()
+        if version != self.seen_version:
+            # Which products the other process changed is not recorded; ids are positions + 1
+            for position in range(len(self)):
+                self.changed.notify(position + 1)
+            self.seen_version = version
+        return version
+
+    @property
+    def next_id(self):
+        return self._header()[2]
+
+    def _check_writable(self):
+        if self.readonly:
+            raise PermissionError(f"Inventory file opened read-only: {self.path}")
+
+    def check_product(self, name, category):
+        """Get why a product cannot be stored, or None if it fits its record"""
+        if len(name.encode("utf-8")) > NAME_BYTES:
+            return f"name must be at most {NAME_BYTES} bytes of UTF-8"
+        if len(category.encode("utf-8")) > CATEGORY_BYTES:
+            return f"category must be at most {CATEGORY_BYTES} bytes of UTF-8"
+        return None
+
+    def add_product(self, name, price, quantity, category):
+        """Add a new product to inventory"""
+        if not isinstance(name, str) or not isinstance(category, str):
+            raise TypeError("Product name and category must be strings")
+        problem = self.check_product(name, category)
+        if problem is not None:
+            raise ValueError(problem)
+        with self._writing():
+            count, capacity, product_id = self._header()
+            if count == capacity:
+                capacity *= 2
+                self.file.truncate(HEADER_SIZE + capacity * RECORD.size)
+            if HEADER_SIZE + capacity * RECORD.size > len(self.map):
+                self._map_file()  # grown here or by another process
+            RECORD.pack_into(
+                self.map, HEADER_SIZE + count * RECORD.size, product_id, price, quantity,
+                name.encode("utf-8"), category.encode("utf-8")
+            )
+            # Publish the record only after it is fully written
+            HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, count + 1, capacity, product_id + 1,
+                             self._read_version())
+            self._changed(product_id)
+        return product_id
+
+    def position_of(self, product_id):
+        """Get the record position of a product, or None if it does not exist"""
+        # Ids are allocated sequentially and never removed, so position = id - 1
+        position = product_id - 1
+        if 0 <= position < len(self):
+            return position
+        return None
+
+    def row_at(self, position):
+        """Build the row tuple for a record position"""
+        with self.map_lock:
+            product_id, price, quantity, name, category = RECORD.unpack_from(
+                self.map, HEADER_SIZE + position * RECORD.size
+            )
+        return (product_id, _decode(name), price, quantity, _decode(category))
+
+    def update_stock(self, product_id, quantity_change):
+        """Update stock level for a product"""
+        with self._writing():
+            position = self.position_of(product_id)
+            if position is None:
+                return False
+            offset = HEADER_SIZE + position * RECORD.size + QUANTITY_OFFSET
+            quantity = struct.unpack_from("<q", self.map, offset)[0] + quantity_change
+            struct.pack_into("<q", self.map, offset, quantity if quantity > 0 else 0)
+            self._changed(product_id)
+        return True
+
+    def update_price(self, product_id, price):
+        """Set the unit price of a product"""
+        with self._writing():
+            position = self.position_of(product_id)
+            if position is None:
+                return False
+            struct.pack_into("<d", self.map, HEADER_SIZE + position * RECORD.size + PRICE_OFFSET, price)
+            self._changed(product_id)
+        return True
+
+    def update_stock_many(self, quantity_changes):
+        """Apply a product_id -> quantity change mapping; returns the ids that were not found"""
+        missing = []
+        for product_id, quantity_change in quantity_changes.items():
+            if not self.update_stock(product_id, quantity_change):
+                missing.append(product_id)
+        return missing
+
+    def flush(self):
+        """Write dirty pages back to the file"""
+        if not self.readonly:
+            with self.map_lock:
+                self.map.flush()
+
+    def close(self):
+        """Unmap and close the file"""
+        with self.map_lock:
+            self.flush()
+            self.map.close()
+            self.file.close()
+
+    def _scan(self, predicate_numpy, predicate_row):
+        """Get the positions of records matching a predicate, vectorized when NumPy is available.
+
+        predicate_numpy takes the structured record array; predicate_row takes a
+        position and its unpacked record.
+        """
+        with self.map_lock:
+            count = len(self)
+            if np is not None:
+                records = np.frombuffer(self.map, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+                positions = np.flatnonzero(predicate_numpy(records)).tolist()
+                del records  # release the buffer so the map can be resized or closed
+                return positions
+            with memoryview(self.map) as view:
+                records = RECORD.iter_unpack(view[HEADER_SIZE:HEADER_SIZE + count * RECORD.size])
+                return [i for i, record in enumerate(records) if predicate_row(i, record)]
+
+    def get_inventory_report(self):
+        """Generate inventory report as a view of row tuples"""
+        return self.inventory
+
+    def get_low_stock_report(self, threshold=5, reorder_points=None):
+        """Generate report of products with low stock.
+
+        With reorder_points (aligned with the record order), a product is low at or
+        below its own reorder point; records past the end of reorder_points use threshold.
+        """
+        positions = self._scan(
+            lambda records: below_limits(records["quantity"], threshold, reorder_points),
+            lambda i, record: is_below_limit(record[2], i, threshold, reorder_points)
+        )
+        return ProductRowView(self, positions)
+
+    def get_product_by_id(self, product_id):
+        """Find a product by ID"""
+        position = self.position_of(product_id)
+        if position is None:
+            return None
+        return self.row_at(position)
+
+    def get_product_by_name(self, name, limit=None, offset=0):
+        """Find products by name (partial match)"""
+        needle = name.casefold()
+        end = None if limit is None else offset + limit
+        positions = []
+        for i in range(len(self)):
+            if needle in self.row_at(i)[1].casefold():
+                positions.append(i)
+                if end is not None and len(positions) >= end:
+                    break
+        return ProductRowView(self, positions[offset:end])
+
+    def get_products_by_name_prefix(self, prefix, limit=10, offset=0):
+        """Find products whose name starts with a prefix, for autocomplete"""
+        prefix = prefix.casefold()
+        names = {i: self.row_at(i)[1].casefold() for i in range(len(self))}
+        positions = sorted((i for i, name in names.items() if name.startswith(prefix)), key=names.get)
+        end = None if limit is None else offset + limit
+        return ProductRowView(self, positions[offset:end])
+
+    def get_products_by_category(self, category):
+        """Find products by category"""
+        category = category.casefold()
+        # Compare decoded categories once per distinct stored value
+        matches = {}
+
+        def is_match(raw):
+            if raw not in matches:
+                matches[raw] = _decode(raw).casefold() == category
+            return matches[raw]
+
+        def column_mask(records):
+            values, codes = np.unique(records["category"], return_inverse=True)
+            return np.array([is_match(raw) for raw in values], dtype=bool)[codes]
+
+        positions = self._scan(column_mask, lambda i, record: is_match(record[4]))
+        return ProductRowView(self, positions)
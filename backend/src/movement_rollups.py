@@ -0,0 +1,264 @@
+"""
+Movement Rollups
+Counts and units of stock movements per product, per category and overall, in fixed-width
+hourly and daily buckets that are kept up to date as ledger entries are appended
+"""
+
+import pickle
+from array import array
+from bisect import bisect_left, bisect_right
+
+from src.concurrency import PicklableLock
+from src.transaction_ledger import now_micros
+
+# BACKORDER_FILLED is not a ledger type: it counts the ORDER_FULFILLED entries that
+# filled an earlier backorder, whose demand BACKORDER_CREATED has counted already
+ROLLUP_TYPES = ("STOCK_INCREASE", "STOCK_DECREASE", "ORDER_FULFILLED", "BACKORDER_CREATED", "BACKORDER_FILLED")
+UNITS_IN = ("STOCK_INCREASE",)
+UNITS_OUT = ("STOCK_DECREASE", "ORDER_FULFILLED")
+GRANULARITIES = {"hour": 3600, "day": 86400}  # bucket width in seconds, aligned to UTC
+RETENTION = {"hour": 24 * 35, "day": 400}      # buckets kept per product, category and overall
+CATCH_UP_BATCH = 1024  # entries left for the next query before an append rolls them up
+READ_BATCH = 10_000    # product series read per hold of the lock by product_rows
+SLOTS = {transaction_type: slot for slot, transaction_type in enumerate(ROLLUP_TYPES)}
+FULFILLED_SLOT = SLOTS["ORDER_FULFILLED"]
+BACKORDERED_SLOT = SLOTS["BACKORDER_CREATED"]
+BACKORDER_FILLED_SLOT = SLOTS["BACKORDER_FILLED"]
+HOUR_MICROS = 3600 * 1_000_000
+
+
+class BucketSeries:
+    """The non-zero totals of one series at one granularity, as (bucket, type) rows in bucket order.
+
+    Most buckets of a single product see one or two transaction types, so only
+    those rows are stored, column-wise. Quantities are integers unless a float
+    quantity arrives, which turns the column into a list.
+    """
+
+    __slots__ = ("buckets", "slots", "counts", "quantities")
+
+    def __init__(self):
+        self.buckets = array('q')
+        self.slots = array('B')
+        self.counts = array('q')
+        self.quantities = array('q')
+
+    def add(self, bucket, slot, count, quantity):
+        """Add count transactions of type ROLLUP_TYPES[slot], totalling quantity, to a bucket"""
+        if type(quantity) is not int and type(self.quantities) is array:
+            self.quantities = self.quantities.tolist()
+        # New rows nearly always belong at the end; a bucket's rows are contiguous
+        if not self.buckets or self.buckets[-1] < bucket:
+            row = len(self.buckets)
+        else:
+            row = bisect_left(self.buckets, bucket)
+            while row < len(self.buckets) and self.buckets[row] == bucket:
+                if self.slots[row] == slot:
+                    self.counts[row] += count
+                    self.quantities[row] += quantity
+                    return
+                row += 1
+        self.buckets.insert(row, bucket)
+        self.slots.insert(row, slot)
+        self.counts.insert(row, count)
+        self.quantities.insert(row, quantity)
+
+    def expire(self, oldest):
+        """Drop the rows of buckets numbered oldest or lower"""
+        rows = bisect_right(self.buckets, oldest)
+        if rows:
+            for column in (self.buckets, self.slots, self.counts, self.quantities):
+                del column[:rows]
+
+    def window(self, first, last):
+        """Get {bucket: totals} for the buckets first..last that have any rows"""
+        width = len(ROLLUP_TYPES)
+        totals = {}
+        for row in range(bisect_left(self.buckets, first), bisect_right(self.buckets, last)):
+            sums = totals.get(self.buckets[row])
+            if sums is None:
+                sums = totals[self.buckets[row]] = [0] * (2 * width)
+            sums[self.slots[row]] = self.counts[row]
+            sums[self.slots[row] + width] = self.quantities[row]
+        return totals
+
+
+class MovementRollups:
+    """Bucketed movement totals that follow a TransactionLedger.
+
+    Each product, category and the inventory as a whole has a BucketSeries per
+    granularity, so a query reads only the rows of the buckets it covers however
+    many entries they sum. Appends only move a cursor: the entries behind it are
+    rolled up in batches of CATCH_UP_BATCH, and a query first rolls up whatever is
+    left, so it always includes every entry appended before it started.
+    """
+
+    def __init__(self):
+        # granularity -> key -> BucketSeries
+        self.by_product = {granularity: {} for granularity in GRANULARITIES}
+        self.by_category = {granularity: {} for granularity in GRANULARITIES}
+        self.overall = {granularity: BucketSeries() for granularity in GRANULARITIES}
+        self.product_categories = {}  # product_id -> category, as first seen
+        self.rolled_through = 0  # last ledger id included in the series
+        self.open_backorders = set()  # order ids with a BACKORDER_CREATED and no ORDER_FULFILLED yet
+        self.lock = PicklableLock()
+        self.ledger = None
+        self.category_of = None
+
+    def __getstate__(self):
+        # Serialized while holding the lock, so a snapshot taken during a catch-up or a
+        # query never sees series half updated; attach() wires the ledger up again
+        with self.lock:
+            state = self.__dict__.copy()
+            state["ledger"] = None
+            state["category_of"] = None
+            return {"pickled": pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)}
+
+    def __setstate__(self, state):
+        if "pickled" in state:
+            state = pickle.loads(state["pickled"])
+        self.__dict__.update(state)
+        self.__dict__.setdefault("open_backorders", set())
+
+    def attach(self, ledger, category_of):
+        """Follow a ledger's appends; category_of(product_id) returns a product's category or None"""
+        self.ledger = ledger
+        self.category_of = category_of
+        ledger.appended.add_listener(self.on_append)
+
+    def on_append(self, first_id, last_id):
+        # Runs on the appending thread; if another thread is rolling up already, carry on
+        if last_id - self.rolled_through >= CATCH_UP_BATCH and self.lock.acquire(blocking=False):
+            try:
+                self._catch_up(last_id)
+            finally:
+                self.lock.release()
+
+    def catch_up(self):
+        """Roll up every ledger entry that is not in the series yet"""
+        with self.lock:
+            self._catch_up(self.ledger.count)
+
+    def _catch_up(self, last_id):
+        """Roll up entries rolled_through+1..last_id; the caller holds the lock"""
+        if last_id <= self.rolled_through:
+            return
+        slots = {self.ledger.type_lookup[name]: slot for name, slot in SLOTS.items()
+                 if name in self.ledger.type_lookup}
+        # Sum per (hour, product, type) first; a batch usually touches few of them
+        pending = {}
+        open_backorders = self.open_backorders
+        for segment, start, stop in self.ledger.iter_segment_slices(self.rolled_through + 1, last_id):
+            for timestamp, type_code, product_id, quantity, order_id in zip(
+                    segment.timestamps[start:stop], segment.type_codes[start:stop],
+                    segment.product_ids[start:stop], segment.quantities[start:stop],
+                    segment.order_ids[start:stop]):
+                slot = slots.get(type_code)
+                if slot is None:
+                    continue
+                hour = timestamp // HOUR_MICROS
+                key = (hour, product_id, slot)
+                sums = pending.get(key)
+                if sums is None:
+                    pending[key] = [1, quantity]
+                else:
+                    sums[0] += 1
+                    sums[1] += quantity
+                if slot == BACKORDERED_SLOT and order_id:  # order id 0 is an entry without an order
+                    open_backorders.add(order_id)
+                elif slot == FULFILLED_SLOT and order_id in open_backorders:
+                    open_backorders.discard(order_id)
+                    _accumulate(pending, (hour, product_id, BACKORDER_FILLED_SLOT), 1, quantity)
+
+        # Products are added to their own series; categories and the overall series
+        # once per hour and type, from the sums of their products
+        by_category = {}
+        overall = {}
+        for (hour, product_id, slot), (count, quantity) in pending.items():
+            self._add(self.by_product, product_id, hour, slot, count, quantity)
+            category = self._category(product_id)
+            if category is not None:
+                _accumulate(by_category, (hour, category, slot), count, quantity)
+            _accumulate(overall, (hour, slot), count, quantity)
+        for (hour, category, slot), (count, quantity) in by_category.items():
+            self._add(self.by_category, category, hour, slot, count, quantity)
+        for (hour, slot), (count, quantity) in overall.items():
+            self._add(None, None, hour, slot, count, quantity)
+        self.rolled_through = last_id
+
+    def _category(self, product_id):
+        category = self.product_categories.get(product_id)
+        if category is None and self.category_of is not None:
+            category = self.category_of(product_id)
+            if category is not None:
+                self.product_categories[product_id] = category
+        return category
+
+    def _add(self, series_by_key, key, hour, slot, count, quantity):
+        """Add to the hourly and daily series of a key (series_by_key None for overall)"""
+        for granularity, width in GRANULARITIES.items():
+            if series_by_key is None:
+                series = self.overall[granularity]
+            else:
+                series = series_by_key[granularity].get(key)
+                if series is None:
+                    series = series_by_key[granularity][key] = BucketSeries()
+            bucket = hour * 3600 // width
+            opens_bucket = not series.buckets or series.buckets[-1] < bucket
+            series.add(bucket, slot, count, quantity)
+            if opens_bucket:
+                series.expire(bucket - RETENTION[granularity])
+
+    def movement(self, granularity, periods, product_id=None, category=None, now=None):
+        """Get (bucket start in epoch microseconds, totals or None) for the last periods buckets, oldest first.
+
+        The window ends with the bucket holding now (epoch microseconds, default the
+        current time). Totals cover one product, one category, or everything.
+        """
+        self.catch_up()
+        width = GRANULARITIES[granularity]
+        last = (now if now is not None else now_micros()) // 1_000_000 // width
+        first = last - periods + 1
+        with self.lock:
+            if product_id is not None:
+                series = self.by_product[granularity].get(product_id)
+            elif category is not None:
+                series = self.by_category[granularity].get(category)
+            else:
+                series = self.overall[granularity]
+            totals = series.window(first, last) if series is not None else {}
+        return [(bucket * width * 1_000_000, totals.get(bucket)) for bucket in range(first, last + 1)]
+
+    def product_rows(self, granularity, first, last):
+        """Get (product ids, buckets, slots, quantities) columns of every product row in buckets first..last.
+
+        Meant for batch jobs over the whole catalog: rows are copied a series slice
+        at a time, and the lock is released every READ_BATCH products. Like a
+        series, quantities is an integer array unless a float quantity is included.
+        """
+        self.catch_up()
+        with self.lock:
+            series_by_product = list(self.by_product[granularity].items())
+        product_ids, buckets, slots, quantities = array('q'), array('q'), array('B'), array('q')
+        for batch in range(0, len(series_by_product), READ_BATCH):
+            with self.lock:
+                for product_id, series in series_by_product[batch:batch + READ_BATCH]:
+                    start = bisect_left(series.buckets, first)
+                    stop = bisect_right(series.buckets, last)
+                    if start < stop:
+                        if type(series.quantities) is not array and type(quantities) is array:
+                            quantities = quantities.tolist()
+                        product_ids.extend([product_id] * (stop - start))
+                        buckets.extend(series.buckets[start:stop])
+                        slots.extend(series.slots[start:stop])
+                        quantities.extend(series.quantities[start:stop])
+        return product_ids, buckets, slots, quantities
+
+
+def _accumulate(sums, key, count, quantity):
+    current = sums.get(key)
+    if current is None:
+        sums[key] = [count, quantity]
+    else:
+        current[0] += count
+        current[1] += quantity
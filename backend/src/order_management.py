@@ -3,20 +3,55 @@ Order Management
 Manages orders, backorders, and delivery using appropriate data structures
 """
 
+import heapq
+from collections import deque
+
+from src.concurrency import PicklableLock
+
 # i. Queue for customer orders (FIFO)
 class OrderQueue:
     def __init__(self):
-        self.orders = []
+        # deque gives O(1) appends and pops at both ends
+        self.orders = deque()
+        # Checks and pops must not interleave with other consumers
+        self.lock = PicklableLock()
     
     def enqueue(self, order):
         """Add an order to the queue"""
         self.orders.append(order)
     
+    def enqueue_many(self, orders):
+        """Add orders to the back of the queue, keeping their order"""
+        self.orders.extend(orders)
+    
     def dequeue(self):
         """Remove and return the next order from the queue"""
-        if self.is_empty():
-            return None
-        return self.orders.pop(0)
+        with self.lock:
+            if self.is_empty():
+                return None
+            return self.orders.popleft()
+    
+    def dequeue_batch(self, n):
+        """Remove and return up to n orders from the front of the queue"""
+        with self.lock:
+            n = min(n, len(self.orders))
+            popleft = self.orders.popleft
+            return [popleft() for _ in range(n)]
+    
+    def requeue(self, orders):
+        """Put orders back at the front of the queue, keeping their order"""
+        with self.lock:
+            self.orders.extendleft(reversed(orders))
+    
+    def drain(self, limit=None):
+        """Yield orders from the front of the queue until it is empty or limit is reached"""
+        count = 0
+        while limit is None or count < limit:
+            order = self.dequeue()
+            if order is None:
+                return
+            yield order
+            count += 1
     
     def is_empty(self):
         """Check if the queue is empty"""
@@ -34,44 +69,173 @@ class OrderQueue:
 
 # ii. Priority Queue for backorders
 class BackorderPriorityQueue:
+    """Binary heap of backorders; higher priority first, FIFO among equal priorities.
+    
+    Each order is also indexed in a per-product heap, so the waiting orders for one
+    product can be retried in priority order without touching the others.
+    """
+    
     def __init__(self):
+        # Heap entries are [-priority, sequence, order]; the sequence number breaks ties FIFO.
+        # The same entry list sits in the global heap and in its product's heap; taking it
+        # out of either sets order to None, and the other heap discards it lazily.
         self.orders = []
+        self.by_product = {}  # product_id -> heap of entries
+        self.entries = {}     # order_id -> live entry
+        self.sequence = 0
+        self.product_slots = 0  # total entries (live or stale) held in product heaps
+        # Reentrant, since update_priority removes and re-enqueues under the same lock
+        self.lock = PicklableLock(reentrant=True)
+    
+    def _make_entry(self, order, priority):
+        stale = self.entries.get(order["order_id"])
+        if stale is not None:
+            # Re-queued order: drop the old entry (no compaction while heaps are mid-update)
+            self._retire(stale, compact=False)
+        entry = [-priority, self.sequence, order]
+        self.sequence += 1
+        self.entries[order["order_id"]] = entry
+        heapq.heappush(self.by_product.setdefault(order["product_id"], []), entry)
+        self.product_slots += 1
+        return entry
     
     def enqueue(self, order, priority=1):
         """Add a backorder with a priority level"""
-        # Higher priority numbers are processed first
-        self.orders.append((priority, order))
-        # Sort by priority (descending)
-        self.orders.sort(key=lambda x: x[0], reverse=True)
+        with self.lock:
+            # Higher priority numbers are processed first
+            heapq.heappush(self.orders, self._make_entry(order, priority))
+    
+    def enqueue_many(self, orders):
+        """Add many (order, priority) pairs at once"""
+        with self.lock:
+            entries = [self._make_entry(order, priority) for order, priority in orders]
+            if len(entries) > len(self.orders):
+                # Cheaper to rebuild the heap in O(n) than to push one by one
+                self.orders.extend(entries)
+                heapq.heapify(self.orders)
+            else:
+                for entry in entries:
+                    heapq.heappush(self.orders, entry)
+    
+    def _retire(self, entry, compact=True):
+        """Take a live entry out of the queue, leaving a stale slot in the other heap"""
+        order = entry[2]
+        entry[2] = None
+        del self.entries[order["order_id"]]
+        # Rebuild once stale slots outnumber live ones, so the heaps stay O(live)
+        if compact and len(self.orders) + self.product_slots > 4 * len(self.entries) + 32:
+            self._compact()
+        return order
+    
+    def _compact(self):
+        """Rebuild the global and per-product heaps from the live entries"""
+        self.orders = list(self.entries.values())
+        heapq.heapify(self.orders)
+        self.by_product = {}
+        for entry in self.orders:
+            self.by_product.setdefault(entry[2]["product_id"], []).append(entry)
+        for heap in self.by_product.values():
+            heapq.heapify(heap)
+        self.product_slots = len(self.orders)
+    
+    def _discard_removed(self):
+        """Pop removed entries off the top of the heap"""
+        while self.orders and self.orders[0][2] is None:
+            heapq.heappop(self.orders)
+    
+    def _product_heap(self, product_id):
+        """Get a product's heap with removed entries popped off its top, or None if empty"""
+        heap = self.by_product.get(product_id)
+        if heap is None:
+            return None
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self.product_slots -= 1
+        if not heap:
+            del self.by_product[product_id]
+            return None
+        return heap
     
     def dequeue(self):
         """Remove and return the highest priority backorder"""
-        if self.is_empty():
-            return None
-        return self.orders.pop(0)[1]
+        with self.lock:
+            self._discard_removed()
+            if not self.orders:
+                return None
+            return self._retire(heapq.heappop(self.orders))
+    
+    def peek(self):
+        """View the highest priority backorder without removing it"""
+        with self.lock:
+            self._discard_removed()
+            if not self.orders:
+                return None
+            return self.orders[0][2]
+    
+    def dequeue_for_product(self, product_id):
+        """Remove and return the highest priority backorder for one product"""
+        with self.lock:
+            heap = self._product_heap(product_id)
+            if heap is None:
+                return None
+            entry = heapq.heappop(heap)
+            self.product_slots -= 1
+            return self._retire(entry)
+    
+    def peek_for_product(self, product_id):
+        """View the highest priority backorder for one product without removing it"""
+        with self.lock:
+            heap = self._product_heap(product_id)
+            if heap is None:
+                return None
+            return heap[0][2]
+    
+    def remove(self, order_id):
+        """Remove a backorder by order id, returning it (or None if not queued)"""
+        with self.lock:
+            entry = self.entries.get(order_id)
+            if entry is None:
+                return None
+            return self._retire(entry)
+    
+    def update_priority(self, order_id, priority):
+        """Change the priority of a queued backorder; returns False if it is not queued"""
+        with self.lock:
+            order = self.remove(order_id)
+            if order is None:
+                return False
+            order["priority"] = priority
+            self.enqueue(order, priority)
+            return True
     
     def is_empty(self):
         """Check if the priority queue is empty"""
-        return len(self.orders) == 0
+        return len(self.entries) == 0
     
     def size(self):
         """Get the number of backorders in the queue"""
-        return len(self.orders)
+        return len(self.entries)
 
 # iii. Stack for delivery truck loading (LIFO)
 class DeliveryStack:
     def __init__(self):
         self.items = []
+        self.lock = PicklableLock()
     
     def push(self, item):
         """Add an item to the stack"""
         self.items.append(item)
     
+    def push_many(self, items):
+        """Add items to the stack in order; the last one ends up on top"""
+        self.items.extend(items)
+    
     def pop(self):
         """Remove and return the top item from the stack"""
-        if self.is_empty():
-            return None
-        return self.items.pop()
+        with self.lock:
+            if self.is_empty():
+                return None
+            return self.items.pop()
     
     def is_empty(self):
         """Check if the stack is empty"""
@@ -83,6 +247,5 @@ class DeliveryStack:
     
     def peek(self):
         """View the top item without removing it"""
-        if self.is_empty():
-            return None
-        return self.items[-1]
\ No newline at end of file
+        items = self.items
+        return items[-1] if items else None
\ No newline at end of file
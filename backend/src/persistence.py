@@ -0,0 +1,234 @@
+"""
+Persistence
+Write-ahead log and snapshots so inventory state survives a restart
+"""
+
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+
+from src.transaction_ledger import now_micros, parse_timestamp
+
+SNAPSHOT_MAGIC = b"INVSNAP1"
+FSYNC_POLICIES = ("always", "batch", "never")
+
+# InventoryAPI methods that change state and are recorded in the log
+LOGGED_OPERATIONS = (
+    "add_product", "update_stock", "update_price", "place_order", "process_orders", "define_composite",
+    "add_products", "update_stock_bulk", "place_orders"
+)
+
+
+class WriteAheadLog:
+    """Append-only log of operations, one JSON record per line.
+
+    fsync_policy controls durability:
+      "always" - write and fsync every record before returning
+      "batch"  - group commit: buffer records and write + fsync them together once
+                 batch_size records are waiting or flush_interval seconds have passed
+      "never"  - write in batches but leave syncing to the OS
+    A background thread flushes a partly filled batch after flush_interval seconds.
+    """
+
+    def __init__(self, path, fsync_policy="batch", batch_size=64, flush_interval=1.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy} (expected one of {', '.join(FSYNC_POLICIES)})")
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.batch_size = 1 if fsync_policy == "always" else batch_size
+        self.flush_interval = flush_interval
+        self.file = open(path, "ab")
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = None
+        if self.batch_size > 1 and flush_interval:
+            self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self.flusher.start()
+
+    def append(self, record):
+        """Add a record to the log, flushing if the group commit is full"""
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.buffer = []
+            self.file.flush()
+            if self.fsync_policy != "never":
+                os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.flush_interval):
+            with self.lock:
+                if self.buffer and not self.file.closed:
+                    self._flush()
+
+    def flush(self):
+        """Write buffered records and fsync according to the policy"""
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the log file"""
+        self.closed.set()
+        with self.lock:
+            self._flush()
+            self.file.close()
+
+
+def read_log(path):
+    """Yield the records in a log file, stopping at a torn final line"""
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partial write from a crash; everything after it is lost
+            yield json.loads(line)
+
+
+class PersistenceEngine:
+    """Durable storage for an InventoryAPI: snapshots plus the log written since.
+
+    Each mutating API call is appended to the write-ahead log once it has been
+    applied, before it returns. Every snapshot_every records the full state is pickled to a new
+    snapshot and a fresh log file is started, so recovery loads one snapshot
+    and replays at most snapshot_every records.
+    """
+
+    def __init__(self, directory, fsync_policy="batch", batch_size=64, flush_interval=1.0,
+                 snapshot_every=100_000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.api = None
+        self.wal = None
+        self.sequence = 0        # sequence number of the last logged record
+        self.snapshot_sequence = 0
+        self.replaying = False
+
+    def _snapshot_path(self, sequence):
+        return os.path.join(self.directory, f"snapshot-{sequence:020d}.bin")
+
+    def _wal_path(self, sequence):
+        return os.path.join(self.directory, f"wal-{sequence:020d}.log")
+
+    def _open_wal(self):
+        if self.wal is not None:
+            self.wal.close()
+        self.wal = WriteAheadLog(
+            self._wal_path(self.sequence + 1), self.fsync_policy, self.batch_size, self.flush_interval
+        )
+
+    def recover(self, api):
+        """Attach to an API and restore its state from disk; returns False if there was none"""
+        self.api = api
+        snapshots = sorted(glob.glob(os.path.join(self.directory, "snapshot-*.bin")))
+        if not snapshots:
+            return False
+
+        with open(snapshots[-1], "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"Not an inventory snapshot: {snapshots[-1]}")
+            state = pickle.load(f)
+        self.sequence = self.snapshot_sequence = state.pop("sequence")
+        api.restore_state(state)
+
+        # Replay the log tail written after the snapshot
+        self.replaying = True
+        try:
+            for path in sorted(glob.glob(os.path.join(self.directory, "wal-*.log"))):
+                for record in read_log(path):
+                    if record["seq"] <= self.sequence:
+                        continue
+                    try:
+                        self._replay(record)
+                    except Exception as e:
+                        # Keep the rest of the log: set the record aside for inspection
+                        self._quarantine(record, e)
+                    self.sequence = record["seq"]
+        finally:
+            self.replaying = False
+
+        self._open_wal()
+        return True
+
+    def _replay(self, record):
+        op = record["op"]
+        if op not in LOGGED_OPERATIONS:
+            raise ValueError(f"Unknown operation in write-ahead log: {op}")
+        # Ledger entries made during replay keep the timestamp of the original call
+        ledger = self.api.transaction_ledger
+        timestamp = record["ts"]
+        if isinstance(timestamp, str):
+            # Logs written before timestamps were epoch microseconds
+            timestamp = parse_timestamp(timestamp)
+        ledger.clock = lambda: timestamp
+        try:
+            getattr(self.api, op)(*record["args"])
+        finally:
+            ledger.clock = None
+
+    def _quarantine(self, record, error):
+        """Append a log record that failed to replay to quarantine.log, with the error"""
+        print(f"Skipping write-ahead log record {record['seq']} ({record['op']}): {error!r}")
+        entry = dict(record, error=repr(error))
+        with open(os.path.join(self.directory, "quarantine.log"), "ab") as f:
+            f.write(json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def log(self, op, *args, timestamp=None):
+        """Record an operation that has been applied; timestamp is when it started, default now"""
+        if self.replaying:
+            return
+        if self.wal is None:
+            self._open_wal()
+        self.sequence += 1
+        self.wal.append({"seq": self.sequence, "ts": now_micros() if timestamp is None else timestamp, "op": op, "args": list(args)})
+        if self.sequence - self.snapshot_sequence >= self.snapshot_every:
+            # The operation is applied and logged, so the state is consistent here
+            self.snapshot()
+
+    def snapshot(self):
+        """Write a snapshot of the current state and start a new log file"""
+        state = self.api.capture_state()
+        state["sequence"] = self.sequence
+        path = self._snapshot_path(self.sequence)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.snapshot_sequence = self.sequence
+        self._open_wal()
+
+        # The new snapshot covers everything older
+        for old in glob.glob(os.path.join(self.directory, "snapshot-*.bin")):
+            if old != path:
+                os.remove(old)
+        for old in glob.glob(os.path.join(self.directory, "wal-*.log")):
+            if old != self.wal.path:
+                os.remove(old)
+
+    def flush(self):
+        """Force buffered log records to disk"""
+        if self.wal is not None:
+            self.wal.flush()
+
+    def close(self):
+        """Flush and close the log"""
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
@@ -0,0 +1,158 @@
+"""
+Product Search
+Indexes product names for substring search (trigram index) and prefix autocomplete (radix tree)
+"""
+
+from array import array
+
+from src.concurrency import PicklableLock
+
+NGRAM_SIZE = 3
+
+
+class RadixNode:
+    __slots__ = ("edges", "ids")
+
+    def __init__(self):
+        self.edges = {}   # first character of label -> [label, child node]
+        self.ids = None   # product ids whose whole name ends at this node
+
+
+class ProductSearchIndex:
+    """Incrementally maintained name index.
+
+    Names are case-folded once when added. Substring queries look up the
+    posting list of every trigram in the query, scan only the shortest one
+    and verify each candidate against the folded name, which also rules out
+    ids missing from the other lists; prefix queries walk a path-compressed trie so autocomplete results
+    come back in alphabetical order. Adds hold the lock. Searches scan
+    append-only id arrays, which can grow under them, so they only take the lock
+    to pick them; autocomplete holds it for its bounded walk of the trie.
+    """
+
+    def __init__(self):
+        self.names = {}       # product_id -> case-folded name
+        self.ids = array('q')  # every indexed product id, in the order added
+        self.ngrams = {}      # trigram -> array of product ids, ascending
+        self.root = RadixNode()
+        self.lock = PicklableLock()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("lock", PicklableLock())
+        if "ids" not in self.__dict__:
+            self.ids = array('q', self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, product_id, name):
+        """Index a product name"""
+        folded = name.casefold()
+        grams = {folded[i:i + NGRAM_SIZE] for i in range(len(folded) - NGRAM_SIZE + 1)}
+        with self.lock:
+            self.names[product_id] = folded
+            self.ids.append(product_id)
+            for gram in grams:
+                postings = self.ngrams.get(gram)
+                if postings is None:
+                    postings = self.ngrams[gram] = array('q')
+                postings.append(product_id)
+            self._insert(folded, product_id)
+
+    def search(self, query, limit=None, offset=0):
+        """Get ids of products whose name contains the query, in id order"""
+        needle = query.casefold()
+        # A product's name is stored before its id is appended to any array, so
+        # every id a scan reaches has a name, however many are added meanwhile
+        names = self.names
+        with self.lock:
+            if len(needle) < NGRAM_SIZE:
+                # Too short for the trigram index; scan the precomputed folded names
+                candidates = self.ids
+            else:
+                postings = []
+                for i in range(len(needle) - NGRAM_SIZE + 1):
+                    gram_postings = self.ngrams.get(needle[i:i + NGRAM_SIZE])
+                    if gram_postings is None:
+                        return []
+                    postings.append(gram_postings)
+                # Any match is in every list; the rarest trigram's list is the fewest to check
+                candidates = min(postings, key=len)
+
+        end = None if limit is None else offset + limit
+        matches = []
+        for product_id in candidates:
+            if needle in names[product_id]:
+                matches.append(product_id)
+                if end is not None and len(matches) >= end:
+                    break
+        return matches[offset:end]
+
+    def autocomplete(self, prefix, limit=10, offset=0):
+        """Get ids of products whose name starts with the prefix, in alphabetical order"""
+        end = None if limit is None else offset + limit
+        matches = []
+        # Splitting an edge rewrites it in two steps, so the walk excludes adds
+        with self.lock:
+            node = self._find_prefix(prefix.casefold())
+            if node is None:
+                return []
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                if node.ids:
+                    matches.extend(node.ids)
+                    if end is not None and len(matches) >= end:
+                        break
+                # Push children in reverse so the smallest label is visited first
+                for key in sorted(node.edges, reverse=True):
+                    stack.append(node.edges[key][1])
+        return matches[offset:end]
+
+    def _insert(self, key, product_id):
+        """Insert a folded name into the radix tree"""
+        node = self.root
+        i = 0
+        while i < len(key):
+            edge = node.edges.get(key[i])
+            if edge is None:
+                leaf = RadixNode()
+                node.edges[key[i]] = [key[i:], leaf]
+                node = leaf
+                break
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(key) - i)
+            while common < limit and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge at the first differing character
+                middle = RadixNode()
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0] = label[:common]
+                edge[1] = middle
+                child = middle
+            node = child
+            i += common
+        if node.ids is None:
+            node.ids = []
+        node.ids.append(product_id)
+
+    def _find_prefix(self, prefix):
+        """Get the node under which every name starting with the prefix lives"""
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            edge = node.edges.get(prefix[i])
+            if edge is None:
+                return None
+            label, child = edge
+            rest = prefix[i:]
+            if label.startswith(rest):
+                return child
+            if not rest.startswith(label):
+                return None
+            node = child
+            i += len(label)
+        return node
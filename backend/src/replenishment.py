@@ -0,0 +1,146 @@
+"""
+Replenishment
+Forecasts each product's daily demand from the daily movement rollups and turns it into
+reorder points and suggested order quantities for the whole catalog in one batch
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; forecasts fall back to pure Python
+    np = None
+
+from src.movement_rollups import BACKORDER_FILLED_SLOT, BACKORDERED_SLOT, FULFILLED_SLOT
+
+HISTORY_DAYS = 28      # complete days of demand a forecast looks back over
+SMOOTHING = 0.2        # exponential smoothing weight of the most recent day
+LEAD_TIME_DAYS = 7     # days from placing a purchase order to receiving the stock
+SERVICE_FACTOR = 1.65  # safety stock in standard deviations of lead-time demand (~95% of cycles without a stock-out)
+COVER_DAYS = 14        # an order tops stock up to the reorder point plus this many days of demand
+# Demand is every unit customers asked for: fulfilled at once, or backordered. A
+# backorder filled later was counted when it was created, so its fulfillment is not.
+DEMAND_SIGNS = {FULFILLED_SLOT: 1, BACKORDERED_SLOT: 1, BACKORDER_FILLED_SLOT: -1}
+
+
+def demand_history(rollups, product_ids, last_day, days=HISTORY_DAYS):
+    """Get the daily demand of each product over the days days ending with day number last_day.
+
+    Returns a len(product_ids) x days matrix, oldest day first: a NumPy array, or a
+    list of row lists without NumPy. Products without rollups have all-zero rows.
+    A day on which backorders created before the window were filled can come out
+    negative; it counts as no demand.
+    """
+    first_day = last_day - days + 1
+    row_ids, buckets, slots, quantities = rollups.product_rows("day", first_day, last_day)
+    if np is not None:
+        history = np.zeros((len(product_ids), days))
+        ids = np.asarray(product_ids, dtype=np.int64)
+        if not len(ids) or not row_ids:
+            return history
+        # Map each rollup row to the position of its product with one sort and a binary search
+        row_ids = np.frombuffer(row_ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        found = np.minimum(np.searchsorted(ids[order], row_ids), len(ids) - 1)
+        known = ids[order][found] == row_ids
+        cells = order[found[known]] * days + (np.frombuffer(buckets, dtype=np.int64)[known] - first_day)
+        # Rows of types that are not demand get a weight of 0
+        signs = np.zeros(256)
+        for slot, sign in DEMAND_SIGNS.items():
+            signs[slot] = sign
+        weights = (np.asarray(quantities, dtype=np.float64) * signs[np.frombuffer(slots, dtype=np.uint8)])[known]
+        history = np.bincount(cells, weights=weights, minlength=history.size).reshape(history.shape)
+        return np.maximum(history, 0, out=history)
+
+    positions = {product_id: position for position, product_id in enumerate(product_ids)}
+    history = [[0] * days for _ in product_ids]
+    for product_id, bucket, slot, quantity in zip(row_ids, buckets, slots, quantities):
+        position = positions.get(product_id)
+        if position is not None and slot in DEMAND_SIGNS:
+            history[position][bucket - first_day] += DEMAND_SIGNS[slot] * quantity
+    return [[max(demand, 0) for demand in row] for row in history]
+
+class DemandForecast:
+    """Smoothed daily demand and its day-to-day spread for a list of products.
+
+    The rate is an exponentially weighted average of the history, the most recent
+    day weighing most; the spread is the standard deviation of daily demand. Both
+    are computed for every product at once, as a matrix-vector product and a
+    row-wise reduction when NumPy is installed.
+    """
+
+    def __init__(self, product_ids, history, smoothing=SMOOTHING):
+        self.product_ids = product_ids
+        self.positions = None  # product_id -> position, built on the first lookup
+        days = len(history[0]) if len(history) else HISTORY_DAYS
+        weights = [smoothing * (1 - smoothing) ** (days - 1 - day) for day in range(days)]
+        total = sum(weights)
+        weights = [weight / total for weight in weights]
+        if np is not None:
+            history = np.asarray(history, dtype=np.float64).reshape(len(product_ids), days)
+            self.rate = history @ np.array(weights)
+            self.spread = history.std(axis=1)
+        else:
+            self.rate = []
+            self.spread = []
+            for row in history:
+                mean = sum(row) / days
+                self.rate.append(sum(weight * demand for weight, demand in zip(weights, row)))
+                self.spread.append(math.sqrt(sum((demand - mean) ** 2 for demand in row) / days))
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def position_of(self, product_id):
+        """Get the position of a product in the forecast, or None if it is not in it"""
+        if self.positions is None:
+            self.positions = {product_id: position for position, product_id in enumerate(self.product_ids)}
+        return self.positions.get(product_id)
+
+    def reorder_points(self, lead_time_days=LEAD_TIME_DAYS, service_factor=SERVICE_FACTOR):
+        """Get (reorder points, safety stocks): demand over the lead time plus service_factor deviations of it"""
+        root = math.sqrt(lead_time_days)
+        if np is not None:
+            safety = service_factor * self.spread * root
+            return self.rate * lead_time_days + safety, safety
+        safety = [service_factor * spread * root for spread in self.spread]
+        return [rate * lead_time_days + extra for rate, extra in zip(self.rate, safety)], safety
+
+    def plan(self, stock, lead_time_days=LEAD_TIME_DAYS, service_factor=SERVICE_FACTOR, cover_days=COVER_DAYS):
+        """Get the replenishment plan for stock levels aligned with product_ids.
+
+        Returns a dict of columns: reorder_point, safety_stock, order_quantity and
+        days_of_cover. A product at or below its reorder point gets an order that
+        tops it up to the reorder point plus cover_days of demand; the others get 0.
+        Days of cover is stock over the daily rate, infinite for products without demand.
+        """
+        reorder_points, safety = self.reorder_points(lead_time_days, service_factor)
+        if np is not None:
+            stock = np.asarray(stock, dtype=np.float64)
+            targets = reorder_points + self.rate * cover_days
+            orders = np.where(stock <= reorder_points, np.ceil(np.maximum(targets - stock, 0)), 0).astype(np.int64)
+            cover = np.full(len(stock), math.inf)
+            np.divide(stock, self.rate, out=cover, where=self.rate > 0)
+        else:
+            orders = []
+            cover = []
+            for rate, point, quantity in zip(self.rate, reorder_points, stock):
+                target = point + rate * cover_days
+                orders.append(math.ceil(max(target - quantity, 0)) if quantity <= point else 0)
+                cover.append(quantity / rate if rate > 0 else math.inf)
+        return {
+            "reorder_point": reorder_points,
+            "safety_stock": safety,
+            "order_quantity": orders,
+            "days_of_cover": cover
+        }
+
+
+def due_positions(plan):
+    """Get the positions with a suggested order, by ascending days of cover"""
+    orders = plan["order_quantity"]
+    cover = plan["days_of_cover"]
+    if np is not None:
+        due = np.flatnonzero(orders > 0)
+        return due[np.argsort(cover[due], kind="stable")].tolist()
+    return sorted((position for position, quantity in enumerate(orders) if quantity > 0), key=cover.__getitem__)
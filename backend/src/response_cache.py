@@ -0,0 +1,57 @@
+"""
+Response Cache
+Keeps the serialized body of read endpoints for the state version it was built from
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Serialized responses keyed by request, each valid for one state version.
+
+    A cached body is reused while the version it was built for is still current, so
+    repeated polls of an unchanged endpoint skip both the query and the serialization.
+    The least recently used entries are dropped beyond max_entries.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (version, body)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, render):
+        """Get the body for key at version, calling render() to build it on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Render outside the lock; the version was read before rendering, so a body is
+        # never labelled newer than the state it shows
+        body = render()
+        with self.lock:
+            self.entries[key] = (version, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return body
+
+
+def make_etag(version):
+    """Quoted entity tag for a state version"""
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against an entity tag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison: W/"v" matches "v"
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
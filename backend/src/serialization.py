@@ -0,0 +1,67 @@
+"""
+Serialization
+Encodes responses to JSON bytes with orjson when it is installed, and keeps the
+encoded form of every product so full inventory responses are assembled by joining bytes
+"""
+
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from src.api import product_to_dict
+
+
+def stdlib_dumps(obj):
+    """Encode obj as compact UTF-8 JSON with the standard library"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+dumps = orjson.dumps if orjson is not None else stdlib_dumps
+ENCODER = "orjson" if orjson is not None else "json"
+
+
+class ProductFragmentCache:
+    """The encoded JSON object of every product, in catalog order.
+
+    The inventory manager reports each changed product id before its version moves,
+    and only those products are encoded again on the next read, so a full response
+    costs one join however large the catalog is. A response built after reading a
+    version therefore includes every change that version counts.
+    """
+
+    def __init__(self, inventory_manager, dumps=dumps):
+        self.inventory_manager = inventory_manager
+        self.dumps = dumps
+        self.fragments = {}   # product_id -> encoded product, in catalog order
+        self.stale = set()    # ids changed since their fragment was encoded
+        self.lock = threading.Lock()
+        # Listen before the first fill, so a change made during it is seen afterwards
+        inventory_manager.changed.add_listener(self.stale.add)
+        for product in inventory_manager.get_inventory_report():
+            self.fragments[product[0]] = self.dumps(product_to_dict(product))
+
+    def refresh(self):
+        """Encode every product changed since the last refresh; the caller holds the lock"""
+        added = []
+        while self.stale:
+            product_id = self.stale.pop()
+            product = self.inventory_manager.get_product_by_id(product_id)
+            if product is None:
+                continue
+            if product_id in self.fragments:
+                self.fragments[product_id] = self.dumps(product_to_dict(product))
+            else:
+                added.append(product)
+        # New products go after the existing ones, in id order like the catalog
+        for product in sorted(added):
+            self.fragments[product[0]] = self.dumps(product_to_dict(product))
+
+    def encode_inventory(self):
+        """The whole catalog as a JSON array of products"""
+        with self.lock:
+            self.refresh()
+            return b"[" + b",".join(self.fragments.values()) + b"]"
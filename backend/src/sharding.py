@@ -0,0 +1,573 @@
+"""
+Sharding
+Partitions the catalog by product id across worker processes, each running its own
+InventoryAPI, behind a router with the InventoryAPI interface
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from src.api import BULK_FIELDS, build_composite, validate_batch
+from src.concurrency import AtomicCounter
+
+KIT_SHARD = 0         # the shard whose InventoryAPI registers (and persists) every kit
+PAGE_SIZE = 1000      # rows fetched from a shard per call while streaming an export
+POLL_SECONDS = 0.25   # how often a waiting change-feed request checks the shards again
+
+
+def shard_of(product_id, shards):
+    """Get the index of the shard that owns a product (or order) id"""
+    return (product_id - 1) % shards
+
+
+def run_shard(index, shards, options, connection):
+    """Worker process body: serve InventoryAPI calls for one shard until the router hangs up.
+
+    Requests are (request id, method name, args) tuples, handled one at a time in
+    arrival order; each answer is (request id, succeeded, result or exception).
+    """
+    from src.api import InventoryAPI
+    persistence = None
+    if options.get("data_dir"):
+        from src.persistence import PersistenceEngine
+        persistence = PersistenceEngine(
+            os.path.join(options["data_dir"], f"shard-{index}"),
+            fsync_policy=options.get("fsync_policy", "batch"),
+            batch_size=options.get("fsync_batch", 64)
+        )
+    archive = options.get("ledger_archive")
+    api = InventoryAPI(
+        storage=options.get("storage", "list"),
+        persistence=persistence,
+        ledger_archive=os.path.join(archive, f"shard-{index}") if archive else None,
+        shard=(index, shards)
+    )
+    try:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            request_id, method, args = message
+            try:
+                answer = (request_id, True, getattr(api, method)(*args))
+            except Exception as e:
+                answer = (request_id, False, e)
+            try:
+                connection.send(answer)
+            except Exception as e:  # nothing is written when the answer does not pickle
+                connection.send((request_id, False, RuntimeError(f"Unpicklable answer from {method}: {e}")))
+    finally:
+        if persistence is not None:
+            persistence.close()
+
+
+class ShardClient:
+    """The router's end of one shard process.
+
+    Calls are pipelined: any number of threads can have requests in flight, and a
+    reader thread, started by listen(), hands each answer to the Future of its request.
+    """
+
+    def __init__(self, context, index, shards, options):
+        self.index = index
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=run_shard, args=(index, shards, options, child),
+                                       name=f"inventory-shard-{index}", daemon=True)
+        self.process.start()
+        child.close()
+        self.send_lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.pending = {}  # request id -> Future
+        self.reader = threading.Thread(target=self._read, name=f"inventory-shard-{index}-reader", daemon=True)
+
+    def listen(self):
+        """Start handling answers"""
+        self.reader.start()
+
+    def submit(self, method, *args):
+        """Send a call to the shard; returns a Future of its result"""
+        future = Future()
+        with self.send_lock:
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+            self.connection.send((request_id, method, args))
+        return future
+
+    def call(self, method, *args):
+        """Call an InventoryAPI method on the shard and wait for its result"""
+        return self.submit(method, *args).result()
+
+    def _read(self):
+        while True:
+            try:
+                request_id, succeeded, result = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self.pending.pop(request_id)
+            if succeeded:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+        # The worker is gone: fail every call still waiting for it
+        for request_id in list(self.pending):
+            self.pending.pop(request_id).set_exception(RuntimeError(f"Shard {self.index} exited"))
+
+    def close(self):
+        """Ask the worker to finish and wait for it"""
+        with self.send_lock:
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+        self.process.join()
+        self.connection.close()
+
+
+class ShardedInventoryAPI:
+    """The InventoryAPI interface over shards worker processes, each owning part of the catalog.
+
+    Product p lives on shard (p - 1) % shards: each shard allocates product and
+    order ids from its own residue class, so an id alone names its shard, and new
+    products are placed round-robin. Calls about one product go to its shard;
+    bulk calls are validated here, split by shard and run on all of them at once;
+    reports are gathered from every shard and merged, each shard's part a snapshot
+    of that shard. Each shard has its own order queues and ledger, so orders keep
+    their placement order per product but not across shards, ledger ids are only
+    ordered within one shard, and change-feed cursors hold one ledger id per
+    shard. Kits are registered on KIT_SHARD; costs and buildability are computed
+    here from the rows of the products a kit needs, fetched from their shards.
+    """
+
+    def __init__(self, shards, storage="list", data_dir=None, fsync_policy="batch", fsync_batch=64,
+                 ledger_archive=None):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        if storage == "mmap":
+            raise ValueError("mmap storage places records by id and cannot be sharded")
+        options = {
+            "storage": storage,
+            "data_dir": data_dir,
+            "fsync_policy": fsync_policy,
+            "fsync_batch": fsync_batch,
+            "ledger_archive": ledger_archive
+        }
+        # Forked, so servers that build their API at import time are not imported again by
+        # each worker; every worker starts before the router runs a thread of its own
+        context = multiprocessing.get_context("fork")
+        self.shards = [ShardClient(context, index, shards, options) for index in range(shards)]
+        for shard in self.shards:
+            shard.listen()
+        self.placements = AtomicCounter(-1)  # round-robin cursor for new products
+        from src.composite_product import CompositeCostEngine
+        self.cost_lock = threading.Lock()  # kits, the requirement engine and the kit plan
+        self.composites = self.shards[KIT_SHARD].call("get_composites")
+        self.cost_engine = CompositeCostEngine(None)  # flattens kits into product requirements
+        self.kit_plan = None  # (kit names, BuildabilityPlan) for every registered kit
+        if self.get_system_status()["total_products"] == 0:
+            from data.sample_data import load_sample_data
+            load_sample_data(self)
+
+    def close(self):
+        """Stop every shard process"""
+        for shard in self.shards:
+            shard.close()
+
+    def _owner(self, product_id):
+        return self.shards[shard_of(product_id, len(self.shards))]
+
+    def _gather(self, method, *args):
+        """Call a method on every shard at once; returns their results in shard order"""
+        futures = [shard.submit(method, *args) for shard in self.shards]
+        return [future.result() for future in futures]
+
+    def _scatter(self, items, shard_of_item):
+        """Group items by shard; returns {shard index: (input positions, items)}"""
+        groups = {}
+        for position, item in enumerate(items):
+            positions, shard_items = groups.setdefault(shard_of_item(position, item), ([], []))
+            positions.append(position)
+            shard_items.append(item)
+        return groups
+
+    def _run_scattered(self, method, items, shard_of_item):
+        """Run a bulk method on each shard's share of items; returns (results in input order, fulfilled)"""
+        groups = self._scatter(items, shard_of_item)
+        futures = {index: self.shards[index].submit(method, shard_items)
+                   for index, (positions, shard_items) in groups.items()}
+        results = [None] * len(items)
+        fulfilled = []
+        for index, future in futures.items():
+            result = future.result()
+            for position, item_result in zip(groups[index][0], result["results"]):
+                results[position] = item_result
+            fulfilled.extend(result.get("fulfilled_backorders", ()))
+        return results, fulfilled
+
+    def get_version(self, resource="all"):
+        """Get a version string that changes whenever a resource changes on any shard"""
+        return ",".join(self._gather("get_version", resource))
+
+    def product_category(self, product_id):
+        """Get a product's category, or None if there is no such product"""
+        return self._owner(product_id).call("product_category", product_id)
+
+    def get_products(self, product_ids):
+        """Get the products with the given ids from their shards; ids that do not exist are left out"""
+        # An id that is not an integer names no product, so it has no shard to ask
+        product_ids = [product_id for product_id in product_ids if isinstance(product_id, int)]
+        groups = self._scatter(product_ids, lambda position, product_id: shard_of(product_id, len(self.shards)))
+        futures = [self.shards[index].submit("get_products", shard_ids) for index, (_, shard_ids) in groups.items()]
+        return [product for future in futures for product in future.result()]
+
+    def get_inventory(self):
+        """Get all inventory items, in id order"""
+        return list(heapq.merge(*self._gather("get_inventory"), key=lambda product: product["id"]))
+
+    def get_inventory_json(self):
+        """Get all inventory items as encoded JSON bytes"""
+        from src.serialization import dumps
+        return dumps(self.get_inventory())
+
+    def search_products(self, query, limit=20, offset=0, prefix=False):
+        """Search products by name on every shard and merge the matches in the order one shard gives them"""
+        if prefix:
+            key = lambda product: (product["name"].casefold(), product["id"])
+        else:
+            key = lambda product: product["id"]
+        matches = heapq.merge(*self._gather("search_products", query, offset + limit, 0, prefix), key=key)
+        return list(itertools.islice(matches, offset, offset + limit))
+
+    def add_product(self, name, price, quantity, category):
+        """Add a new product on the next shard in turn"""
+        shard = self.shards[self.placements.next() % len(self.shards)]
+        return shard.call("add_product", name, price, quantity, category)
+
+    def add_products(self, products):
+        """Add many products, spread round-robin over the shards; per-item results are in input order"""
+        errors = validate_batch(products, BULK_FIELDS["add_products"])
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        start = self.placements.next()
+        results, fulfilled = self._run_scattered(
+            "add_products", products, lambda position, product: (start + position) % len(self.shards)
+        )
+        return {"status": "success", "results": results, "fulfilled_backorders": fulfilled}
+
+    def update_stock(self, product_id, quantity_change):
+        """Update product stock levels"""
+        return self._owner(product_id).call("update_stock", product_id, quantity_change)
+
+    def update_stock_bulk(self, adjustments):
+        """Apply many (product_id, quantity_change) adjustments, each shard its own share at the same time"""
+        errors = validate_batch(adjustments, BULK_FIELDS["update_stock_bulk"])
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        results, fulfilled = self._run_scattered(
+            "update_stock_bulk", adjustments, lambda position, item: shard_of(item[0], len(self.shards))
+        )
+        return {"status": "success", "results": results, "fulfilled_backorders": fulfilled}
+
+    def update_price(self, product_id, price):
+        """Update a product's unit price"""
+        return self._owner(product_id).call("update_price", product_id, price)
+
+    def place_order(self, product_id, quantity, customer_name, priority=1):
+        """Place a new order on the product's shard"""
+        return self._owner(product_id).call("place_order", product_id, quantity, customer_name, priority)
+
+    def place_orders(self, orders):
+        """Place many orders, each shard its own share at the same time; per-item results are in input order"""
+        errors = validate_batch(orders, BULK_FIELDS["place_orders"])
+        if errors:
+            return {"status": "error", "message": "Invalid batch", "errors": errors}
+        results, _ = self._run_scattered(
+            "place_orders", orders, lambda position, order: shard_of(order[0], len(self.shards))
+        )
+        return {"status": "success", "results": results}
+
+    def process_orders(self, count=1, batched=True):
+        """Process up to count pending orders, shared out over the shards that have some"""
+        pending = [status["pending_orders"] for status in self._gather("get_system_status")]
+        shares = [0] * len(pending)
+        left = count
+        while left > 0:
+            open_shards = [index for index, size in enumerate(pending) if shares[index] < size]
+            if not open_shards:
+                break
+            each = max(left // len(open_shards), 1)
+            for index in open_shards:
+                take = min(each, pending[index] - shares[index], left)
+                shares[index] += take
+                left -= take
+                if not left:
+                    break
+        futures = [self.shards[index].submit("process_orders", share, batched)
+                   for index, share in enumerate(shares) if share]
+        processed = []
+        for future in futures:
+            processed.extend(future.result()["processed_orders"])
+        return {"status": "success", "processed_orders": processed}
+
+    def get_transactions(self, limit=10, after_id=None, before_id=None, latest=False, product_id=None,
+                         start=None, end=None):
+        """Get transaction history.
+
+        With product_id this is the history on the product's shard, cursors included.
+        Otherwise the shards' entries are merged by timestamp; after_id and before_id
+        need product_id, since ledger ids are only ordered within one shard, and are
+        answered with an error without it.
+        """
+        if product_id is not None:
+            return self._owner(product_id).call(
+                "get_transactions", limit, after_id, before_id, latest, product_id, start, end
+            )
+        if after_id is not None or before_id is not None:
+            return {"status": "error", "message": "after and before cursors need product_id in sharded mode"}
+        from src.transaction_ledger import parse_timestamp
+        entries = [entry for entries in self._gather("get_transactions", limit, None, None, latest, None, start, end)
+                   for entry in entries]
+        entries.sort(key=lambda entry: parse_timestamp(entry["timestamp"]), reverse=latest)
+        return entries[:limit]
+
+    def get_movement(self, product_id=None, category=None, days=30, granularity="day"):
+        """Get stock movement from the product's shard, or summed over every shard"""
+        if product_id is not None:
+            return self._owner(product_id).call("get_movement", product_id, category, days, granularity)
+        results = self._gather("get_movement", None, category, days, granularity)
+        for result in results:
+            if result["status"] != "success":
+                return result
+        merged = results[0]
+        for result in results[1:]:
+            for bucket, other in zip(merged["buckets"], result["buckets"]):
+                _add_counts(bucket, other)
+            _add_counts(merged["totals"], result["totals"])
+            merged["totals"]["units_in"] += result["totals"]["units_in"]
+            merged["totals"]["units_out"] += result["totals"]["units_out"]
+        return merged
+
+    def get_low_stock(self, threshold=5, projected=False, lead_time_days=None, service_factor=None):
+        """Get the products with low stock from every shard, in id order"""
+        results = self._gather("get_low_stock", threshold, projected, lead_time_days, service_factor)
+        for result in results:
+            if result["status"] != "success":
+                return result
+        merged = results[0]
+        merged["products"] = list(heapq.merge(*(result["products"] for result in results),
+                                              key=lambda product: product["id"]))
+        return merged
+
+    def get_replenishment_plan(self, lead_time_days=None, service_factor=None, cover_days=None, limit=100):
+        """Get the products due for reordering on any shard, soonest projected stock-out first"""
+        results = self._gather("get_replenishment_plan", lead_time_days, service_factor, cover_days, limit)
+        for result in results:
+            if result["status"] != "success":
+                return result
+        merged = results[0]
+        for result in results[1:]:
+            merged["products_planned"] += result["products_planned"]
+            merged["products_due"] += result["products_due"]
+        cover = lambda product: float("inf") if product["days_of_cover"] is None else product["days_of_cover"]
+        merged["products"] = list(itertools.islice(
+            heapq.merge(*(result["products"] for result in results), key=cover), limit
+        ))
+        return merged
+
+    def get_system_status(self):
+        """Get current system status, summed over the shards"""
+        statuses = self._gather("get_system_status")
+        return {name: sum(status[name] for status in statuses) for name in statuses[0]}
+
+    def get_changes(self, since=0, limit=1000, wait=0):
+        """Get the products and orders changed after a cursor, gathered from every shard.
+
+        The cursor is each shard's ledger id joined by dots (0 starts from the
+        beginning); any other cursor, e.g. from an unsharded server, gets reset=True.
+        limit is shared out over the shards. With wait > 0 and nothing new, the
+        shards are checked again every POLL_SECONDS for up to wait seconds.
+        """
+        count = len(self.shards)
+        if since == 0:
+            cursors = [0] * count
+        elif isinstance(since, str) and since.count(".") == count - 1:
+            cursors = [int(cursor) for cursor in since.split(".")]
+        else:
+            cursors = None
+        if cursors is None:
+            ends = [status["total_transactions"] for status in self._gather("get_system_status")]
+            return {"status": "success", "reset": True, "cursor": _join_cursor(ends), "has_more": False,
+                    "products": [], "orders": []}
+
+        share = max(limit // count, 1)
+        deadline = time.monotonic() + wait
+        while True:
+            futures = [shard.submit("get_changes", cursor, share) for shard, cursor in zip(self.shards, cursors)]
+            results = [future.result() for future in futures]
+            moved = any(result["cursor"] != cursor for result, cursor in zip(results, cursors))
+            remaining = deadline - time.monotonic()
+            if moved or remaining <= 0 or any(result["reset"] for result in results):
+                break
+            time.sleep(min(POLL_SECONDS, remaining))
+
+        reset = any(result["reset"] for result in results)
+        return {
+            "status": "success",
+            "reset": reset,
+            "cursor": _join_cursor(result["cursor"] for result in results),
+            "has_more": any(result["has_more"] for result in results),
+            "products": [] if reset else [product for result in results for product in result["products"]],
+            "orders": [] if reset else [order for result in results for order in result["orders"]]
+        }
+
+    def export_inventory(self, fmt="ndjson", fields=None, category=None, low_stock=None):
+        """Stream the catalog as NDJSON or CSV text chunks, merging the shards' rows in id order.
+
+        Rows are fetched PAGE_SIZE at a time from each shard as the chunks are consumed.
+        """
+        from src.export import EXPORT_FORMATS, PRODUCT_FIELDS, iter_chunks, parse_fields, project
+        if fmt not in EXPORT_FORMATS:
+            return {"status": "error", "message": f"Unknown export format: {fmt}"}
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        rows = heapq.merge(*(self._iter_inventory(shard) for shard in self.shards),
+                           key=lambda product: product["id"])
+        if category is not None:
+            folded = category.casefold()
+            rows = (product for product in rows if product["category"].casefold() == folded)
+        if low_stock is not None:
+            rows = (product for product in rows if product["quantity"] < low_stock)
+        return {
+            "status": "success",
+            "content_type": EXPORT_FORMATS[fmt],
+            "chunks": iter_chunks(project(rows, fields), fields, fmt)
+        }
+
+    def export_transactions(self, fmt="ndjson", fields=None, product_id=None, after_id=None, before_id=None):
+        """Stream the ledgers, oldest first, as NDJSON or CSV text chunks.
+
+        With product_id this is the product's shard's ledger, cursors included.
+        Otherwise every shard's entries are merged by timestamp, fetched PAGE_SIZE
+        at a time; entry ids are those of each shard's ledger.
+        """
+        from src.export import EXPORT_FORMATS, TRANSACTION_FIELDS, iter_chunks, parse_fields, project
+        from src.transaction_ledger import parse_timestamp
+        if fmt not in EXPORT_FORMATS:
+            return {"status": "error", "message": f"Unknown export format: {fmt}"}
+        try:
+            fields = parse_fields(fields, TRANSACTION_FIELDS)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        if product_id is not None:
+            entries = self._iter_transactions(self._owner(product_id), product_id, after_id, before_id)
+        elif after_id is not None or before_id is not None:
+            return {"status": "error", "message": "after and before cursors need product_id in sharded mode"}
+        else:
+            entries = heapq.merge(*(self._iter_transactions(shard) for shard in self.shards),
+                                  key=lambda entry: parse_timestamp(entry["timestamp"]))
+        return {
+            "status": "success",
+            "content_type": EXPORT_FORMATS[fmt],
+            "chunks": iter_chunks(project(entries, fields), fields, fmt)
+        }
+
+    def _iter_inventory(self, shard):
+        """Yield a shard's products in id order, a page at a time"""
+        after_id = 0
+        while True:
+            page = shard.call("get_inventory_page", after_id, PAGE_SIZE)
+            yield from page
+            if len(page) < PAGE_SIZE:
+                return
+            after_id = page[-1]["id"]
+
+    def _iter_transactions(self, shard, product_id=None, after_id=None, before_id=None):
+        """Yield a shard's ledger entries oldest first, a page at a time"""
+        after_id = after_id or 0
+        while True:
+            page = shard.call("get_transactions", PAGE_SIZE, after_id, before_id, False, product_id)
+            yield from page
+            if len(page) < PAGE_SIZE:
+                return
+            after_id = page[-1]["id"]
+
+    def define_composite(self, name, components):
+        """Register a named kit on KIT_SHARD, which logs it, and keep a copy here"""
+        with self.cost_lock:
+            result = self.shards[KIT_SHARD].call("define_composite", name, components)
+            if result["status"] == "success":
+                self.composites[name] = build_composite(self.composites, name, components)
+        return result
+
+    def calculate_composite_cost(self, components):
+        """Calculate cost of a composite product from the prices on the shards of its parts"""
+        from src.composite_product import CompositeCostEngine
+        try:
+            composite = build_composite(self.composites, "Custom Composite", components, whole_units=False)
+        except (KeyError, ValueError) as e:
+            return {"status": "error", "message": e.args[0]}
+        with self.cost_lock:
+            product_ids = list(self.cost_engine.flatten(composite))
+        rows = _ProductRows(self.get_products(product_ids))
+        return {"status": "success", "total_cost": CompositeCostEngine(rows).calculate_cost(composite)}
+
+    def calculate_buildable(self, kits=None, components=None):
+        """Calculate how many units of composites can be assembled from the stock on every shard"""
+        from src.composite_product import BuildabilityPlan
+        try:
+            with self.cost_lock:
+                if components is not None:
+                    composite = build_composite(self.composites, "Custom Composite", components)
+                    plan = BuildabilityPlan(self.cost_engine, [composite])
+                elif kits is None:
+                    names = list(self.composites)
+                    if self.kit_plan is None or len(self.kit_plan[0]) != len(names):
+                        self.kit_plan = (names, BuildabilityPlan(self.cost_engine, self.composites.values()))
+                    names, plan = self.kit_plan
+                else:
+                    names = list(kits)
+                    missing = [name for name in names if name not in self.composites]
+                    if missing:
+                        raise KeyError(f"Unknown kit: {missing[0]}")
+                    plan = BuildabilityPlan(self.cost_engine, [self.composites[name] for name in names])
+        except (KeyError, ValueError) as e:
+            return {"status": "error", "message": e.args[0]}
+
+        buildable = plan.evaluate(_ProductRows(self.get_products(plan.product_ids)))
+        if components is not None:
+            return {"status": "success", "buildable": buildable[0]}
+        return {
+            "status": "success",
+            "kits": [{"kit": name, "buildable": count} for name, count in zip(names, buildable)]
+        }
+
+
+class _ProductRows:
+    """Product rows fetched from the shards, looked up like an inventory manager's"""
+
+    def __init__(self, products):
+        self.rows = {product["id"]: (product["id"], product["name"], product["price"], product["quantity"],
+                                     product["category"]) for product in products}
+
+    def get_product_by_id(self, product_id):
+        return self.rows.get(product_id)
+
+
+def _join_cursor(cursors):
+    return ".".join(str(cursor) for cursor in cursors)
+
+
+def _add_counts(target, other):
+    """Add the counts and quantities of one movement bucket (or totals) into another"""
+    for field in ("counts", "quantities"):
+        for name, value in other[field].items():
+            target[field][name] = target[field].get(name, 0) + value
@@ -1,72 +1,407 @@
 """
 Transaction Ledger
-Provides an audit trail of all inventory movements using linked list
+Provides an audit trail of all inventory movements using append-only segments
 """
 
-class TransactionNode:
-    def __init__(self, transaction_data):
-        self.data = transaction_data
-        self.next = None
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 
-class TransactionLedger:
+from src.concurrency import ChangeNotifier, PicklableLock
+
+SEGMENT_SIZE = 4096
+HOT_SEGMENTS = 16  # full segments kept in memory when an archive is attached
+EMPTY_POSTINGS = array('q')
+
+# Pre-assigned type codes; other transaction types get the next free code on first use
+TRANSACTION_TYPES = (
+    "PRODUCT_ADDED", "STOCK_INCREASE", "STOCK_DECREASE", "PRICE_CHANGE",
+    "ORDER_PLACED", "ORDER_FULFILLED", "BACKORDER_CREATED"
+)
+
+def now_micros():
+    """Current time as integer microseconds since the epoch"""
+    return time.time_ns() // 1000
+
+@lru_cache(maxsize=4096)
+def _format_second(seconds):
+    return datetime.fromtimestamp(seconds).isoformat()
+
+def format_timestamp(micros):
+    """Format epoch microseconds as a local ISO 8601 string, like datetime.now().isoformat()"""
+    seconds, microsecond = divmod(micros, 1_000_000)
+    # Entries cluster in time, so the date and time of day come from a small cache
+    if microsecond:
+        return f"{_format_second(seconds)}.{microsecond:06d}"
+    return _format_second(seconds)
+
+def parse_timestamp(text):
+    """Convert a local ISO 8601 string back to epoch microseconds"""
+    moment = datetime.fromisoformat(text)
+    return int(moment.replace(microsecond=0).timestamp()) * 1_000_000 + moment.microsecond
+
+class LedgerSegment:
+    """Up to segment_size consecutive transactions, stored column-wise.
+    
+    Details are kept as given: a string, or a (template, *args) tuple that is only
+    formatted when the entry is read. Order id 0 stands for no order.
+    """
+    
+    __slots__ = ("timestamps", "type_codes", "product_ids", "quantities", "details", "order_ids", "bounds")
+    COLUMNS = ("timestamps", "type_codes", "product_ids", "quantities", "details", "order_ids")
+    
     def __init__(self):
-        self.head = None
-        self.tail = None
+        self.timestamps = array('q')
+        self.type_codes = array('B')
+        self.product_ids = array('q')
+        self.quantities = []  # usually small ints, which Python shares
+        self.details = []
+        self.order_ids = array('q')
+        self.bounds = None  # (length, earliest, latest) as of the last time_bounds()
+    
+    def __len__(self):
+        # order_ids is appended last, so a row counts only once every column has it
+        return len(self.order_ids)
+    
+    def load(self):
+        """The segment's columns; in-memory segments are their own"""
+        return self
+    
+    def time_bounds(self):
+        """(earliest, latest) timestamp in the segment"""
+        length = len(self.timestamps)
+        if self.bounds is None or self.bounds[0] != length:
+            # Rows are only ever appended, so bounds stay valid until the length changes
+            self.bounds = (length, min(self.timestamps), max(self.timestamps))
+        return self.bounds[1], self.bounds[2]
+    
+    def might_contain(self, product_id):
+        return True
+    
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.COLUMNS}
+    
+    def __setstate__(self, state):
+        self.bounds = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+class TransactionLedger:
+    """Append-only transaction history.
+    
+    Entries are stored as compact columns and returned as dicts with the keys id,
+    timestamp, type, product_id, quantity, details and order_id, built when read.
+    With a LedgerArchive attached, full segments older than the newest hot_segments
+    are written to the archive and replaced by ArchivedSegment stand-ins, so reads
+    by id keep working and load archived columns only when needed.
+    """
+    
+    def __init__(self, segment_size=SEGMENT_SIZE, archive=None, hot_segments=HOT_SEGMENTS):
+        # Fixed-size chunks of transactions; ids run 1..count, so an id maps
+        # straight to (segment, offset) without walking the ledger
+        self.segments = []
+        self.segment_size = segment_size
         self.count = 0
+        # Dictionary-encoded transaction types: code -> name and name -> code
+        self.type_names = list(TRANSACTION_TYPES)
+        self.type_lookup = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+        # Posting lists: product_id -> ascending array of transaction ids
+        self.product_index = {}
+        # Optional timestamp source (epoch microseconds); the write-ahead log sets it while replaying
+        self.clock = None
+        # Appends are serialized so ids stay dense; reads take no lock and only
+        # look at ids <= count, which are always fully written
+        self.lock = PicklableLock()
+        # Signalled after every append with the (first_id, last_id) appended, for change-feed
+        # readers waiting on new entries and for rollups kept up to date from the ledger
+        self.appended = ChangeNotifier()
+        # Cold tier: the first archived_through // segment_size segments are archived,
+        # and product_index only lists ids after archived_through
+        self.archive = archive
+        self.hot_segments = hot_segments
+        self.archived_through = 0
+        self.archive_lock = PicklableLock()
     
-    def add_transaction(self, transaction_type, product_id, quantity, details=""):
-        """Add a new transaction to the ledger"""
-        from datetime import datetime
-        transaction_data = {
-            "id": self.count + 1,
-            "timestamp": datetime.now().isoformat(),
-            "type": transaction_type,
-            "product_id": product_id,
-            "quantity": quantity,
-            "details": details
-        }
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "archive" not in state:
+            # Snapshot from before the archive existed
+            self.archive = None
+            self.hot_segments = HOT_SEGMENTS
+            self.archived_through = 0
+            self.archive_lock = PicklableLock()
+        if self.segments and isinstance(self.segments[0], list):
+            # Snapshot from before compact records: segments held one dict per entry
+            entries = [entry for segment in self.segments for entry in segment]
+            self.__init__(self.segment_size, self.archive, self.hot_segments)
+            for entry in entries:
+                timestamp = entry["timestamp"]
+                if isinstance(timestamp, str):
+                    timestamp = parse_timestamp(timestamp)
+                self._append(timestamp, entry["type"], entry["product_id"], entry["quantity"],
+                             entry["details"], entry.get("order_id"))
+    
+    @property
+    def version(self):
+        """Entries are only ever appended, so the count doubles as the ledger's version"""
+        return self.count
+    
+    def _type_code(self, transaction_type):
+        code = self.type_lookup.get(transaction_type)
+        if code is None:
+            code = len(self.type_names)
+            self.type_names.append(transaction_type)
+            self.type_lookup[transaction_type] = code
+        return code
+    
+    def _append(self, timestamp, transaction_type, product_id, quantity, details, order_id):
+        """Append one transaction to the tail segment and index it; the caller holds the lock"""
+        if not self.segments or len(self.segments[-1]) == self.segment_size:
+            self.segments.append(LedgerSegment())
+        segment = self.segments[-1]
+        segment.timestamps.append(timestamp)
+        segment.type_codes.append(self._type_code(transaction_type))
+        segment.product_ids.append(product_id)
+        segment.quantities.append(quantity)
+        segment.details.append(details)
+        segment.order_ids.append(order_id or 0)
+        self.count += 1
+        postings = self.product_index.get(product_id)
+        if postings is None:
+            postings = self.product_index[product_id] = array('q')
+        postings.append(self.count)
+    
+    def add_transaction(self, transaction_type, product_id, quantity, details="", order_id=None):
+        """Add a new transaction to the ledger.
         
-        new_node = TransactionNode(transaction_data)
+        details is a string, or a (template, *args) tuple formatted when the entry is
+        read, with the args as positional fields and the entry's own fields by name,
+        e.g. ("Order #{order_id} by {0}", customer_name).
+        """
+        timestamp = self.clock() if self.clock else now_micros()
+        with self.lock:
+            self._append(timestamp, transaction_type, product_id, quantity, details, order_id)
+            transaction_id = self.count
+        # Outside the lock, so listeners never hold up other appends; batches appended
+        # concurrently may reach them out of id order
+        self.appended.notify(transaction_id, transaction_id)
+        if self.archive is not None:
+            self.archive_cold_segments()
+        return transaction_id
+    
+    def add_transactions(self, transactions):
+        """Append many (transaction_type, product_id, quantity, details[, order_id]) entries; returns their ids"""
+        timestamp = self.clock() if self.clock else now_micros()
+        transactions = list(transactions)
+        with self.lock:
+            first_id = self.count + 1
+            for transaction_type, product_id, quantity, details, *order_id in transactions:
+                self._append(timestamp, transaction_type, product_id, quantity, details,
+                             order_id[0] if order_id else None)
+            last_id = self.count
+        if transactions:
+            self.appended.notify(first_id, last_id)
+        if self.archive is not None:
+            self.archive_cold_segments()
+        return list(range(first_id, last_id + 1))
+    
+    def archive_cold_segments(self):
+        """Move full segments older than the newest hot_segments to the archive; returns how many moved.
         
-        if self.head is None:
-            self.head = new_node
-            self.tail = new_node
-        else:
-            self.tail.next = new_node
-            self.tail = new_node
+        Files are written outside the append lock. Only one thread archives at a time;
+        others return at once rather than wait.
+        """
+        if self.archive is None or not self.archive_lock.acquire(blocking=False):
+            return 0
+        try:
+            moved = 0
+            while True:
+                index = self.archived_through // self.segment_size
+                # The tail segment is still being filled
+                if len(self.segments) - 1 - index <= self.hot_segments:
+                    return moved
+                segment = self.segments[index]
+                archived = self.archive.write(segment, index * self.segment_size + 1, self.type_names)
+                product_ids = set(segment.product_ids)
+                with self.lock:
+                    self.segments[index] = archived
+                    # Set before the postings shrink: readers take the postings first, then
+                    # this bound, so an id is always found in one place or the other
+                    self.archived_through = archived.last_id
+                    for product_id in product_ids:
+                        # Replaced, not trimmed in place, so readers holding the old array are unaffected
+                        postings = self.product_index[product_id]
+                        remaining = postings[bisect_right(postings, archived.last_id):]
+                        if remaining:
+                            self.product_index[product_id] = remaining
+                        else:
+                            del self.product_index[product_id]
+                moved += 1
+        finally:
+            self.archive_lock.release()
+    
+    def wait_for_append(self, after_id, timeout):
+        """Block until there is an entry with id > after_id or timeout seconds pass; returns whether there is"""
+        return self.appended.wait_for(lambda: self.count > after_id, timeout)
+    
+    def _entry(self, segment, offset, transaction_id):
+        """Build the dict for one stored transaction"""
+        order_id = segment.order_ids[offset] or None
+        entry = {
+            "id": transaction_id,
+            "timestamp": format_timestamp(segment.timestamps[offset]),
+            "type": self.type_names[segment.type_codes[offset]],
+            "product_id": segment.product_ids[offset],
+            "quantity": segment.quantities[offset],
+            "details": segment.details[offset],
+            "order_id": order_id
+        }
+        if type(entry["details"]) is tuple:
+            template, *args = entry["details"]
+            entry["details"] = template.format(*args, **entry)
+        return entry
+    
+    def get_transaction(self, transaction_id):
+        """Get a transaction by id"""
+        if not 1 <= transaction_id <= self.count:
+            return None
+        segment, offset = divmod(transaction_id - 1, self.segment_size)
+        return self._entry(self.segments[segment].load(), offset, transaction_id)
+    
+    def iter_range(self, first_id, last_id):
+        """Yield transactions with first_id <= id <= last_id, oldest first"""
+        first_id = max(first_id, 1)
+        last_id = min(last_id, self.count)
+        for transaction_id in range(first_id, last_id + 1):
+            segment, offset = divmod(transaction_id - 1, self.segment_size)
+            yield self._entry(self.segments[segment].load(), offset, transaction_id)
+    
+    def iter_range_reverse(self, last_id, first_id=1):
+        """Yield transactions with first_id <= id <= last_id, newest first"""
+        first_id = max(first_id, 1)
+        last_id = min(last_id, self.count)
+        for transaction_id in range(last_id, first_id - 1, -1):
+            segment, offset = divmod(transaction_id - 1, self.segment_size)
+            yield self._entry(self.segments[segment].load(), offset, transaction_id)
+    
+    def iter_touched(self, first_id, last_id):
+        """Yield the (product_id, order_id or None) of transactions first_id..last_id, without building entries"""
+        first_id = max(first_id, 1)
+        last_id = min(last_id, self.count)
+        for transaction_id in range(first_id, last_id + 1):
+            segment, offset = divmod(transaction_id - 1, self.segment_size)
+            segment = self.segments[segment].load()
+            yield segment.product_ids[offset], segment.order_ids[offset] or None
+    
+    def iter_segment_slices(self, first_id, last_id):
+        """Yield (segment columns, start, stop) offset ranges that together hold transactions first_id..last_id.
         
-        self.count += 1
-        return transaction_data["id"]
+        For scans over many entries that read the columns directly instead of building dicts.
+        """
+        first_id = max(first_id, 1)
+        last_id = min(last_id, self.count)
+        while first_id <= last_id:
+            index, start = divmod(first_id - 1, self.segment_size)
+            stop = min(self.segment_size, start + last_id - first_id + 1)
+            yield self.segments[index].load(), start, stop
+            first_id += stop - start
     
     def get_transaction_history(self, limit=None):
-        """Get transaction history as a list"""
-        history = []
-        current = self.head
-        count = 0
-        
-        while current is not None and (limit is None or count < limit):
-            history.append(current.data)
-            current = current.next
-            count += 1
+        """Get transaction history as a list, oldest first"""
+        last_id = self.count if limit is None else min(limit, self.count)
+        return list(self.iter_range(1, last_id))
+    
+    def get_latest_transactions(self, limit=10):
+        """Get the most recent transactions, newest first"""
+        count = self.count
+        return list(self.iter_range_reverse(count, count - limit + 1))
+    
+    def get_transactions_after(self, after_id, limit=10):
+        """Page forward: transactions with id > after_id, oldest first"""
+        return list(self.iter_range(after_id + 1, after_id + limit))
+    
+    def get_transactions_before(self, before_id, limit=10):
+        """Page backward: transactions with id < before_id, newest first"""
+        return list(self.iter_range_reverse(before_id - 1, before_id - limit))
+    
+    def get_transactions_by_product(self, product_id, limit=None, after_id=None, before_id=None):
+        """Get transactions for a specific product.
         
-        return history
+        Oldest first by default or when paging forward with after_id; newest first
+        when paging backward with before_id.
+        """
+        if before_id is not None:
+            ids = self.iter_product_ids(product_id, last_id=before_id - 1, reverse=True)
+        else:
+            ids = self.iter_product_ids(product_id, first_id=1 if after_id is None else after_id + 1)
+        return [self.get_transaction(transaction_id) for transaction_id in islice(ids, limit)]
     
-    def get_transactions_by_product(self, product_id, limit=None):
-        """Get transactions for a specific product"""
-        transactions = []
-        current = self.head
-        count = 0
+    def iter_product_ids(self, product_id, first_id=1, last_id=None, reverse=False):
+        """Yield the ids of a product's transactions in first_id..last_id, ascending or descending.
         
-        while current is not None and (limit is None or count < limit):
-            if current.data["product_id"] == product_id:
-                transactions.append(current.data)
-                count += 1
-            current = current.next
+        In-memory ids come from the posting list. Archived segments are only read if
+        their id range overlaps and their bloom filter may contain the product.
+        """
+        last_id = self.count if last_id is None else min(last_id, self.count)
+        postings = self.product_index.get(product_id, EMPTY_POSTINGS)
+        archived_through = self.archived_through
+        hot = postings[bisect_left(postings, max(first_id, archived_through + 1)):bisect_right(postings, last_id)]
+        archived = self._iter_archived_product_ids(product_id, first_id, min(last_id, archived_through), reverse)
+        if reverse:
+            yield from reversed(hot)
+            yield from archived
+        else:
+            yield from archived
+            yield from hot
+    
+    def _iter_archived_product_ids(self, product_id, first_id, last_id, reverse):
+        first_id = max(first_id, 1)
+        if last_id < first_id:
+            return
+        indexes = range((first_id - 1) // self.segment_size, (last_id - 1) // self.segment_size + 1)
+        for index in reversed(indexes) if reverse else indexes:
+            segment = self.segments[index]
+            if not segment.might_contain(product_id):
+                continue
+            base = index * self.segment_size + 1
+            ids = [base + offset for offset, entry_product_id in enumerate(segment.load().product_ids)
+                   if entry_product_id == product_id and first_id <= base + offset <= last_id]
+            yield from reversed(ids) if reverse else ids
+    
+    def iter_time_range(self, start=None, end=None, product_id=None):
+        """Yield transactions with start <= timestamp < end, by id, optionally for one product.
         
-        return transactions
+        start and end are epoch microseconds (None for unbounded). Segments whose
+        timestamp range, or bloom filter for product_id, rules them out are not read,
+        and a product's entries in the others are found through iter_product_ids.
+        """
+        count = self.count
+        for index in range((count + self.segment_size - 1) // self.segment_size):
+            segment = self.segments[index]
+            earliest, latest = segment.time_bounds()
+            if (start is not None and latest < start) or (end is not None and earliest >= end):
+                continue
+            base = index * self.segment_size + 1
+            if product_id is not None:
+                if not segment.might_contain(product_id):
+                    continue
+                ids = list(self.iter_product_ids(product_id, base, min(base + self.segment_size - 1, count)))
+                segment = segment.load()
+                for transaction_id in ids:
+                    timestamp = segment.timestamps[transaction_id - base]
+                    if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                        yield self._entry(segment, transaction_id - base, transaction_id)
+                continue
+            segment = segment.load()
+            for offset, timestamp in enumerate(segment.timestamps):
+                if base + offset > count:
+                    break
+                if (start is None or timestamp >= start) and (end is None or timestamp < end):
+                    yield self._entry(segment, offset, base + offset)
     
     def get_last_transaction(self):
         """Get the most recent transaction"""
-        if self.tail is None:
-            return None
-        return self.tail.data
\ No newline at end of file
+        return self.get_transaction(self.count)
@@ -0,0 +1,172 @@
+"""
+API Tests
+Recovers InventoryAPIs from their write-ahead logs and snapshots and checks they match
+the API that wrote them
+"""
+
+import json
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+from src.persistence import PersistenceEngine
+
+
+def open_api(directory, snapshot_every=100_000):
+    persistence = PersistenceEngine(str(directory), fsync_policy="always", snapshot_every=snapshot_every)
+    return InventoryAPI(persistence=persistence), persistence
+
+
+def apply_random_calls(api, seed, calls=400):
+    rng = random.Random(seed)
+    for _ in range(calls):
+        product_ids = [product["id"] for product in api.get_inventory()]
+        choice = rng.random()
+        if choice < 0.1:
+            api.add_product(f"Product {rng.randint(1, 999)}", round(rng.uniform(1, 99), 2), rng.randint(0, 9), "Parts")
+        elif choice < 0.15:
+            api.add_products([(f"Bulk {i}", 2.5, rng.randint(0, 5), "Bulk") for i in range(rng.randint(1, 4))])
+        elif choice < 0.35:
+            api.update_stock(rng.choice(product_ids), rng.randint(-5, 12))
+        elif choice < 0.45:
+            api.update_stock_bulk([(rng.choice(product_ids), rng.randint(-3, 6)) for _ in range(3)])
+        elif choice < 0.5:
+            api.update_price(rng.choice(product_ids), round(rng.uniform(1, 99), 2))
+        elif choice < 0.75:
+            api.place_order(rng.choice(product_ids), rng.randint(1, 8), f"Customer {rng.randint(1, 9)}",
+                            rng.randint(1, 3))
+        elif choice < 0.85:
+            api.place_orders([(rng.choice(product_ids), rng.randint(1, 4), "Bulk customer", 1) for _ in range(3)])
+        else:
+            api.process_orders(rng.randint(1, 5))
+
+
+def state(api):
+    return {
+        "inventory": api.get_inventory(),
+        "transactions": api.get_transactions(limit=10_000),
+        "status": api.get_system_status(),
+    }
+
+
+@pytest.mark.parametrize("snapshot_every", [100_000, 37])
+def test_recovery_restores_every_logged_call(tmp_path, snapshot_every):
+    api, persistence = open_api(tmp_path, snapshot_every)
+    apply_random_calls(api, seed=snapshot_every)
+    expected = state(api)
+    persistence.close()
+
+    recovered, persistence = open_api(tmp_path, snapshot_every)
+    try:
+        actual = state(recovered)
+    finally:
+        persistence.close()
+    # Replayed entries keep the time of the original call
+    assert actual == expected
+
+
+def test_failed_calls_are_not_logged(tmp_path):
+    api, persistence = open_api(tmp_path)
+    with pytest.raises(TypeError):
+        api.update_stock(1, "5")
+    api.update_stock(1, 5)
+    expected = state(api)
+    persistence.close()
+
+    recovered, persistence = open_api(tmp_path)
+    try:
+        assert state(recovered) == expected
+    finally:
+        persistence.close()
+    assert not (tmp_path / "quarantine.log").exists()
+
+
+def test_records_that_fail_to_replay_are_quarantined(tmp_path):
+    api, persistence = open_api(tmp_path)
+    api.update_stock(1, 5)
+    # A record that cannot be applied, as an older version could have logged it
+    persistence.log("update_stock", 2, "5")
+    api.update_stock(3, 2)
+    expected = state(api)
+    persistence.close()
+
+    recovered, persistence = open_api(tmp_path)
+    try:
+        assert state(recovered) == expected
+        recovered.update_stock(4, 1)
+    finally:
+        persistence.close()
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.log").read_text().splitlines()]
+    assert [(record["op"], record["args"]) for record in quarantined] == [("update_stock", [2, "5"])]
+    assert "TypeError" in quarantined[0]["error"]
+
+    # Later records still replay after the quarantined one
+    recovered, persistence = open_api(tmp_path)
+    try:
+        assert recovered.get_products([4])[0]["quantity"] == expected["inventory"][3]["quantity"] + 1
+    finally:
+        persistence.close()
+
+
+def test_torn_final_record_is_ignored(tmp_path):
+    api, persistence = open_api(tmp_path)
+    api.update_stock(1, 5)
+    expected = state(api)
+    persistence.close()
+    with open(sorted(tmp_path.glob("wal-*.log"))[-1], "ab") as f:
+        f.write(b'{"seq": 99, "op": "update_st')
+
+    recovered, persistence = open_api(tmp_path)
+    try:
+        assert state(recovered) == expected
+    finally:
+        persistence.close()
+
+
+def comparable(api):
+    """State of an API with ledger timestamps left out, which differ between calls"""
+    current = state(api)
+    for entry in current["transactions"]:
+        del entry["timestamp"]
+    return current
+
+
+def test_bulk_calls_match_single_calls():
+    single, bulk = InventoryAPI(), InventoryAPI()
+    products = [(f"Part {i}", 1.5 + i, i % 4, "Parts") for i in range(20)]
+    adjustments = [(product_id % 25 + 1, change) for product_id, change in zip(range(40), [3, -2, 7, -9] * 10)]
+    orders = [(product_id % 23 + 1, 1 + product_id % 3, f"Customer {product_id}", product_id % 3)
+              for product_id in range(30)]
+
+    for product in products:
+        single.add_product(*product)
+    for adjustment in adjustments:
+        single.update_stock(*adjustment)
+    for order in orders:
+        single.place_order(*order)
+    results = [bulk.add_products(products), bulk.update_stock_bulk(adjustments), bulk.place_orders(orders)]
+
+    assert all(result["status"] == "success" for result in results)
+    assert [item["status"] for item in results[1]["results"]] == ["success"] * 40
+    assert comparable(bulk) == comparable(single)
+    # An unknown id fails on its own without failing the batch
+    result = bulk.update_stock_bulk([(1, 2), (999, 1)])
+    assert [item["status"] for item in result["results"]] == ["success", "error"]
+
+
+@pytest.mark.parametrize("call, batch, error", [
+    ("add_products", [("Lamp", 2.0, 1, "Home"), ("Kettle", -1, 1, "Kitchen")], (1, "price must be at least 0")),
+    ("add_products", [("Lamp", 2.0, 1, "Home"), ("Kettle", 2.0, 1)], (1, "Expected 4 values")),
+    ("update_stock_bulk", [(1, 2), (2, 1.5)], (1, "quantity_change must be an integer")),
+    ("update_stock_bulk", {"1": 2}, (None, "Batch must be a list of items")),
+    ("place_orders", [(1, 1, "Ada", 1), (2, 0, "Bo", 1)], (1, "quantity must be at least 1")),
+    ("place_orders", [(True, 1, "Ada", 1)], (0, "product_id must be an integer")),
+])
+def test_invalid_batches_change_nothing(call, batch, error):
+    api = InventoryAPI()
+    before = comparable(api)
+    result = getattr(api, call)(batch)
+    assert result["status"] == "error"
+    assert (result["errors"][0]["index"], result["errors"][0]["message"]) == error
+    assert comparable(api) == before
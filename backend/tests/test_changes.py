@@ -0,0 +1,76 @@
+"""
+Change Feed Tests
+Follows the change feed with a client that applies each page over its own copy, and
+checks the copy against the API's current products and orders
+"""
+
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+
+
+def follow(api, copy, cursor, limit):
+    """Apply change pages from cursor until has_more is off; returns the new cursor"""
+    while True:
+        changes = api.get_changes(cursor, limit=limit)
+        assert changes["status"] == "success" and not changes["reset"]
+        assert changes["cursor"] - cursor <= limit
+        # Each product and order is listed once per page
+        assert len({product["id"] for product in changes["products"]}) == len(changes["products"])
+        assert len({order["order_id"] for order in changes["orders"]}) == len(changes["orders"])
+        copy["products"].update((product["id"], product) for product in changes["products"])
+        copy["orders"].update((order["order_id"], order) for order in changes["orders"])
+        cursor = changes["cursor"]
+        if not changes["has_more"]:
+            return cursor
+
+
+def random_changes(api, rng, count):
+    for _ in range(count):
+        r = rng.random()
+        product_id = rng.randint(1, 12)
+        if r < 0.4:
+            api.place_order(product_id, rng.randint(1, 6), "Ada", rng.randint(1, 3))
+        elif r < 0.6:
+            api.process_orders(rng.randint(1, 4))
+        elif r < 0.8:
+            api.update_stock(product_id, rng.randint(-3, 8))
+        elif r < 0.9:
+            api.update_price(product_id, round(rng.uniform(1, 20), 2))
+        else:
+            api.add_product(f"New {product_id}", 3.5, rng.randint(0, 4), "New")
+
+
+@pytest.mark.parametrize("limit", [1, 7, 1000])
+def test_following_the_feed_keeps_a_copy_current(limit):
+    api = InventoryAPI()
+    rng = random.Random(limit)
+    start = api.get_changes(0)
+    assert start["cursor"] == 0 and not start["has_more"] and not start["products"]
+    copy = {"products": {product["id"]: product for product in api.get_inventory()}, "orders": {}}
+    cursor = 0
+    for _ in range(10):
+        random_changes(api, rng, 15)
+        cursor = follow(api, copy, cursor, limit)
+        assert cursor == api.transaction_ledger.count
+        assert list(copy["products"].values()) == api.get_inventory()
+        assert copy["orders"] == api.orders
+
+
+def test_stale_and_future_cursors_reset(monkeypatch):
+    monkeypatch.setattr("src.api.FULFILLED_ORDERS_KEPT", 3)
+    api = InventoryAPI()
+    for _ in range(6):
+        api.place_order(1, 1, "Ada")
+    api.process_orders(6)
+    count = api.transaction_ledger.count
+    # The three oldest fulfilled orders were dropped, so cursors before their entries start over
+    assert len(api.orders) == 3 and api.orders_horizon > 0
+    for cursor in (0, api.orders_horizon - 1, count + 1, "1.2"):
+        assert api.get_changes(cursor) == {"status": "success", "reset": True, "cursor": count, "has_more": False,
+                                           "products": [], "orders": []}
+    changes = api.get_changes(api.orders_horizon)
+    assert not changes["reset"] and {order["order_id"] for order in changes["orders"]} <= set(api.orders)
+    assert api.get_changes(count, wait=0.01)["products"] == []
@@ -0,0 +1,109 @@
+"""
+Composite Product Tests
+Checks memoized kit costs and buildability against plain recursive calculations,
+including after price and stock changes
+"""
+
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+
+
+def product_rows(api):
+    return {product["id"]: product for product in api.get_inventory()}
+
+
+def expand(kits, components, factor=1):
+    """Total quantity of each product in components, following kit references"""
+    totals = {}
+    for component in components:
+        if isinstance(component, dict):
+            for product_id, quantity in expand(kits, kits[component["kit"]], factor).items():
+                totals[product_id] = totals.get(product_id, 0) + quantity
+        else:
+            product_id, quantity = component
+            totals[product_id] = totals.get(product_id, 0) + quantity * factor
+    return totals
+
+
+@pytest.fixture
+def catalog():
+    """An API with eight registered kits, and the components each kit was defined with"""
+    api = InventoryAPI()
+    api.add_products([(f"Part {i}", round(1 + i * 0.75, 2), 5 * i, "Parts") for i in range(1, 16)])
+    kits = {}
+    rng = random.Random(7)
+    for index in range(8):
+        # Later kits reuse earlier ones, so sub-assemblies are shared
+        components = [[rng.randint(1, 25), rng.randint(1, 4)] for _ in range(rng.randint(1, 4))]
+        components += [{"kit": f"kit-{rng.randrange(index)}"} for _ in range(rng.randint(0, min(index, 2)))]
+        assert api.define_composite(f"kit-{index}", components)["status"] == "success"
+        kits[f"kit-{index}"] = components
+    return api, kits
+
+
+def expected_cost(api, kits, components):
+    rows = product_rows(api)
+    return sum(rows[product_id]["price"] * quantity
+               for product_id, quantity in expand(kits, components).items() if product_id in rows)
+
+
+def expected_buildable(api, kits, components):
+    rows = product_rows(api)
+    requirements = expand(kits, components)
+    if not requirements:
+        return 0
+    return min((rows[product_id]["quantity"] if product_id in rows else 0) // quantity
+               for product_id, quantity in requirements.items())
+
+
+def test_costs_follow_price_changes(catalog):
+    api, kits = catalog
+    rng = random.Random(3)
+    for _ in range(30):
+        components = [{"kit": f"kit-{rng.randrange(8)}"}, [rng.randint(1, 15), 2]]
+        total_cost = api.calculate_composite_cost(components)["total_cost"]
+        assert total_cost == pytest.approx(expected_cost(api, kits, components))
+        api.update_price(rng.randint(1, 15), round(rng.uniform(1, 50), 2))
+
+
+def test_buildable_follows_stock_changes(catalog):
+    api, kits = catalog
+    rng = random.Random(4)
+    for _ in range(30):
+        result = api.calculate_buildable()
+        assert [kit["buildable"] for kit in result["kits"]] == [
+            expected_buildable(api, kits, kits[kit["kit"]]) for kit in result["kits"]]
+        components = [{"kit": "kit-5"}, [rng.randint(1, 15), 1]]
+        assert api.calculate_buildable(components=components)["buildable"] == expected_buildable(api, kits, components)
+        api.update_stock(rng.randint(1, 15), rng.randint(-20, 20))
+    assert api.calculate_buildable(kits=["kit-2", "kit-0"])["kits"][1]["kit"] == "kit-0"
+
+
+def test_unknown_and_duplicate_kits_are_rejected(catalog):
+    api, kits = catalog
+    assert api.calculate_composite_cost([{"kit": "missing"}])["status"] == "error"
+    assert api.calculate_buildable(kits=["kit-1", "missing"])["status"] == "error"
+    assert api.define_composite("kit-1", [[1, 1]])["status"] == "error"
+    assert api.define_composite("bad", [[1, 1], {"kit": "missing"}])["status"] == "error"
+
+
+@pytest.mark.parametrize("quantity", [0.5, 0, -1, True, "2"])
+def test_quantities_must_be_positive_integers(catalog, quantity):
+    api, kits = catalog
+    assert api.define_composite("bad", [[1, quantity]])["status"] == "error"
+    assert api.calculate_buildable(components=[[1, quantity]])["status"] == "error"
+    # A rejected kit is not registered, so buildability of the others is unaffected
+    assert len(api.calculate_buildable()["kits"]) == len(kits)
+
+
+def test_fractional_quantities_can_be_costed(catalog):
+    api, kits = catalog
+    components = [[1, 0.5], [2, 1.5], {"kit": "kit-3"}]
+    assert api.calculate_composite_cost(components)["total_cost"] == pytest.approx(expected_cost(api, kits, components))
+    assert api.calculate_buildable(components=components)["status"] == "error"
+    assert api.define_composite("half", [[1, 0.5]])["status"] == "error"
+    for quantity in (0, -1, True):
+        assert api.calculate_composite_cost([[1, quantity]])["status"] == "error"
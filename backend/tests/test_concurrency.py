@@ -0,0 +1,111 @@
+"""
+Concurrency Tests
+Shares one InventoryAPI between threads placing, processing and restocking orders and
+checks that no update is lost, and that snapshot reads never see half a write
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from src.api import InventoryAPI
+from src.concurrency import SnapshotGate
+
+PRODUCTS = 8  # few products, so threads contend on the same stock
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads far more often than the default 5ms, to shake out races"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def run_threads(target, count):
+    errors = []
+
+    def run(seed):
+        try:
+            target(seed)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar"])
+def test_threads_lose_no_updates(storage, fast_switching):
+    api = InventoryAPI(storage=storage)
+    product_ids = [api.add_product(f"Part {i}", 2.5, 10, "Parts")["product_id"] for i in range(PRODUCTS)]
+    initial = {product["id"]: product["quantity"] for product in api.get_inventory()}
+    placed = []
+    restocks = Counter()
+    lock = threading.Lock()
+
+    def work(seed):
+        rng = random.Random(seed)
+        for i in range(400):
+            r = rng.random()
+            if r < 0.4:
+                order_id = api.place_order(rng.choice(product_ids), rng.randint(1, 4), f"Customer {seed}-{i}")["order_id"]
+                with lock:
+                    placed.append(order_id)
+            elif r < 0.65:
+                api.process_orders(rng.randint(1, 6), batched=rng.random() < 0.5)
+            elif r < 0.85:
+                product_id, quantity = rng.choice(product_ids), rng.randint(1, 6)
+                api.update_stock(product_id, quantity)
+                with lock:
+                    restocks[product_id] += quantity
+            else:
+                assert all(product["quantity"] >= 0 for product in api.get_inventory())
+
+    run_threads(work, 6)
+
+    ledger = api.transaction_ledger.get_transaction_history()
+    fulfilled = Counter()
+    for entry in ledger:
+        if entry["type"] == "ORDER_FULFILLED":
+            fulfilled[entry["product_id"]] += entry["quantity"]
+    assert len(set(placed)) == len(placed)
+    assert [entry["id"] for entry in ledger] == list(range(1, api.transaction_ledger.count + 1))
+    for product in api.get_inventory():
+        assert product["quantity"] == initial[product["id"]] + restocks[product["id"]] - fulfilled[product["id"]]
+    status = api.get_system_status()
+    assert status["pending_orders"] + status["backorders"] + status["items_ready_for_delivery"] == len(placed)
+
+
+def test_snapshot_reads_see_whole_writes():
+    gate = SnapshotGate()
+    accounts = [100, 0]
+    done = threading.Event()
+
+    def write(seed):
+        rng = random.Random(seed)
+        for _ in range(500):
+            amount = rng.randint(1, 5)
+            # Each write moves an amount from one account to the other in two steps
+            with gate.writing():
+                accounts[0] -= amount
+                time.sleep(0)
+                accounts[1] += amount
+        done.set()
+
+    def read(seed):
+        while not done.is_set():
+            assert gate.read(lambda: accounts[0] + accounts[1]) == 100
+            time.sleep(0)
+
+    run_threads(lambda seed: write(seed) if seed == 0 else read(seed), 3)
+    assert sum(accounts) == 100
@@ -0,0 +1,72 @@
+"""
+Export Tests
+Reads streamed NDJSON and CSV exports back and checks them against the API's own
+reads, with chunks small enough that rows span many of them
+"""
+
+import csv
+import io
+import json
+
+import pytest
+
+from src.api import InventoryAPI
+
+NAMES = ["Plain", "Comma, inside", 'Quote " inside', "Line\nbreak", "Ünïcode ✓", ""]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr("src.export.CHUNK_ROWS", 3)
+    api = InventoryAPI()
+    api.add_products([(name, 1.25 * i, i % 4, "Odd, category" if i % 2 else "Home") for i, name in enumerate(NAMES)])
+    for product_id in range(1, 8):
+        api.update_stock(product_id, product_id - 4)
+        api.place_order(product_id, 2, f"Customer {product_id}")
+    api.process_orders(7)
+    return api
+
+
+def read_ndjson(chunks):
+    chunks = list(chunks)
+    # Every chunk ends on a row boundary, so chunks can be parsed as they arrive
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    return [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+
+def read_csv(chunks):
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    return [dict(zip(rows[0], row)) for row in rows[1:]]
+
+
+def as_text(records):
+    """Records as CSV gives them back: every value a string, None as an empty field"""
+    return [{key: "" if value is None else str(value) for key, value in record.items()} for record in records]
+
+
+def test_inventory_exports_read_back(api):
+    inventory = api.get_inventory()
+    result = api.export_inventory("ndjson")
+    assert result["content_type"] == "application/x-ndjson"
+    assert read_ndjson(result["chunks"]) == inventory
+    assert read_csv(api.export_inventory("csv")["chunks"]) == as_text(inventory)
+
+    projected = read_ndjson(api.export_inventory("ndjson", fields="name,quantity")["chunks"])
+    assert projected == [{"name": product["name"], "quantity": product["quantity"]} for product in inventory]
+    filtered = read_csv(api.export_inventory("csv", fields=["id"], category="odd, CATEGORY", low_stock=3)["chunks"])
+    assert filtered == as_text([{"id": product["id"]} for product in inventory
+                                if product["category"] == "Odd, category" and product["quantity"] < 3])
+
+
+def test_transaction_exports_read_back(api):
+    history = api.get_transactions(limit=10_000)
+    assert read_ndjson(api.export_transactions("ndjson")["chunks"]) == history
+    assert read_csv(api.export_transactions("csv")["chunks"]) == as_text(history)
+    ranged = read_ndjson(api.export_transactions("ndjson", product_id=3, after_id=2, before_id=20)["chunks"])
+    assert ranged == [entry for entry in history if entry["product_id"] == 3 and 2 < entry["id"] < 20]
+
+
+def test_invalid_exports_are_rejected(api):
+    assert api.export_inventory("xml")["status"] == "error"
+    assert "Unknown field: colour" in api.export_inventory("csv", fields="name,colour")["message"]
+    assert api.export_transactions("ndjson", fields="price")["status"] == "error"
@@ -0,0 +1,169 @@
+"""
+Inventory Manager Tests
+Runs the same random operation sequences against every storage mode and checks that
+they report identical results
+"""
+
+import random
+import sys
+import threading
+
+import pytest
+
+from src.api import create_inventory_manager
+
+CATEGORIES = ["Electronics", "electronics", "Accessories", "Kitchen", "Garden", "Straße", "STRASSE"]
+WORDS = ["Laptop", "Mouse", "Keyboard", "Monitor", "Cable", "Lamp", "Kettle", "Hose", "Über", "Ångström"]
+
+
+def rows(products):
+    """Product rows as tuples, whichever sequence type a manager returns"""
+    return [tuple(product) for product in products]
+
+
+def apply_random_operations(manager, seed, operations=600):
+    rng = random.Random(seed)
+    for _ in range(operations):
+        product_count = len(manager.get_inventory_report())
+        choice = rng.random()
+        if choice < 0.3 or product_count == 0:
+            name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randint(1, 99)}"
+            manager.add_product(name, round(rng.uniform(1, 500), 2), rng.randint(0, 20), rng.choice(CATEGORIES))
+        elif choice < 0.6:
+            # Includes ids that do not exist and changes that would go below zero
+            manager.update_stock(rng.randint(1, product_count + 3), rng.randint(-25, 25))
+        elif choice < 0.75:
+            manager.update_price(rng.randint(1, product_count + 3), round(rng.uniform(1, 500), 2))
+        else:
+            changes = {rng.randint(1, product_count + 3): rng.randint(-10, 10) for _ in range(rng.randint(1, 8))}
+            manager.update_stock_many(changes)
+
+
+def observe(manager):
+    """Everything a caller can read from a manager"""
+    count = len(manager.get_inventory_report())
+    reorder_points = [position % 7 for position in range(count // 2)]
+    return {
+        "inventory": rows(manager.get_inventory_report()),
+        "low_stock": rows(manager.get_low_stock_report(5)),
+        "projected_low_stock": rows(manager.get_low_stock_report(3, reorder_points)),
+        "by_id": [manager.get_product_by_id(product_id) and tuple(manager.get_product_by_id(product_id))
+                  for product_id in range(0, count + 3)],
+        "by_name": {needle: rows(manager.get_product_by_name(needle)) for needle in ("lap", "ÜBER", "1", "zzz")},
+        "by_name_page": rows(manager.get_product_by_name("e", limit=5, offset=3)),
+        "by_prefix": {prefix: rows(manager.get_products_by_name_prefix(prefix, limit=None))
+                      for prefix in ("m", "Ån", "cable l", "q")},
+        "by_prefix_page": rows(manager.get_products_by_name_prefix("k", limit=4, offset=2)),
+        "by_category": {category: rows(manager.get_products_by_category(category))
+                        for category in ("ELECTRONICS", "kitchen", "Toys", "strasse")},
+    }
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("storage", ["columnar", "mmap"])
+def test_storage_matches_list_manager(storage, seed, tmp_path):
+    reference = create_inventory_manager("list")
+    manager = create_inventory_manager(storage, str(tmp_path / "inventory.dat"))
+    apply_random_operations(reference, seed)
+    apply_random_operations(manager, seed)
+    assert observe(manager) == observe(reference)
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar", "mmap"])
+def test_invalid_product_changes_nothing(storage, tmp_path):
+    manager = create_inventory_manager(storage, str(tmp_path / "inventory.dat"))
+    manager.add_product("Lamp", 10.0, 3, "Home")
+    before = observe(manager)
+    with pytest.raises(TypeError):
+        manager.add_product("Kettle", 12.0, 1, None)
+    assert observe(manager) == before
+    assert manager.add_product("Kettle", 12.0, 1, "Kitchen") == 2
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar", "mmap"])
+def test_version_moves_on_every_change(storage, tmp_path):
+    manager = create_inventory_manager(storage, str(tmp_path / "inventory.dat"))
+    versions = [manager.version]
+    manager.add_product("Lamp", 10.0, 3, "Home")
+    versions.append(manager.version)
+    manager.update_stock(1, 2)
+    versions.append(manager.version)
+    manager.update_price(1, 11.0)
+    versions.append(manager.version)
+    assert versions == sorted(set(versions))
+
+
+def test_mmap_shares_changes_between_managers(tmp_path):
+    path = str(tmp_path / "inventory.dat")
+    writer = create_inventory_manager("mmap", path)
+    reader = create_inventory_manager("mmap", path, readonly=True)
+    changed = []
+    reader.changed.add_listener(changed.append)
+    writer.add_product("Lamp", 10.0, 3, "Home")
+    version = reader.version
+    writer.update_stock(1, 4)
+    assert reader.version != version
+    assert changed == [1, 1]
+    assert tuple(reader.get_product_by_id(1)) == (1, "Lamp", 10.0, 7, "Home")
+    with pytest.raises(PermissionError):
+        reader.update_stock(1, 1)
+
+
+def test_mmap_rejects_fields_wider_than_their_record(tmp_path):
+    manager = create_inventory_manager("mmap", str(tmp_path / "inventory.dat"))
+    with pytest.raises(ValueError):
+        manager.add_product("x" * 65, 1.0, 1, "Home")
+    with pytest.raises(ValueError):
+        manager.add_product("Lamp", 1.0, 1, "é" * 17)
+    assert len(manager.get_inventory_report()) == 0
+
+
+def test_columnar_reports_run_alongside_adds():
+    manager = create_inventory_manager("columnar")
+    errors = []
+    done = threading.Event()
+
+    def report():
+        try:
+            while not done.is_set():
+                manager.get_low_stock_report(5)
+                manager.get_products_by_category("Home")
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    readers = [threading.Thread(target=report) for _ in range(2)]
+    try:
+        for reader in readers:
+            reader.start()
+        for i in range(3000):
+            manager.add_product(f"Lamp {i}", 10.0, i % 9, "Home")
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(interval)
+    assert not errors
+    assert len(manager.ids) == len(manager.prices) == len(manager.quantities) == len(manager.category_codes) == 3000
+    with pytest.raises(TypeError):
+        manager.add_product("Kettle", 12.0, 1.5, "Kitchen")
+    assert len(manager.prices) == len(manager.quantities) == len(manager.ids)
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar"])
+def test_lookups_by_id_follow_strided_ids(storage):
+    manager = create_inventory_manager(storage, first_id=2, id_step=3)
+    product_ids = [manager.add_product(f"Part {i}", 1.0 + i, i, "Parts") for i in range(200)]
+    assert product_ids == list(range(2, 2 + 3 * 200, 3))
+    for product_id in (1, 3, 4, 0, -1, product_ids[-1] + 3):
+        assert manager.get_product_by_id(product_id) is None
+        assert not manager.update_stock(product_id, 1)
+
+    assert manager.update_stock(product_ids[150], 7)
+    assert manager.update_stock_many({product_ids[10]: -100, 6: 1, product_ids[150]: 1}) == [6]
+    # Updates through the index show in the report rows
+    report = {row[0]: tuple(row) for row in manager.get_inventory_report()}
+    assert report[product_ids[150]] == tuple(manager.get_product_by_id(product_ids[150])) == (
+        product_ids[150], "Part 150", 151.0, 158, "Parts")
+    assert report[product_ids[10]][3] == 0
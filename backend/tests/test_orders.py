@@ -0,0 +1,176 @@
+"""
+Order Management Tests
+Checks the backorder heap against a plain sorted-list model, and the order flow through
+the API from placement to backorder refill
+"""
+
+import pickle
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+from src.order_management import BackorderPriorityQueue, OrderQueue
+
+
+class BackorderModel:
+    """The backorder ordering rules, kept as a list and sorted on every read"""
+
+    def __init__(self):
+        self.entries = []  # [-priority, sequence, order]
+        self.sequence = 0
+
+    def enqueue(self, order, priority):
+        self.remove(order["order_id"])
+        self.entries.append([-priority, self.sequence, order])
+        self.sequence += 1
+
+    def _take(self, entries):
+        if not entries:
+            return None
+        entry = min(entries, key=lambda entry: entry[:2])
+        self.entries.remove(entry)
+        return entry[2]
+
+    def dequeue(self):
+        return self._take(self.entries)
+
+    def dequeue_for_product(self, product_id):
+        return self._take([entry for entry in self.entries if entry[2]["product_id"] == product_id])
+
+    def remove(self, order_id):
+        return self._take([entry for entry in self.entries if entry[2]["order_id"] == order_id])
+
+    def update_priority(self, order_id, priority):
+        order = self.remove(order_id)
+        if order is None:
+            return False
+        order["priority"] = priority
+        self.enqueue(order, priority)
+        return True
+
+    def size(self):
+        return len(self.entries)
+
+
+def order_ids(order):
+    return None if order is None else order["order_id"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backorder_queue_matches_model(seed):
+    rng = random.Random(seed)
+    queue, model = BackorderPriorityQueue(), BackorderModel()
+    next_order_id = 1
+    for _ in range(2000):
+        choice = rng.random()
+        if choice < 0.4:
+            batch = []
+            for _ in range(rng.randint(1, 3)):
+                priority = rng.randint(1, 4)
+                batch.append(({"order_id": next_order_id, "product_id": rng.randint(1, 6), "priority": priority},
+                              priority))
+                next_order_id += 1
+            if len(batch) == 1:
+                queue.enqueue(dict(batch[0][0]), batch[0][1])
+            else:
+                queue.enqueue_many([(dict(order), priority) for order, priority in batch])
+            for order, priority in batch:
+                model.enqueue(dict(order), priority)
+        elif choice < 0.55:
+            assert order_ids(queue.dequeue()) == order_ids(model.dequeue())
+        elif choice < 0.75:
+            product_id = rng.randint(1, 6)
+            assert order_ids(queue.peek_for_product(product_id)) == order_ids(
+                min((entry for entry in model.entries if entry[2]["product_id"] == product_id),
+                    key=lambda entry: entry[:2], default=[None, None, None])[2])
+            assert order_ids(queue.dequeue_for_product(product_id)) == order_ids(model.dequeue_for_product(product_id))
+        elif choice < 0.85:
+            order_id = rng.randint(1, next_order_id)
+            assert order_ids(queue.remove(order_id)) == order_ids(model.remove(order_id))
+        else:
+            order_id, priority = rng.randint(1, next_order_id), rng.randint(1, 4)
+            assert queue.update_priority(order_id, priority) == model.update_priority(order_id, priority)
+        assert queue.size() == model.size()
+
+    if seed == 0:
+        queue = pickle.loads(pickle.dumps(queue))
+    drained = []
+    while not queue.is_empty():
+        drained.append(order_ids(queue.dequeue()))
+    assert drained == [order_ids(model.dequeue()) for _ in range(model.size())]
+    assert queue.peek() is None
+
+
+def test_order_queue_batches_keep_fifo_order():
+    queue = OrderQueue()
+    queue.enqueue({"order_id": 1})
+    queue.enqueue_many([{"order_id": order_id} for order_id in range(2, 11)])
+    assert [order["order_id"] for order in queue.dequeue_batch(3)] == [1, 2, 3]
+    assert [order["order_id"] for order in queue.drain(limit=2)] == [4, 5]
+    assert queue.peek()["order_id"] == 6 and queue.size() == 5
+
+    queue = pickle.loads(pickle.dumps(queue))
+    assert [order["order_id"] for order in queue.dequeue_batch(100)] == [6, 7, 8, 9, 10]
+    assert queue.dequeue_batch(5) == [] and queue.dequeue() is None
+    queue.enqueue_many([{"order_id": 11}, {"order_id": 12}])
+    assert [order["order_id"] for order in queue.drain()] == [11, 12]
+    assert queue.is_empty()
+
+
+def test_restock_fills_backorders_by_priority_then_age():
+    api = InventoryAPI()
+    product_id = api.add_product("Widget", 5.0, 0, "Parts")["product_id"]
+    low = api.place_order(product_id, 2, "Low", 1)["order_id"]
+    high = api.place_order(product_id, 2, "High", 3)["order_id"]
+    later_high = api.place_order(product_id, 2, "Later high", 3)["order_id"]
+    processed = api.process_orders(10)
+    assert [order["status"] for order in processed["processed_orders"]] == ["backordered"] * 3
+
+    result = api.update_stock(product_id, 4)
+    assert [order["order_id"] for order in result["fulfilled_backorders"]] == [high, later_high]
+    result = api.update_stock(product_id, 2)
+    assert [order["order_id"] for order in result["fulfilled_backorders"]] == [low]
+    assert api.get_system_status()["backorders"] == 0
+
+
+def test_registry_keeps_recent_fulfilled_orders(monkeypatch):
+    monkeypatch.setattr("src.api.FULFILLED_ORDERS_KEPT", 5)
+    api = InventoryAPI()
+    product_id = api.add_product("Widget", 5.0, 100, "Parts")["product_id"]
+    waiting = api.place_order(product_id, 500, "Big", 1)["order_id"]
+    api.process_orders()
+    cursor = api.get_changes()["cursor"]
+    placed = [api.place_order(product_id, 1, f"Customer {i}", 1)["order_id"] for i in range(12)]
+    api.process_orders(12)
+
+    assert sorted(api.orders) == [waiting] + placed[-5:]
+    assert api.orders[waiting]["status"] == "backordered"
+    # A cursor from before the dropped orders' entries cannot be served in full
+    assert api.get_changes(cursor)["reset"]
+    latest = api.get_changes(api.get_changes()["cursor"] - 3)
+    assert not latest["reset"] and [order["order_id"] for order in latest["orders"]] == placed[-3:]
+
+
+def test_invalid_orders_are_rejected_when_placed():
+    api = InventoryAPI()
+    assert api.place_order(1, "3", "Customer")["status"] == "error"
+    assert api.place_order(1, 0, "Customer")["status"] == "error"
+    assert api.place_order(1, 2, "Customer", priority="high")["status"] == "error"
+    assert api.get_system_status()["pending_orders"] == 0
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_invalid_queued_order_changes_nothing(batched):
+    api = InventoryAPI()
+    first = api.place_order(1, 1, "First")["order_id"]
+    api.place_order(2, 1, "Second")
+    # An order queued by an older version that did not validate quantities
+    api.order_queue.peek()["quantity"] = "3"
+    before = (api.get_inventory(), api.get_system_status(), api.get_transactions(limit=100))
+
+    result = api.process_orders(2, batched=batched)
+    assert result["status"] == "error" and result["errors"][0]["index"] == 0
+    assert (api.get_inventory(), api.get_system_status(), api.get_transactions(limit=100)) == before
+    assert api.order_queue.peek()["order_id"] == first
+    assert [order["status"] for order in api.orders.values()] == ["pending", "pending"]
@@ -0,0 +1,110 @@
+"""
+Replenishment Tests
+Builds four weeks of order history and checks demand forecasts, reorder points and
+suggested orders against the formulas applied directly to the ledger, with and
+without NumPy
+"""
+
+import math
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from src.api import InventoryAPI
+from src.replenishment import COVER_DAYS, HISTORY_DAYS, SMOOTHING
+from src.transaction_ledger import now_micros
+
+DAY_MICROS = 86400 * 1_000_000
+
+
+@pytest.fixture(params=["numpy", "python"])
+def numpy_mode(request, monkeypatch):
+    """Run with NumPy, or as if it were not installed"""
+    if request.param == "python":
+        for module in ("src.replenishment", "src.columnar_inventory"):
+            monkeypatch.setattr(f"{module}.np", None)
+    return request.param
+
+
+@pytest.fixture(params=["list", "columnar"])
+def api(request, numpy_mode):
+    api = InventoryAPI(storage=request.param)
+    api.add_products([(f"Part {i}", 2.0, 30, "Parts") for i in range(6)])
+    rng = random.Random(11)
+    today = now_micros() // DAY_MICROS
+    for day in range(today - HISTORY_DAYS - 2, today + 1):
+        api.transaction_ledger.clock = lambda day=day: day * DAY_MICROS + 3_600_000_000
+        for _ in range(rng.randint(0, 8)):
+            # Products 11-16 sell at rates of their own, sometimes past their stock
+            api.place_order(rng.randint(11, 16), rng.randint(1, 4), "Ada")
+        api.process_orders(20)
+        if day % 5 == 0:
+            api.update_stock(rng.randint(11, 16), rng.randint(5, 20))
+    api.transaction_ledger.clock = None
+    return api
+
+
+def daily_demand(api):
+    """Units asked for per product on each of the HISTORY_DAYS complete days before today"""
+    first_day = now_micros() // DAY_MICROS - HISTORY_DAYS
+    demand = {}
+    for entry in api.get_transactions(limit=100_000):
+        timestamp = datetime.fromisoformat(entry["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+        day = int(timestamp) // 86400 - first_day
+        if not 0 <= day < HISTORY_DAYS:
+            continue
+        row = demand.setdefault(entry["product_id"], [0] * HISTORY_DAYS)
+        if entry["type"] == "BACKORDER_CREATED":
+            row[day] += entry["quantity"]
+        elif entry["type"] == "ORDER_FULFILLED" and not entry["details"].endswith("(backorder)"):
+            # A filled backorder was counted as demand when it was created
+            row[day] += entry["quantity"]
+    return {product_id: [max(units, 0) for units in row] for product_id, row in demand.items()}
+
+
+def expected_forecast(history, lead_time_days, service_factor):
+    """(rate, reorder point) of one product's daily demand"""
+    weights = [SMOOTHING * (1 - SMOOTHING) ** (HISTORY_DAYS - 1 - day) for day in range(HISTORY_DAYS)]
+    rate = sum(weight * units for weight, units in zip(weights, history)) / sum(weights)
+    mean = sum(history) / HISTORY_DAYS
+    spread = math.sqrt(sum((units - mean) ** 2 for units in history) / HISTORY_DAYS)
+    return rate, rate * lead_time_days + service_factor * spread * math.sqrt(lead_time_days)
+
+
+@pytest.mark.parametrize("lead_time_days, service_factor", [(7, 1.65), (3, 0)])
+def test_plan_follows_the_order_history(api, lead_time_days, service_factor):
+    demand = daily_demand(api)
+    plan = api.get_replenishment_plan(lead_time_days, service_factor, limit=1000)
+    assert plan["products_planned"] == len(api.get_inventory())
+
+    due = []
+    for product in api.get_inventory():
+        rate, reorder_point = expected_forecast(demand.get(product["id"], [0] * HISTORY_DAYS),
+                                                lead_time_days, service_factor)
+        if product["quantity"] <= reorder_point:
+            cover = product["quantity"] / rate if rate > 0 else math.inf
+            due.append((cover, product["id"], rate, reorder_point,
+                        math.ceil(reorder_point + rate * COVER_DAYS - product["quantity"])))
+    due.sort(key=lambda item: item[0])
+    assert plan["products_due"] == len(due) == len(plan["products"])
+    assert any(rate > 0 for cover, product_id, rate, point, order in due)
+    for item, (cover, product_id, rate, reorder_point, order) in zip(plan["products"], due):
+        assert item["id"] == product_id
+        assert item["demand_per_day"] == pytest.approx(rate, abs=0.006)
+        assert item["reorder_point"] == pytest.approx(reorder_point, abs=0.006)
+        assert item["suggested_order_quantity"] == order
+
+    low = api.get_low_stock(projected=True, lead_time_days=lead_time_days, service_factor=service_factor)
+    assert sorted(product["id"] for product in low["products"]) == sorted(product_id for _, product_id, *_ in due)
+
+
+def test_numpy_and_python_forecasts_agree(api, numpy_mode, monkeypatch):
+    if numpy_mode == "python":
+        pytest.skip("the NumPy forecast is the one compared")
+    plan = api.get_replenishment_plan(limit=1000)
+    low = api.get_low_stock(projected=True)
+    monkeypatch.setattr("src.replenishment.np", None)
+    api.demand_forecast = None  # computed again, without NumPy
+    assert api.get_replenishment_plan(limit=1000) == plan
+    assert api.get_low_stock(projected=True) == low
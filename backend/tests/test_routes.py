@@ -0,0 +1,255 @@
+"""
+Route Tests
+Sends the same requests to the Flask app and the asyncio server, each over its own
+InventoryAPI, and checks that they answer alike
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from async_main import AsyncInventoryServer
+from src.api import InventoryAPI
+from src.response_cache import ResponseCache
+
+
+@pytest.fixture
+def flask_client(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "api", InventoryAPI())
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    return main.app.test_client()
+
+
+@pytest.fixture
+def async_server():
+    server = AsyncInventoryServer(InventoryAPI())
+    yield server
+    server.executor.shutdown()
+
+
+def flask_call(client, method, path, body=None):
+    response = client.open(path, method=method, json=body)
+    return response.status_code, response.get_json()
+
+
+def async_call(server, method, path, body=None):
+    data = b"" if body is None else json.dumps(body).encode("utf-8")
+    status, payload, headers = asyncio.run(
+        server.dispatch(method, path, data, {"content-type": "application/json"})
+    )
+    return status, json.loads(payload) if payload else None
+
+
+def parse_responses(raw):
+    """Split raw HTTP/1.1 responses into (status, headers, body bytes), joining chunked bodies"""
+    responses = []
+    while raw:
+        head, raw = raw.split(b"\r\n\r\n", 1)
+        lines = head.decode("latin-1").split("\r\n")
+        headers = {name.lower(): value.strip() for name, _, value in (line.partition(":") for line in lines[1:])}
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size, raw = raw.split(b"\r\n", 1)
+                size = int(size, 16)
+                body, raw = body + raw[:size], raw[size + 2:]
+                if not size:
+                    break
+        else:
+            length = int(headers.get("content-length", 0))
+            body, raw = raw[:length], raw[length:]
+        responses.append((int(lines[0].split(" ")[1]), headers, body))
+    return responses
+
+
+def exchange(server, requests):
+    """Send raw requests over one connection to a listening server; returns the parsed responses"""
+    async def run():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        async with listener:
+            reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+            writer.write(b"".join(requests))
+            await writer.drain()
+            raw = await reader.read()  # the last request asks the server to close
+            writer.close()
+        return raw
+    return parse_responses(asyncio.run(run()))
+
+
+def request_bytes(method, path, body=None, close=False, headers=None):
+    data = b"" if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode("utf-8"))
+    lines = [f"{method} {path} HTTP/1.1", "Host: test", f"Content-Length: {len(data)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    if close:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data
+
+
+def without_timestamps(payload):
+    if isinstance(payload, (list, tuple)):
+        return [without_timestamps(item) for item in payload]
+    if isinstance(payload, dict):
+        return {key: without_timestamps(value) for key, value in payload.items() if key != "timestamp"}
+    return payload
+
+
+def run_session(call):
+    """Drive one server through a typical client session; returns every (status, payload)"""
+    responses = [call("GET", "/api/inventory")]
+    added = call("POST", "/api/inventory", {"name": "Desk Lamp", "price": 12.5, "quantity": 3, "category": "Home"})
+    responses.append(added)
+    product_id = added[1]["product_id"]
+    responses += [
+        call("PUT", f"/api/inventory/{product_id}", {"quantityChange": 4}),
+        call("PUT", f"/api/inventory/{product_id}/price", {"price": 11.0}),
+        call("POST", "/api/orders", {"productId": product_id, "quantity": 5, "customerName": "Ada", "priority": 2}),
+        call("POST", "/api/orders", {"productId": 1, "quantity": 500, "customerName": "Bo"}),
+        call("POST", "/api/orders", {"productId": 1, "quantity": "2", "customerName": "Cy"}),
+        call("POST", "/api/orders/process", {"count": 5}),
+        call("GET", "/api/inventory/search?q=lamp"),
+        call("GET", "/api/inventory/search?q=desk&prefix=true"),
+        call("GET", "/api/transactions?limit=50&order=desc"),
+        call("GET", "/api/status"),
+        call("POST", "/api/composite-cost", {"components": [[1, 1], [product_id, 0.5]]}),
+        call("POST", "/api/composites", {"name": "desk", "components": [[product_id, 1], [2, 2]]}),
+        call("POST", "/api/composite-buildable", {"kits": ["desk"]}),
+        call("GET", "/api/low-stock?threshold=10"),
+        call("GET", "/api/inventory"),
+    ]
+    return without_timestamps(responses)
+
+
+def test_async_routes_answer_like_flask(flask_client, async_server):
+    expected = run_session(lambda *request: flask_call(flask_client, *request))
+    assert run_session(lambda *request: async_call(async_server, *request)) == expected
+    assert expected[6][1]["status"] == "error"
+
+
+def test_async_connection_serves_requests_until_closed(async_server):
+    responses = exchange(async_server, [
+        request_bytes("GET", "/api/status"),
+        request_bytes("POST", "/api/inventory/1", {"quantityChange": 1}),
+        request_bytes("PUT", "/api/inventory/1", b"{not json"),
+        request_bytes("PUT", "/api/inventory/1", {"quantityChange": 5}, close=True),
+    ])
+    assert [status for status, headers, body in responses] == [200, 404, 400, 200]
+    assert [headers["connection"] for status, headers, body in responses] == ["keep-alive"] * 3 + ["close"]
+    assert json.loads(responses[0][2])["total_products"] == 10
+    assert async_server.api.get_products([1])[0]["quantity"] == 15
+
+
+def recording_thread(threads, method):
+    """Wrap an API method to note the name of each thread that calls it"""
+    def record(*args):
+        threads.append(threading.current_thread().name)
+        return method(*args)
+    return record
+
+
+def test_cost_lock_routes_run_on_the_worker_pool(async_server, monkeypatch):
+    threads = []
+    api = async_server.api
+    for name in ("calculate_composite_cost", "calculate_buildable", "place_order"):
+        monkeypatch.setattr(api, name, recording_thread(threads, getattr(api, name)))
+    async_call(async_server, "POST", "/api/composite-cost", {"components": [[1, 2]]})
+    async_call(async_server, "POST", "/api/composite-buildable", {"components": [[1, 2]]})
+    async_call(async_server, "POST", "/api/orders", {"productId": 1, "quantity": 1, "customerName": "Ada"})
+    assert len(threads) == 3
+    assert all(name.startswith("inventory") for name in threads)
+
+
+def ndjson(records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def test_bulk_routes_read_json_and_ndjson(flask_client, async_server):
+    products = [{"name": "Lamp", "price": 2.5, "quantity": 4, "category": "Home"},
+                {"name": "Kettle", "price": 9.0, "quantity": 0, "category": "Kitchen"}]
+    orders = [{"productId": 11, "quantity": 2, "customerName": "Ada"},
+              {"productId": 999, "quantity": 1, "customerName": "Bo", "priority": 3}]
+    requests = [
+        ("POST", "/api/inventory/bulk", ndjson(products), "application/x-ndjson"),
+        ("PUT", "/api/inventory/bulk", json.dumps([{"productId": 12, "quantityChange": 5}]).encode(), "application/json"),
+        ("POST", "/api/orders/bulk", ndjson(orders), "application/ndjson"),
+        ("POST", "/api/orders/bulk", json.dumps({"productId": 11}).encode(), "application/json"),
+        ("PUT", "/api/inventory/bulk", ndjson([{"productId": 11, "quantityChange": "5"}]), "application/x-ndjson"),
+    ]
+    flask_results = [flask_client.open(path, method=method, data=body, content_type=content_type).get_json()
+                     for method, path, body, content_type in requests]
+    async_results = []
+    for method, path, body, content_type in requests:
+        status, payload, headers = asyncio.run(async_server.dispatch(method, path, body, {"content-type": content_type}))
+        async_results.append(json.loads(payload))
+
+    assert async_results == flask_results
+    added, restocked, placed, not_a_list, invalid = flask_results
+    assert [item["product_id"] for item in added["results"]] == [11, 12]
+    assert restocked["results"] == [{"status": "success"}]
+    assert [item["status"] for item in placed["results"]] == ["success", "error"]
+    assert not_a_list["errors"] == [{"index": None, "message": "Batch must be a list of items"}]
+    assert invalid["errors"] == [{"index": 0, "message": "quantity_change must be an integer"}]
+    assert async_server.api.get_products([12])[0]["quantity"] == 5
+
+
+def test_exports_stream_alike(flask_client, async_server, monkeypatch):
+    import main
+    monkeypatch.setattr("src.export.CHUNK_ROWS", 4)
+    for api in (main.api, async_server.api):
+        for product_id in range(1, 11):
+            api.place_order(product_id, 3, f"Customer {product_id}")
+        api.process_orders(10)
+    paths = ["/api/export/inventory?format=csv&fields=id,name,quantity",
+             "/api/export/transactions?fields=id,type,product_id,quantity,order_id"]
+    responses = exchange(async_server, [request_bytes("GET", path) for path in paths]
+                         + [request_bytes("GET", "/api/export/inventory?format=xml", close=True)])
+
+    for path, (status, headers, body) in zip(paths, responses):
+        expected = flask_client.get(path)
+        # Sent as it is produced, in chunks, with the body Flask streams
+        assert headers["transfer-encoding"] == "chunked"
+        assert headers["content-type"] == expected.mimetype
+        assert body == expected.data
+    assert len(responses[1][2].splitlines()) == 20
+    assert responses[2][0] == flask_client.get("/api/export/inventory?format=xml").status_code == 400
+
+
+def flask_get(client, path, etag=None):
+    response = client.get(path, headers={"If-None-Match": etag} if etag else {})
+    return response.status_code, response.headers.get("ETag"), response.data
+
+
+def async_get(server, path, etag=None):
+    status, payload, headers = asyncio.run(server.dispatch("GET", path, b"", {"if-none-match": etag} if etag else {}))
+    return status, (headers or {}).get("ETag"), payload or b""
+
+
+@pytest.mark.parametrize("server", ["flask", "async"])
+def test_conditional_gets_follow_resource_versions(server, flask_client, async_server):
+    import main
+    if server == "flask":
+        api, cache, get = main.api, main.response_cache, lambda *args: flask_get(flask_client, *args)
+    else:
+        api, cache, get = async_server.api, async_server.response_cache, lambda *args: async_get(async_server, *args)
+
+    status, inventory_etag, body = get("/api/inventory")
+    assert status == 200 and json.loads(body) == api.get_inventory()
+    assert get("/api/inventory", inventory_etag) == (304, inventory_etag, b"")
+    assert get("/api/inventory", f"W/{inventory_etag}, \"other\"")[0] == 304
+    status, transactions_etag, body = get("/api/transactions")
+    hits = cache.hits
+    assert get("/api/transactions") == (200, transactions_etag, body)
+    assert cache.hits == hits + 1
+
+    # An order is a ledger change only: the inventory stays cached, the transactions do not
+    api.place_order(1, 1, "Ada")
+    assert get("/api/inventory", inventory_etag)[0] == 304
+    status, etag, body = get("/api/transactions", transactions_etag)
+    assert status == 200 and etag != transactions_etag and len(json.loads(body)) == 1
+
+    api.update_price(1, 5.0)
+    status, etag, body = get("/api/inventory", inventory_etag)
+    assert status == 200 and etag != inventory_etag and json.loads(body)[0]["price"] == 5.0
+    assert get("/api/status", get("/api/status")[1])[0] == 304
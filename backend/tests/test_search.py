@@ -0,0 +1,83 @@
+"""
+Product Search Tests
+Checks the trigram and radix tree name index against plain scans of the names,
+including paging and searches that run while products are being added
+"""
+
+import random
+import sys
+import threading
+
+import pytest
+
+from src.product_search import ProductSearchIndex
+
+SYLLABLES = ["lap", "top", "mo", "use", "key", "board", "ca", "ble", "Ü", "ber", "straße", "STRASSE", "ka"]
+
+
+def random_names(seed, count):
+    rng = random.Random(seed)
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) + f" {rng.randint(1, 9)}"
+            for _ in range(count)]
+
+
+def scan(names, query):
+    needle = query.casefold()
+    return [product_id for product_id, name in names.items() if needle in name.casefold()]
+
+
+def scan_prefix(names, prefix):
+    prefix = prefix.casefold()
+    matches = [product_id for product_id, name in names.items() if name.casefold().startswith(prefix)]
+    return sorted(matches, key=lambda product_id: names[product_id].casefold())
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_search_matches_scans(seed):
+    index = ProductSearchIndex()
+    names = {product_id: name for product_id, name in enumerate(random_names(seed, 800), start=1)}
+    for product_id, name in names.items():
+        index.add(product_id, name)
+
+    for query in ("lap", "a", "BOARD", "ber", "strasse", "usek", "top 3", "zzz", "", "keyboardca"):
+        expected = scan(names, query)
+        assert index.search(query) == expected
+        assert index.search(query, limit=7, offset=5) == expected[5:12]
+    for prefix in ("ka", "K", "Üb", "straßeca", "lapto", "q", "", "mo 1"):
+        expected = scan_prefix(names, prefix)
+        assert index.autocomplete(prefix, limit=None) == expected
+        assert index.autocomplete(prefix, limit=4, offset=3) == expected[3:7]
+
+
+def test_search_while_products_are_added():
+    index = ProductSearchIndex()
+    names = random_names(3, 4000)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        try:
+            while not done.is_set():
+                found = index.search("board")
+                # Ids are added in order, so a search sees a prefix of them
+                assert found == sorted(found)
+                assert all("board" in names[product_id - 1].casefold() for product_id in found)
+                index.autocomplete("key", limit=5)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    readers = [threading.Thread(target=search) for _ in range(2)]
+    try:
+        for reader in readers:
+            reader.start()
+        for product_id, name in enumerate(names, start=1):
+            index.add(product_id, name)
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(interval)
+    assert not errors
+    assert index.search("board") == scan(dict(enumerate(names, start=1)), "board")
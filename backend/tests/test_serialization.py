@@ -0,0 +1,68 @@
+"""
+Serialization Tests
+Checks that the inventory encoded from cached product fragments always matches the
+inventory encoded whole, as products change, are added, and state is restored
+"""
+
+import json
+import pickle
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+from src.serialization import dumps, stdlib_dumps
+
+
+def assert_encoded_inventory_current(api):
+    encoded = api.get_inventory_json()
+    assert encoded == dumps(api.get_inventory())
+    assert json.loads(encoded) == json.loads(stdlib_dumps(api.get_inventory()))
+
+
+def random_writes(api, rng, count):
+    product_count = len(api.get_inventory())
+    for _ in range(count):
+        r = rng.random()
+        product_id = rng.randint(1, product_count)
+        if r < 0.3:
+            api.update_stock(product_id, rng.randint(-5, 10))
+        elif r < 0.5:
+            api.update_price(product_id, round(rng.uniform(1, 99), 2))
+        elif r < 0.65:
+            api.update_stock_bulk([(rng.randint(1, product_count), rng.randint(1, 5)) for _ in range(3)])
+        elif r < 0.8:
+            api.place_order(product_id, rng.randint(1, 3), "Ada")
+            api.process_orders(1)
+        else:
+            added = api.add_products([(f"Item \"{i}\" ✓", 1.5 * i, i, "New") for i in range(rng.randint(1, 3))])
+            product_count += len(added["results"])
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar", "mmap"])
+def test_fragments_follow_writes(storage, tmp_path):
+    api = InventoryAPI(storage=storage, storage_path=str(tmp_path / "inventory.dat"))
+    rng = random.Random(5)
+    for _ in range(25):
+        # A read between writes leaves fragments cached, so the next read must re-encode the changed ones
+        assert_encoded_inventory_current(api)
+        random_writes(api, rng, rng.randint(1, 6))
+    assert_encoded_inventory_current(api)
+
+
+@pytest.mark.parametrize("storage", ["list", "columnar"])
+def test_fragments_follow_restored_state(storage):
+    api = InventoryAPI(storage=storage)
+    rng = random.Random(6)
+    random_writes(api, rng, 20)
+    saved = pickle.dumps(api.capture_state())
+    expected = api.get_inventory()
+    assert_encoded_inventory_current(api)
+
+    random_writes(api, rng, 20)
+    assert_encoded_inventory_current(api)
+    api.restore_state(pickle.loads(saved))
+    assert api.get_inventory() == expected
+    assert_encoded_inventory_current(api)
+    random_writes(api, rng, 20)
+    assert_encoded_inventory_current(api)
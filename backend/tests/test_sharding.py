@@ -0,0 +1,127 @@
+"""
+Sharding Tests
+Runs the same calls against a two-shard router and a single InventoryAPI and checks
+that the merged answers match, including kits, the change feed and its cursors
+"""
+
+import asyncio
+import json
+import random
+
+import pytest
+
+from src.api import InventoryAPI
+from src.sharding import ShardedInventoryAPI
+
+
+@pytest.fixture
+def apis():
+    single = InventoryAPI()
+    sharded = ShardedInventoryAPI(2)
+    yield single, sharded
+    sharded.close()
+
+
+def apply_calls(api, seed):
+    rng = random.Random(seed)
+    api.add_products([(f"Widget {i}", round(1 + i * 0.5, 2), rng.randint(0, 12), "Widgets" if i % 3 else "Tools")
+                      for i in range(15)])
+    for _ in range(4):
+        api.update_stock_bulk([(rng.randint(1, 25), rng.randint(-3, 8)) for _ in range(6)])
+        api.place_orders([(rng.randint(1, 25), rng.randint(1, 5), "Ada", rng.randint(1, 3)) for _ in range(8)])
+        api.update_price(rng.randint(1, 25), round(rng.uniform(1, 30), 2))
+        # Every pending order is processed, so each product's orders are allocated in full
+        api.process_orders(100)
+    api.define_composite("pair", [[1, 2], [12, 1]])
+    api.define_composite("set", [{"kit": "pair"}, [17, 3], [24, 1]])
+
+
+def movements(entries):
+    """(type, quantity) of each entry but PRODUCT_ADDED, which only the router logs for sample products"""
+    return [(entry["type"], entry["quantity"]) for entry in entries if entry["type"] != "PRODUCT_ADDED"]
+
+
+def test_sharded_answers_match_a_single_api(apis):
+    single, sharded = apis
+    for api in apis:
+        apply_calls(api, 8)
+
+    assert sharded.get_inventory() == single.get_inventory()
+    ids = [24, 3, 999, "x", 18]
+    assert sorted(sharded.get_products(ids), key=str) == sorted(single.get_products(ids), key=str)
+    assert sorted(sharded.search_products("widget 1", limit=50), key=str) == \
+        sorted(single.search_products("widget 1", limit=50), key=str)
+    assert sharded.get_low_stock(4) == single.get_low_stock(4)
+    status = sharded.get_system_status()
+    for name, value in single.get_system_status().items():
+        # Sample products are logged by the sharded router's bulk add only
+        if name != "total_transactions":
+            assert status[name] == value, name
+    for product_id in (1, 2, 17):
+        assert movements(sharded.get_transactions(50, product_id=product_id)) == \
+            movements(single.get_transactions(50, product_id=product_id))
+
+    components = [{"kit": "set"}, [5, 0.5]]
+    assert sharded.calculate_composite_cost(components)["total_cost"] == \
+        pytest.approx(single.calculate_composite_cost(components)["total_cost"])
+    assert sharded.calculate_buildable() == single.calculate_buildable()
+    assert sharded.calculate_buildable(components=[[3, 1], {"kit": "pair"}]) == \
+        single.calculate_buildable(components=[[3, 1], {"kit": "pair"}])
+    for api in apis:
+        assert api.calculate_composite_cost([{"kit": "missing"}])["status"] == "error"
+        assert api.calculate_buildable(components=[[1, 0.5]])["status"] == "error"
+
+
+def test_ledger_cursors_need_a_product(apis):
+    single, sharded = apis
+    assert sharded.get_transactions(5, after_id=3) == {
+        "status": "error", "message": "after and before cursors need product_id in sharded mode"}
+    assert sharded.get_transactions(5, before_id=3)["status"] == "error"
+    last_id = sharded.get_transactions(1, latest=True, product_id=2)[0]["id"]
+    sharded.place_order(2, 1, "Ada")
+    assert [entry["type"] for entry in sharded.get_transactions(5, after_id=last_id, product_id=2)] == ["ORDER_PLACED"]
+
+
+def test_cursor_errors_are_answered_with_400(apis, monkeypatch):
+    import main
+    from async_main import AsyncInventoryServer
+    from src.response_cache import ResponseCache
+    single, sharded = apis
+    monkeypatch.setattr(main, "api", sharded)
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    response = main.app.test_client().get("/api/transactions?after=3")
+    assert response.status_code == 400 and response.get_json()["status"] == "error"
+
+    server = AsyncInventoryServer(sharded)
+    try:
+        for _ in range(2):  # the error is not cached as an answer
+            status, payload, headers = asyncio.run(server.dispatch("GET", "/api/transactions?after=3", b"", {}))
+            assert status == 400 and json.loads(payload) == response.get_json()
+    finally:
+        server.executor.shutdown()
+
+
+def test_following_the_sharded_feed_keeps_a_copy_current(apis):
+    single, sharded = apis
+    copy = {"products": {}, "orders": {}}
+    cursor = 0
+    for round_seed in range(3):
+        apply_calls(sharded, round_seed)
+        while True:
+            changes = sharded.get_changes(cursor, limit=6)
+            assert not changes["reset"] and changes["cursor"].count(".") == 1
+            copy["products"].update((product["id"], product) for product in changes["products"])
+            copy["orders"].update((order["order_id"], order) for order in changes["orders"])
+            cursor = changes["cursor"]
+            if not changes["has_more"]:
+                break
+        assert sorted(copy["products"].values(), key=lambda product: product["id"]) == sharded.get_inventory()
+    # Every order placed was processed, and the copy holds its final status
+    assert len(copy["orders"]) == 3 * 4 * 8
+    assert {order["status"] for order in copy["orders"].values()} <= {"fulfilled", "backordered"}
+
+    # Cursors of a single API or of another shard count start over
+    for other in (5, "1.2.3", "x"):
+        changes = sharded.get_changes(other)
+        assert changes["reset"] and changes["cursor"] == cursor and not changes["products"]
+    assert sharded.get_changes(cursor, wait=0.05)["products"] == []
@@ -0,0 +1,170 @@
+"""
+Transaction Ledger Tests
+Checks that a ledger archiving cold segments reads exactly like one kept in memory, and
+that movement rollups match totals summed from the ledger entries
+"""
+
+import os
+import pickle
+import random
+
+import pytest
+
+from src.ledger_archive import LedgerArchive
+from src.movement_rollups import GRANULARITIES, ROLLUP_TYPES, MovementRollups
+from src.transaction_ledger import TransactionLedger, parse_timestamp
+
+TYPES = ["STOCK_INCREASE", "STOCK_DECREASE", "ORDER_PLACED", "ORDER_FULFILLED", "BACKORDER_CREATED", "PRODUCT_ADDED"]
+START = 1_750_000_000 * 1_000_000  # epoch microseconds
+CATEGORIES = {product_id: ["Tools", "Garden", "Kitchen"][product_id % 3] for product_id in range(1, 13)}
+
+
+def fill(ledgers, seed, entries=3000, start=START):
+    """Append the same random entries to every ledger, about a minute apart; returns the last timestamp"""
+    rng = random.Random(seed)
+    now = start
+    for ledger in ledgers:
+        ledger.clock = lambda: now
+    order_id = 0
+    remaining = entries
+    while remaining > 0:
+        now += rng.randint(0, 120) * 1_000_000
+        batch = []
+        for _ in range(min(rng.randint(1, 5), remaining)):
+            order_id += 1
+            batch.append((rng.choice(TYPES), rng.randint(1, 12), rng.randint(1, 9),
+                          ("Order #{order_id} by {0}", f"Customer {order_id % 7}"), order_id % 40 or None))
+        remaining -= len(batch)
+        for ledger in ledgers:
+            if len(batch) == 1:
+                ledger.add_transaction(*batch[0])
+            else:
+                ledger.add_transactions(batch)
+    for ledger in ledgers:
+        ledger.clock = None
+    return now
+
+
+def reads(ledger):
+    """The results of every kind of ledger read"""
+    count = ledger.count
+    middle = START + (count // 2) * 60 * 1_000_000
+    return {
+        "history": ledger.get_transaction_history(),
+        "latest": ledger.get_latest_transactions(25),
+        "after": ledger.get_transactions_after(count // 3, 50),
+        "before": ledger.get_transactions_before(count // 2, 50),
+        "by_product": {product_id: ledger.get_transactions_by_product(product_id) for product_id in range(1, 14)},
+        "by_product_after": ledger.get_transactions_by_product(3, 20, after_id=count // 4),
+        "by_product_before": ledger.get_transactions_by_product(3, 20, before_id=count - 100),
+        "time_range": list(ledger.iter_time_range(START + 3_600_000_000, middle)),
+        "product_time_range": list(ledger.iter_time_range(middle, None, product_id=5)),
+        "last": ledger.get_last_transaction(),
+    }
+
+
+def test_archived_ledger_reads_like_memory(tmp_path):
+    archive = LedgerArchive(str(tmp_path / "archive"), cached_segments=2)
+    memory = TransactionLedger(segment_size=64)
+    archived = TransactionLedger(segment_size=64, archive=archive, hot_segments=2)
+    fill([memory, archived], seed=1)
+
+    assert archived.archived_through >= archived.count - 4 * 64
+    assert len(os.listdir(archive.directory)) == archived.archived_through // 64
+    expected = reads(memory)
+    assert reads(archived) == expected
+
+    # A snapshot keeps archived segments as references to their files
+    restored = pickle.loads(pickle.dumps(archived))
+    assert reads(restored) == expected
+
+
+def page(fetch, cursor, step):
+    """Follow a cursor through every page fetch(cursor, step) returns; returns the ids in page order"""
+    ids = []
+    while True:
+        entries = fetch(cursor, step)
+        if not entries:
+            return ids
+        ids.extend(entry["id"] for entry in entries)
+        cursor = entries[-1]["id"]
+
+
+def test_cursor_pages_cover_the_ledger_once():
+    ledger = TransactionLedger(segment_size=50)
+    fill([ledger], seed=5, entries=700)
+    history = [entry["id"] for entry in ledger.get_transaction_history()]
+    assert history == list(range(1, 701))
+
+    # Pages straddle segment boundaries, so every id appears once, in order
+    assert page(ledger.get_transactions_after, 0, 7) == history
+    assert page(ledger.get_transactions_before, ledger.count + 1, 7) == history[::-1]
+    assert page(ledger.get_transactions_after, 640, 100) == history[640:]
+    assert [entry["id"] for entry in ledger.get_latest_transactions(12)] == history[:-13:-1]
+    for product_id in (2, 9):
+        owned = [entry["id"] for entry in ledger.get_transaction_history() if entry["product_id"] == product_id]
+        assert [entry["id"] for entry in ledger.get_transactions_by_product(product_id)] == owned
+        forward = lambda cursor, step: ledger.get_transactions_by_product(product_id, step, after_id=cursor)
+        backward = lambda cursor, step: ledger.get_transactions_by_product(product_id, step, before_id=cursor)
+        assert page(forward, 0, 5) == owned
+        assert page(backward, ledger.count + 1, 5) == owned[::-1]
+
+
+def test_ledger_timestamps_round_trip():
+    ledger = TransactionLedger()
+    ledger.clock = lambda: START + 123_456
+    ledger.add_transaction("STOCK_INCREASE", 1, 5, "Stock adjustment")
+    entry = ledger.get_transaction(1)
+    assert parse_timestamp(entry["timestamp"]) == START + 123_456
+    assert ledger.get_transaction(0) is None and ledger.get_transaction(2) is None
+
+
+def expected_movement(ledger, granularity, periods, now, key=None):
+    """Sum a window of buckets straight from the ledger entries, like MovementRollups.movement"""
+    width = GRANULARITIES[granularity]
+    slots = {name: slot for slot, name in enumerate(ROLLUP_TYPES)}
+    last = now // 1_000_000 // width
+    first = last - periods + 1
+    totals = {}
+    open_backorders = set()
+    for entry in ledger.get_transaction_history():
+        bucket = parse_timestamp(entry["timestamp"]) // 1_000_000 // width
+        matched = []
+        if entry["type"] in slots:
+            matched.append(slots[entry["type"]])
+        if entry["type"] == "BACKORDER_CREATED" and entry["order_id"]:
+            open_backorders.add(entry["order_id"])
+        elif entry["type"] == "ORDER_FULFILLED" and entry["order_id"] in open_backorders:
+            open_backorders.discard(entry["order_id"])
+            matched.append(slots["BACKORDER_FILLED"])
+        if not matched or not first <= bucket <= last:
+            continue
+        if key is not None and key not in (entry["product_id"], CATEGORIES[entry["product_id"]]):
+            continue
+        sums = totals.setdefault(bucket, [0] * (2 * len(ROLLUP_TYPES)))
+        for slot in matched:
+            sums[slot] += 1
+            sums[slot + len(ROLLUP_TYPES)] += entry["quantity"]
+    return [(bucket * width * 1_000_000, totals.get(bucket)) for bucket in range(first, last + 1)]
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_rollups_match_ledger_totals(seed):
+    ledger = TransactionLedger(segment_size=256)
+    rollups = MovementRollups()
+    rollups.attach(ledger, CATEGORIES.get)
+    middle = fill([ledger], seed, entries=1500)
+
+    # Restored rollups pick up where the snapshot left off
+    rollups.catch_up()
+    rollups = pickle.loads(pickle.dumps(rollups))
+    rollups.attach(ledger, CATEGORIES.get)
+    now = fill([ledger], seed + 100, entries=1500, start=middle)
+
+    for granularity, periods in (("hour", 24 * 5), ("day", 7)):
+        assert rollups.movement(granularity, periods, now=now) == expected_movement(ledger, granularity, periods, now)
+        for product_id in (1, 7):
+            assert (rollups.movement(granularity, periods, product_id=product_id, now=now)
+                    == expected_movement(ledger, granularity, periods, now, product_id))
+        assert (rollups.movement(granularity, periods, category="Garden", now=now)
+                == expected_movement(ledger, granularity, periods, now, "Garden"))